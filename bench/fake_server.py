@@ -0,0 +1,251 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Posts per page returned by the API, matching Write Freely.
+PAGE_SIZE = 10
+
+
+class FakeWriteFreely:
+    """
+    Local stand-in for a Write Freely instance covering the API used by
+    WritePyly: login, logout, collections, posts, updates, deletion, moving
+    and pinning, and pagination.
+
+    Every request waits `latency` seconds before being answered, and a share
+    of them (`error_rate`, between 0 and 1) fail with `error_status` so that
+    error handling can be measured too.
+    """
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 500, collections: tuple = ("bench",)):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.collections = {alias: list() for alias in collections}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def instance(self) -> str:
+        """
+        Instance value to give WritePyly so that it talks to this server.
+        """
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeWriteFreely":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def seed(self, collection: str, count: int) -> None:
+        """
+        Fills a collection with `count` generated posts, newest first.
+        """
+        with self.lock:
+            posts = self.collections.setdefault(collection, list())
+            for index in range(count):
+                posts.append(self.new_post(f"Post {index}", f"Body of generated post {index}.\n" * 5))
+
+    def new_post(self, title: str, body: str) -> dict:
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        post_id = uuid.uuid4().hex[:12]
+        return {"id": post_id, "slug": post_id, "title": title, "body": body, "created": now, "updated": now}
+
+    def update_post(self, post_id: str, title: str, body: str) -> dict:
+        with self.lock:
+            for posts in self.collections.values():
+                for post in posts:
+                    if post["id"] == post_id:
+                        post.update(title=title, body=body, updated=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+                        return dict(post)
+        return None
+
+    def find_post(self, post_id: str) -> dict:
+        with self.lock:
+            for posts in self.collections.values():
+                for post in posts:
+                    if post["id"] == post_id:
+                        return dict(post)
+        return None
+
+    def remove_post(self, post_id: str) -> bool:
+        with self.lock:
+            for posts in self.collections.values():
+                for post in posts:
+                    if post["id"] == post_id:
+                        posts.remove(post)
+                        return True
+        return False
+
+    def apply(self, collection: str, action: str, items: list) -> list:
+        """
+        Moves posts into a collection ("collect"), or pins or unpins them,
+        answering for each post in order like Write Freely does.
+        """
+        results = list()
+        with self.lock:
+            target = self.collections[collection]
+            for item in items:
+                found = next(((posts, post) for posts in self.collections.values() for post in posts if post["id"] == item.get("id")), None)
+                if found is None or (action != "collect" and found[0] is not target):
+                    results.append({"code": 404, "error_msg": "Post not found."})
+                    continue
+                posts, post = found
+                if action == "collect":
+                    if posts is not target:
+                        posts.remove(post)
+                        target.insert(0, post)
+                    results.append({"code": 200, "post": dict(post)})
+                else:
+                    if action == "pin":
+                        post["pinned"] = item.get("position", 1)
+                    else:
+                        post.pop("pinned", None)
+                    results.append({"code": 200, "id": post["id"]})
+        return results
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this, delayed
+            # ACKs add ~40 ms to every response with a body.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def reply(self, status: int, payload: dict = None) -> None:
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    chunks = list()
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def begin(self) -> bool:
+                """
+                Applies latency and error injection. Returns `False` when the
+                request has already been answered with an error.
+                """
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    self.reply(server.error_status, {"code": server.error_status, "error_msg": "Injected failure."})
+                    return False
+                return True
+
+            def do_GET(self) -> None:
+                if not self.begin():
+                    return
+                if self.path == "/api/me/posts":
+                    with server.lock:
+                        posts = [post for posts in server.collections.values() for post in posts]
+                    return self.reply(200, {"code": 200, "data": sorted(posts, key=lambda post: post["created"], reverse=True)})
+
+                match = re.fullmatch(r"/api/posts/([^/?]+)", self.path)
+                if match:
+                    post = server.find_post(match.group(1))
+                    if post is None:
+                        return self.reply(404, {"code": 404, "error_msg": "Post not found."})
+                    return self.reply(200, {"code": 200, "data": post})
+
+                match = re.fullmatch(r"/api/collections/([^/?]+)/posts(?:\?page=(\d+))?", self.path)
+                if match:
+                    posts = server.collections.get(match.group(1))
+                    page = int(match.group(2) or 1)
+                    if posts is None:
+                        return self.reply(404, {"code": 404, "error_msg": "Collection doesn't exist."})
+                    page_posts = posts[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+                    if page > 1 and not page_posts:
+                        return self.reply(404, {"code": 404, "error_msg": "Page not found."})
+                    return self.reply(200, {"code": 200, "data": {"alias": match.group(1), "posts": page_posts}})
+
+                match = re.fullmatch(r"/api/collections/([^/?]+)", self.path)
+                if match and match.group(1) in server.collections:
+                    posts = server.collections[match.group(1)]
+                    return self.reply(200, {"code": 200, "data": {"alias": match.group(1), "total_posts": len(posts)}})
+                self.reply(404, {"code": 404, "error_msg": "Not found."})
+
+            def do_POST(self) -> None:
+                body = self.read_body()
+                if not self.begin():
+                    return
+                if self.path == "/api/auth/login":
+                    return self.reply(200, {"code": 200, "data": {"access_token": uuid.uuid4().hex}})
+
+                if self.headers.get("Content-Encoding") == "gzip":
+                    import gzip
+                    body = gzip.decompress(body)
+                payload = json.loads(body)
+
+                match = re.fullmatch(r"/api/collections/([^/?]+)/posts", self.path)
+                if match or self.path == "/api/posts":
+                    post = server.new_post(payload.get("title", ""), payload.get("body", ""))
+                    with server.lock:
+                        server.collections.setdefault(match.group(1) if match else "", list()).insert(0, post)
+                    return self.reply(201, {"code": 201, "data": post})
+
+                match = re.fullmatch(r"/api/collections/([^/?]+)/(collect|pin|unpin)", self.path)
+                if match:
+                    if match.group(1) not in server.collections:
+                        return self.reply(404, {"code": 404, "error_msg": "Collection doesn't exist."})
+                    return self.reply(200, {"code": 200, "data": server.apply(match.group(1), match.group(2), payload)})
+
+                match = re.fullmatch(r"/api/posts/([^/?]+)", self.path)
+                if match:
+                    post = server.update_post(match.group(1), payload.get("title", ""), payload.get("body", ""))
+                    if post is not None:
+                        return self.reply(200, {"code": 200, "data": post})
+                self.reply(404, {"code": 404, "error_msg": "Not found."})
+
+            def do_DELETE(self) -> None:
+                if not self.begin():
+                    return
+                if self.path == "/api/auth/me":
+                    return self.reply(204)
+                match = re.fullmatch(r"/api/posts/([^/?]+)", self.path)
+                if match and server.remove_post(match.group(1)):
+                    return self.reply(204)
+                self.reply(404, {"code": 404, "error_msg": "Post not found."})
+
+        return Handler
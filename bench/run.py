@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmarks WritePyly against a local stand-in Write Freely server, reporting
+throughput and p50/p99 latency for posting, listing and deleting, both through
+the client classes and through the full `writepyly` command paths. It also
+checks that `writepyly help` stays within an import-time budget and that the
+TUI's post browser survives the instance failing to return a page.
+
+    python bench/run.py
+    python bench/run.py --requests 200 --latency 20 --error-rate 0.05
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+SRC_PATH = os.path.join(os.path.dirname(BENCH_PATH), "src")
+
+# WritePyly reads its configuration from the home directory when its modules
+# are imported, so point it at a scratch one before importing anything.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="writepyly-bench-")
+sys.path.insert(0, SRC_PATH)
+
+from fake_server import FakeWriteFreely
+
+from __init__ import JSON_PATH, WRITEPYLY_PATH
+from client import WriteFreely
+from post import Post
+from session import WriteSession
+
+
+def load_cli():
+    """
+    Imports WritePyly's `__main__.py` under another name, since this script
+    already is `__main__`.
+    """
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("writepyly_main", os.path.join(SRC_PATH, "__main__.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(name: str, task, count: int) -> dict:
+    """
+    Runs `task` `count` times and collects timing statistics. Any exception,
+    including `SystemExit` from the CLI, counts as an error.
+    """
+    durations = list()
+    errors = 0
+    start = time.perf_counter()
+    for index in range(count):
+        call_start = time.perf_counter()
+        try:
+            task(index)
+        except (Exception, SystemExit):
+            errors += 1
+        durations.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    durations.sort()
+    return {
+        "name": name,
+        "count": count,
+        "errors": errors,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(durations) * 1000,
+        "p99_ms": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000,
+    }
+
+
+def startup_import_ms(command: list) -> float:
+    """
+    Measures how long WritePyly spends importing modules for a command, using
+    `python -X importtime`. Interpreter startup (everything up to and including
+    `site`) isn't counted.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(SRC_PATH, "__main__.py")] + command,
+        capture_output=True, text=True, env=dict(os.environ))
+    total = 0
+    after_site = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Only top-level imports, nested ones are already in their parent's total.
+        if name.startswith("  "):
+            continue
+        if after_site:
+            total += int(cumulative)
+        elif name.strip() == "site":
+            after_site = True
+    return total / 1000
+
+
+def check_browser_errors() -> bool:
+    """
+    Opens the TUI's post browser on a server answering every request with a
+    500, and checks that it reports the failure instead of crashing.
+    """
+    import asyncio
+    from rich.console import Console
+    from async_client import AsyncWriteFreely
+    from browser import PostBrowser
+    from scheduler import Scheduler
+
+    output = io.StringIO()
+
+    async def browse(instance: str) -> None:
+        async def read_input() -> str:
+            return "q"
+
+        client = AsyncWriteFreely(instance, "bench", collection="bench", scheduler=Scheduler(max_retries=0))
+        async with client:
+            await PostBrowser(client, Console(file=output, width=120), read_input).run()
+
+    with FakeWriteFreely(error_rate=1.0) as server:
+        try:
+            asyncio.run(browse(server.instance))
+        except Exception:
+            return False
+    return "Failed to retrieve posts" in output.getvalue()
+
+
+def run(arguments) -> int:
+    results = list()
+    with FakeWriteFreely(latency=arguments.latency / 1000, error_rate=arguments.error_rate) as server:
+        server.seed("bench", arguments.posts)
+        os.makedirs(WRITEPYLY_PATH, exist_ok=True)
+        with open(JSON_PATH, "w") as config_file:
+            json.dump({"instance": server.instance, "access_token": "bench"}, config_file)
+
+        session = WriteSession("bench")
+        created = list()
+
+        def create(index: int) -> None:
+            current_post = Post(
+                f"Benchmark body {index}.\n" * 20,
+                server.instance,
+                "bench",
+                collection="bench",
+                title=f"Benchmark {index}",
+                session=session)
+            created.append(current_post.submit())
+
+        def walk(index: int) -> None:
+            client = WriteFreely(server.instance, "bench", collection="bench", session=session)
+            for _ in client.iter_posts(pages=None):
+                pass
+
+        def delete(index: int) -> None:
+            client = WriteFreely(server.instance, "bench", session=session)
+            if index >= len(created) or client.remove_post(created[index]) != 204:
+                raise RuntimeError("Delete failed.")
+
+        results.append(measure("Post.submit", create, arguments.requests))
+        results.append(measure("WriteFreely.iter_posts (all pages)", walk, max(1, arguments.requests // 10)))
+        results.append(measure("WriteFreely.remove_post", delete, arguments.requests))
+        api_connections = server.connections
+
+        # The full command paths, including configuration loading and output.
+        main_module = load_cli()
+        # Every post differs, otherwise the journal would answer all but the
+        # first from disk without reaching the server.
+        post_paths = list()
+        for index in range(arguments.requests):
+            post_paths.append(os.path.join(os.environ["HOME"], f"bench_post_{index}.md"))
+            with open(post_paths[-1], "w") as post_file:
+                post_file.write(f"# Benchmark {index}\n" + f"Benchmark body {index}.\n" * 20)
+
+        def command(argv: list) -> None:
+            sys.argv = ["writepyly"] + argv
+            with contextlib.redirect_stdout(io.StringIO()):
+                main_module.main()
+
+        created.clear()
+        results.append(measure("writepyly post", lambda index: command(["post", post_paths[index], "bench"]), arguments.requests))
+        results.append(measure("writepyly get", lambda index: command(["get", "bench"]), arguments.requests))
+        ids = [post["id"] for post in server.collections["bench"][:arguments.requests]]
+        results.append(measure("writepyly delete", lambda index: command(["delete", ids[index]]), min(len(ids), arguments.requests)))
+
+    print(f"{'benchmark':<36}{'count':>7}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        print(f"{result['name']:<36}{result['count']:>7}{result['errors']:>8}"
+            f"{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    print(f"\nConnections opened by the client classes: {api_connections}")
+
+    startup = startup_import_ms(["help"])
+    status = "OK" if startup <= arguments.startup_budget else "OVER BUDGET"
+    print(f"Import time of 'writepyly help': {startup:.1f} ms (budget {arguments.startup_budget:.0f} ms) {status}")
+    browser_ok = check_browser_errors()
+    print(f"Post browser on a failing page: {'OK' if browser_ok else 'CRASHED'}")
+    return 0 if startup <= arguments.startup_budget and browser_ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark WritePyly against a local fake Write Freely server.")
+    parser.add_argument("--requests", type=int, default=100, help="Calls per benchmark (default: 100).")
+    parser.add_argument("--posts", type=int, default=200, help="Posts seeded into the collection (default: 200).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server latency per request in milliseconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with a 500, 0 to 1.")
+    parser.add_argument("--startup-budget", type=float, default=50.0, help="Import-time budget of 'writepyly help' in milliseconds.")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
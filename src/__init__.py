@@ -5,4 +5,36 @@ BASE_PATH = os.path.expanduser('~')
 CONFIG_PATH = f"{BASE_PATH}/.config"
 WRITEPYLY_PATH = f"{CONFIG_PATH}/writepyly"
 JSON_PATH = f"{WRITEPYLY_PATH}/config.json"
+MIRROR_PATH = f"{WRITEPYLY_PATH}/mirror.db"
+COLLECTION_CACHE_PATH = f"{WRITEPYLY_PATH}/collections.json"
+OUTBOX_PATH = f"{WRITEPYLY_PATH}/outbox"
+JOURNAL_PATH = f"{WRITEPYLY_PATH}/journal.db"
+DAEMON_SOCKET = f"{WRITEPYLY_PATH}/daemon.sock"
 TEMP_BASE = "/tmp"
+
+# HTTP transport defaults. Both can be overridden in config.json.
+POOL_SIZE = 10
+TIMEOUT = 30
+
+# Maximum number of requests a single command runs concurrently.
+WORKERS = 4
+
+# Most posts moved, pinned or unpinned by a single request. Can be overridden
+# in config.json.
+BATCH_SIZE = 50
+
+# Seconds a collection check is trusted for. Both can be overridden in config.json.
+COLLECTION_TTL = 86400
+NEGATIVE_TTL = 60
+
+# Seconds a published post keeps identical resubmissions from creating a
+# duplicate. Can be overridden in config.json.
+JOURNAL_TTL = 7 * 86400
+
+# Request scheduling defaults. All of them can be overridden in config.json.
+RATE = 0
+HOST_CONCURRENCY = POOL_SIZE
+MAX_RETRIES = 3
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+RETRY_BUDGET = 20
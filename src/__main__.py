@@ -1,20 +1,14 @@
 #!/usr/bin/env python3
 
-import json
 import os
 import sys
 
-from rich.console import Console
+from __init__ import DAEMON_SOCKET, JOURNAL_PATH, JSON_PATH, MIRROR_PATH, WORKERS
 
-from __init__ import JSON_PATH
-from auth import Authenticator
-from client import WriteFreely
-from config import ConfigObj
-from console import WriteConsole
-from help import Helper
-from post import Post
+# Every command imports what it needs when it runs so that cheap commands like
+# `help` don't pay for loading `rich` and `requests`.
 
-def exit_with_login_message(console: Console) -> None:
+def exit_with_login_message(console) -> None:
     """
     Prints a message that loading the configuration failed and prompting the user
     to run the login command.
@@ -25,160 +19,979 @@ def exit_with_login_message(console: Console) -> None:
     console.print("Running [bold purple]writepyly login[/bold purple] should resolve this.")
     sys.exit(1)
 
-def string_to_int(input_value: str) -> int:
+def string_to_int(input_value: str, name: str = "the page count", convert=int) -> int:
     """
     Attempts to convert a string to an integer and returns the integer value.
 
     Args:
         input_value (str): String to convert.
+        name (str): What the value is, for the error message.
+        convert (Callable): Conversion to apply, e.g. `float`.
 
     Returns:
         int: The integer representation of the string.
     """
     try:
-        return int(input_value)
+        return convert(input_value)
     except ValueError:
-        print("Must specify an integer for the page size! Run:")
-        print("\n\t writepyly help get\n")
+        print(f"Must specify a number for {name}! Run:")
+        print("\n\t writepyly help\n")
         print("For more details.")
         sys.exit(1)
     except Exception as e:
-        print(f"Unknown error processing page size: {e}")
+        print(f"Unknown error processing {name}: {e}")
         sys.exit(1)
 
-def main():
-    # Create a console object.
-    console = Console()
+def pop_flag(args: list, flag: str) -> bool:
+    """
+    Removes a boolean flag from the argument list if present.
+
+    Args:
+        args (list): Arguments to search, modified in place.
+        flag (str): Flag to look for, e.g. "--all".
+
+    Returns:
+        bool: Whether or not the flag was given.
+    """
+    if flag in args:
+        args.remove(flag)
+        return True
+    return False
+
+def pop_option(args: list, option: str, default=None):
+    """
+    Removes an option and its value from the argument list if present.
+
+    Args:
+        args (list): Arguments to search, modified in place.
+        option (str): Option to look for, e.g. "--pages".
+        default: Value returned when the option isn't given.
+
+    Returns:
+        The value following the option, or `default`.
+    """
+    if option in args:
+        index = args.index(option)
+        if index + 1 >= len(args):
+            print(f"Missing a value for {option}!")
+            sys.exit(1)
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return default
+
+def load_config(console):
+    """
+    Loads the configuration, exiting with a prompt to log in if that fails.
+
+    Args:
+        console (Console): rich `Console` object for writing to stdout.
+
+    Returns:
+        ConfigObj: The loaded configuration.
+    """
+    from config import ConfigObj
+
+    current_config = ConfigObj()
+    if not current_config.load():
+        exit_with_login_message(console)
+    return current_config
+
+def client_from_config(conf, cls=None, **kwargs):
+    """
+    Creates a client for the configured instance and account, with the pooled
+    session and collection cache the configuration calls for.
+
+    Args:
+        conf (ConfigObj): The loaded configuration.
+        cls (type): Client class to create, `WriteFreely` unless given.
+        **kwargs: Passed on to the client, e.g. `collection`, or a `session`
+            or `cache` to use instead of new ones.
+
+    Returns:
+        WriteFreely: The client.
+    """
+    from cache import CollectionCache
+    from session import WriteSession
+
+    if cls is None:
+        from client import WriteFreely
+
+        cls = WriteFreely
+    if kwargs.get("session") is None:
+        kwargs["session"] = WriteSession.from_config(conf)
+    if kwargs.get("cache") is None:
+        kwargs["cache"] = CollectionCache.from_config(conf)
+    return cls(conf.instance, conf.access_token, **kwargs)
+
+def command_tui(args: list) -> None:
+    from console import WriteConsole
+
+    # Launch the interactive TUI application.
+    WriteConsole()
+
+def command_help(args: list) -> None:
+    from help import Helper
 
-    # Define the command line arguments.
     help_obj = Helper()
-    if len(sys.argv) == 1:
-        # Launch the interactive TUI application.
-        WriteConsole()
-    elif len(sys.argv) == 2 and sys.argv[1].lower() == "help":
+    topics = {
+        "login": help_obj.help_login,
+        "logout": help_obj.help_logout,
+        "post": help_obj.help_post,
+        "get": help_obj.help_get,
+        "delete": help_obj.help_delete,
+        "move": help_obj.help_move,
+        "pin": help_obj.help_pin,
+        "unpin": help_obj.help_pin,
+        "sync": help_obj.help_sync,
+        "search": help_obj.help_search,
+        "export": help_obj.help_export,
+        "import": help_obj.help_import,
+        "sync-dir": help_obj.help_sync_dir,
+        "batch": help_obj.help_batch,
+        "daemon": help_obj.help_daemon,
+        "flush": help_obj.help_flush,
+    }
+    if args and args[0].lower() in topics:
+        topics[args[0].lower()]()
+    else:
         help_obj.help_empty()
-    elif len(sys.argv) >= 3 and sys.argv[1].lower() == "help" and sys.argv[2].lower() == "login":
-        help_obj.help_login()
-    elif len(sys.argv) >= 3 and sys.argv[1].lower() == "help" and sys.argv[2].lower() == "logout":
-        help_obj.help_logout()
-    elif len(sys.argv) >= 3 and sys.argv[1].lower() == "help" and sys.argv[2].lower() == "post":
-        help_obj.help_post()
-    elif len(sys.argv) >= 3 and sys.argv[1].lower() == "help" and sys.argv[2].lower() == "get":
-        help_obj.help_get()
-    elif len(sys.argv) >=3 and sys.argv[1].lower() == "help" and sys.argv[2].lower() == "delete":
-        help_obj.help_delete()
-    elif len(sys.argv) >= 2 and sys.argv[1].lower() == "login":
-        if len(sys.argv) < 5:
-            console.print("Not enough arguments! See the following for more details:\n\n[bold]writepyly help login[/bold]\n", style="red")
-            sys.exit(1)
-        console.print("Attempting authentication.")
-        auth_obj = Authenticator()
-        auth_obj.supply_credentials(sys.argv[4], sys.argv[2], sys.argv[3])
-        auth_obj.new_login()
-    elif len(sys.argv) >= 2 and sys.argv[1].lower() == "logout":
-        # Attempt to find the access token and instance.
-        if os.path.isfile(JSON_PATH):
-            current_config = dict()
+
+def command_login(args: list) -> None:
+    from rich.console import Console
+    from auth import Authenticator
+
+    console = Console()
+    profile = pop_option(args, "--profile")
+    if len(args) < 3:
+        console.print("Not enough arguments! See the following for more details:\n\n[bold]writepyly help login[/bold]\n", style="red")
+        sys.exit(1)
+    console.print("Attempting authentication.")
+    auth_obj = Authenticator()
+    auth_obj.supply_credentials(args[2], args[0], args[1], profile=profile)
+    auth_obj.new_login()
+
+def command_logout(args: list) -> None:
+    import json
+    from rich.console import Console
+    from auth import Authenticator
+
+    console = Console()
+    profile = pop_option(args, "--profile")
+    # Attempt to find the access token and instance.
+    if os.path.isfile(JSON_PATH):
+        current_config = dict()
+        try:
+            with open(JSON_PATH, "r") as config_file:
+                current_config = json.load(config_file)
+        except Exception as e:
+            console.print(f"ERROR: Unable to read {JSON_PATH} with error: {e}", style="bold red")
+
+        if profile is not None:
+            current_config = (current_config.get('profiles') or dict()).get(profile) or dict()
+            if not current_config:
+                console.print(f"No profile named {profile} in: {JSON_PATH}", style="bold red")
+                sys.exit(1)
+
+        if current_config != {} and current_config.get('instance') and current_config.get('access_token'):
+            auth_obj = Authenticator()
             try:
-                with open(JSON_PATH, "r") as config_file:
-                    current_config = json.load(config_file)
+                auth_obj.remove_login(
+                    current_config['instance'],
+                    current_config['access_token'],
+                    profile=profile)
+            except KeyError as e:
+                console.print("Missing either the instance or access token to log out. Does the config file still exist at: ~/config/writepyly/config.json", style="bold red")
+                sys.exit(1)
             except Exception as e:
-                console.print(f"ERROR: Unable to read {JSON_PATH} with error: {e}", style="bold red")
-
-            if current_config != {} and current_config.get('instance') and current_config.get('access_token'):
-                auth_obj = Authenticator()
-                try:
-                    auth_obj.remove_login(
-                        current_config['instance'],
-                        current_config['access_token'])
-                except KeyError as e:
-                    console.print("Missing either the instance or access token to log out. Does the config file still exist at: ~/config/writepyly/config.json", style="bold red")
-                    sys.exit(1)
-                except Exception as e:
-                    console.print(f"Failed to logout with error: {e}", style="bold red")
-                    sys.exit(1)
-        else:
-            console.print(f"No config file found at: {JSON_PATH}")
-    elif len(sys.argv) >= 3 and sys.argv[1].lower() == "post":
-        post_content = ""
-        if sys.argv[2] == "--":
-            console.print("Reading post content from STDIN.")
-            post_content = sys.stdin.read()
-        else:
-            if os.path.isfile(sys.argv[2]):
-                with open(sys.argv[2], "r") as file:
-                    post_content = file.read()
-            else:
-                console.print(f"Unable to find a file at given path of: {sys.argv[3]}", style="bold red")
+                console.print(f"Failed to logout with error: {e}", style="bold red")
                 sys.exit(1)
+    else:
+        console.print(f"No config file found at: {JSON_PATH}")
+
+def command_post(args: list) -> None:
+    from rich.console import Console
+
+    console = Console()
+    if "--batch" in args:
+        command_post_batch(args, console)
+        return
+    if not args:
+        from help import Helper
+
+        console.print("Not enough arguments to make a post!", style="bold red")
+        Helper().help_post()
+        return
+
+    from cache import CollectionCache
+    from journal import Journal
+    from post import Post, hash_stream, split_title_stream
+    from session import WriteSession
+
+    verify = not pop_flag(args, "--no-verify")
+    force = pop_flag(args, "--force")
+    compress = pop_flag(args, "--gzip")
+    queue = pop_flag(args, "--queue")
+    targets = pop_option(args, "--to")
+    if not args:
+        console.print("Not enough arguments to make a post!", style="bold red")
+        sys.exit(1)
+    if args[0] != "--" and not os.path.isfile(args[0]):
+        console.print(f"Unable to find a file at given path of: {args[0]}", style="bold red")
+        sys.exit(1)
+    if targets is not None:
+        command_post_cross(args[0], targets, verify, force, console)
+        return
+
+    # Check if a collection was specified.
+    collection = None
+    if len(args) >= 2:
+        collection = args[1]
+
+    # Ensure we have information to connect to Write Freely.
+    current_conf = load_config(console)
 
-        # Check if a collection was specified.
-        collection = None
-        if len(sys.argv) >= 4:
-            collection = sys.argv[3]
-
-        # Check if a title was specified.
-        post_content_list = post_content.split('\n')
-        post_title = None
-        if post_content_list[0].startswith('#'):
-            post_title = post_content_list[0].replace("#", "").strip()
-            post_content_list.remove(post_content_list[0])
-            post_content = '\n'.join(post_content_list)
-
-        # Ensure we have information to connect to Write Freely.
-        current_conf = ConfigObj()
-        if not current_conf.load():
-            exit_with_login_message(console)
-
-        # Create a post object and validate the collection if one was provided.
-        current_post = Post(
-            post_content,
-            current_conf.instance,
-            current_conf.access_token,
-            collection=collection,
-            title=post_title)
-
-        if collection != "":
-            current_post.check_collection()
+    if queue:
+        command_post_queue(args[0], collection, current_conf, console)
+        return
+
+    # Create a post object and validate the collection if one was provided.
+    # Both calls share one pooled connection.
+    current_post = Post(
+        "",
+        current_conf.instance,
+        current_conf.access_token,
+        collection=collection,
+        session=WriteSession.from_config(current_conf),
+        cache=CollectionCache.from_config(current_conf),
+        compress=compress or current_conf.gzip,
+        journal=Journal.from_config(current_conf),
+        force=force)
+
+    if collection and verify:
+        current_post.check_collection()
+
+    # Stream the content straight from the file or STDIN to the instance,
+    # peeking only at the first line for a title.
+    if args[0] == "--":
+        import shutil
+        import tempfile
+
+        console.print("Reading post content from STDIN.")
+        # STDIN can only be read once but is read twice below, so keep a
+        # copy, in memory up to 1 MiB and on disk beyond that.
+        stream = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+")
+        shutil.copyfileobj(sys.stdin, stream)
+        stream.seek(0)
+    else:
+        stream = open(args[0], "r")
+    with stream:
+        # Hash the content before sending it, so the submission can be
+        # journaled and a rerun never publishes it twice.
+        _, current_post.digest = hash_stream(stream)
+        stream.seek(0)
+        current_post.title, current_post.post_content = split_title_stream(stream)
 
         # Make the post.
         post_id = current_post.create_post()
+    if not current_post.recovered:
         console.print(f"Successfully created post with ID: [bold purple]{post_id}[/bold purple]")
+    if collection:
+        mirror_published(current_conf.instance, collection, [current_post.published])
 
-    elif len(sys.argv) < 4 and "post" in sys.argv:
-        console.print("Not enough arguments to make a post!", style="bold red")
-        help_obj.help_post()
-    elif len(sys.argv) >= 3 and "get" in sys.argv:
-        # Load the configuration.
-        current_config = ConfigObj()
-        if not current_config.load():
-            exit_with_login_message(console)
-
-        # Create the client object and get the posts.
-        write_client = WriteFreely(
-            current_config.instance,
-            current_config.access_token,
-            collection=sys.argv[2])
+def mirror_published(instance: str, collection: str, posts: list) -> None:
+    """
+    Adds newly published posts to the local mirror, and so to its search
+    index, when their collection is mirrored. Collections that were never
+    synced are left alone, and so are posts returned without their body,
+    e.g. streamed ones; the next sync picks those up.
+
+    Args:
+        instance (str): Instance the posts were published to.
+        collection (str): Collection the posts were published to.
+        posts (list): Posts as returned by the instance.
+    """
+    if not os.path.isfile(MIRROR_PATH):
+        return
+    from mirror import Mirror
+
+    mirror = Mirror()
+    if mirror.has_collection(instance, collection):
+        mirror.store_posts(instance, collection, [post for post in posts if post and post.get('body') is not None])
+
+def forget_deleted(config, deleted: list) -> None:
+    """
+    Removes deleted posts from the local mirror and from the journal, so
+    publishing the same content again creates a new post.
+
+    Args:
+        config (ConfigObj): The loaded configuration.
+        deleted (list): Tuples of the instance and the ID of every deleted post.
+    """
+    if not deleted:
+        return
+    if os.path.isfile(MIRROR_PATH):
+        from mirror import Mirror
+
+        mirror = Mirror()
+        for instance, post_id in deleted:
+            mirror.remove_post(instance, post_id)
+    if os.path.isfile(JOURNAL_PATH):
+        from journal import Journal
+
+        journal = Journal.from_config(config)
+        for instance, post_id in deleted:
+            journal.forget(instance, post_id)
+
+def command_post_cross(path: str, value: str, verify: bool, force: bool, console) -> None:
+    from config import ConfigObj
+    from crosspost import CrossPoster, parse_targets
+    from post import split_title
+
+    current_config = ConfigObj()
+    profiles = current_config.read_profiles()
+    targets = parse_targets(value)
+    unknown = sorted({profile for profile, _ in targets if profile not in profiles})
+    if not targets or unknown:
+        console.print(f"Unknown profiles: {', '.join(unknown) or value}", style="bold red")
+        console.print("Create them with [bold purple]writepyly login --profile {name}[/bold purple].")
+        sys.exit(1)
+
+    # Every target gets the same content, so read it once.
+    if path == "--":
+        console.print("Reading post content from STDIN.")
+        post_content = sys.stdin.read()
+    else:
+        with open(path, "r") as post_file:
+            post_content = post_file.read()
+    post_title, post_content = split_title(post_content)
+
+    console.print(f"Posting to {len(targets)} targets: {post_title or 'untitled post'}")
+    if CrossPoster(current_config, profiles, verify=verify, force=force).run(targets, post_title, post_content):
+        sys.exit(1)
+
+def command_post_queue(path: str, collection: str, current_conf, console) -> None:
+    from outbox import Outbox
+    from post import split_title
+
+    if path == "--":
+        console.print("Reading post content from STDIN.")
+        post_content = sys.stdin.read()
+    else:
+        with open(path, "r") as post_file:
+            post_content = post_file.read()
+    post_title, post_content = split_title(post_content)
+    entry = Outbox().enqueue(current_conf.instance, collection, post_title, post_content)
+    console.print(f"Queued post: [bold purple]{entry['id']}[/bold purple]")
+    console.print("Run [bold purple]writepyly flush[/bold purple] to publish it.")
+
+def command_post_batch(args: list, console) -> None:
+    from bulk import Bulk, expand_paths
+    from journal import Journal
+    from session import WriteSession
+
+    verify = not pop_flag(args, "--no-verify")
+    force = pop_flag(args, "--force")
+    pattern = pop_option(args, "--batch")
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)))
+    collection = args[0] if args else None
+
+    paths = expand_paths(pattern)
+    if not paths:
+        console.print(f"No Markdown files found for: {pattern}", style="bold red")
+        sys.exit(1)
+
+    current_conf = load_config(console)
+    session = WriteSession.from_config(current_conf)
+    if collection and verify:
+        write_client = client_from_config(current_conf, collection=collection, session=session)
         if not write_client.check_collection():
             sys.exit(1)
-        write_client.get_posts()
 
-    elif len(sys.argv) < 3 and "get" in sys.argv:
+    console.print(f"Publishing {len(paths)} files.")
+    bulk = Bulk(current_conf.instance, current_conf.access_token, session=session, workers=workers, journal=Journal.from_config(current_conf), force=force)
+    if bulk.publish(paths, collection):
+        sys.exit(1)
+
+def command_get(args: list) -> None:
+    from rich.console import Console
+    from output import OUTPUT_FORMATS, parse_fields
+
+    console = Console()
+    verify = not pop_flag(args, "--no-verify")
+    # Work out how many pages to read: the first one unless told otherwise.
+    pages = 1
+    if pop_flag(args, "--all"):
+        pages = None
+    page_option = pop_option(args, "--pages")
+    if page_option is not None:
+        pages = string_to_int(page_option)
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)))
+    refresh = pop_flag(args, "--refresh")
+    output_format = pop_option(args, "--format", "rich").lower()
+    fields = parse_fields(pop_option(args, "--fields"))
+    if output_format not in OUTPUT_FORMATS:
+        console.print(f"Unknown format: {output_format}. Must be one of: {', '.join(OUTPUT_FORMATS)}", style="bold red")
+        sys.exit(1)
+    if not args:
         console.print("Must specify a collection with [bold purple]get[/bold purple]. Please include the collection name.")
-    elif len(sys.argv) >= 3 and "delete" in sys.argv:
-        current_config = ConfigObj()
-        if not current_config.load():
-            exit_with_login_message(console)
+        sys.exit(1)
 
-        # Create the client and attempt to delete the post.
-        write_client = WriteFreely(
-            current_config.instance,
-            current_config.access_token)
-        write_client.delete_post(sys.argv[2])
-    elif len(sys.argv) < 3 and "delete" in sys.argv:
+    # Load the configuration.
+    current_config = load_config(console)
+
+    # Create the client object and get the posts.
+    write_client = client_from_config(current_config, collection=args[0])
+
+    # Answer from the local mirror when the collection has been synced.
+    posts = None
+    if not refresh and os.path.isfile(MIRROR_PATH):
+        from mirror import Mirror
+
+        mirror = Mirror()
+        if mirror.has_collection(current_config.instance, args[0]):
+            limit = None if pages is None else pages * 10
+            posts = mirror.posts(current_config.instance, args[0], limit=limit)
+
+    if posts is None:
+        if verify and not write_client.check_collection():
+            sys.exit(1)
+        if output_format == "rich":
+            write_client.get_posts(pages=pages, workers=workers)
+            return
+        posts = write_client.iter_posts(pages=pages, workers=workers)
+
+    if output_format == "rich":
+        write_client.print_posts(posts)
+        return
+    write_records(posts, output_format, fields)
+
+def write_records(posts, output_format: str, fields: tuple) -> None:
+    """
+    Streams posts to STDOUT in a machine-readable format. Errors go to STDERR
+    so they never end up in the records.
+
+    Args:
+        posts (Iterable[dict]): Posts to write.
+        output_format (str): One of "json", "ndjson" or "tsv".
+        fields (tuple): Fields of each post to write.
+    """
+    from output import write_posts
+
+    try:
+        write_posts(posts, output_format, fields)
+    except BrokenPipeError:
+        # The reader, e.g. `head`, has seen enough.
+        sys.stdout = open(os.devnull, "w")
+    except Exception as e:
+        from rich.console import Console
+
+        Console(stderr=True).print(f"Failed to retrieve posts with error: {e}", style="bold red")
+        sys.exit(1)
+
+def command_sync(args: list) -> None:
+    from rich.console import Console
+    from mirror import Mirror
+
+    console = Console()
+    full = pop_flag(args, "--full")
+    if not args:
+        console.print("Must specify a collection with [bold purple]sync[/bold purple]. Please include the collection name.")
+        sys.exit(1)
+
+    current_config = load_config(console)
+    write_client = client_from_config(current_config, collection=args[0])
+    if not write_client.check_collection():
+        sys.exit(1)
+
+    try:
+        new_count, changed_count = Mirror().sync(write_client, full=full)
+    except Exception as e:
+        console.print(f"Failed to sync {args[0]} with error: {e}", style="bold red")
+        sys.exit(1)
+    console.print(f"Synced [bold purple]{args[0]}[/bold purple]: {new_count} new, {changed_count} updated.")
+
+def command_search(args: list) -> None:
+    from datetime import date, timedelta
+    from rich.console import Console
+    from rich.markup import escape
+    from mirror import Mirror
+    from output import OUTPUT_FORMATS, parse_fields
+
+    console = Console()
+    refresh = pop_flag(args, "--sync")
+    limit = string_to_int(pop_option(args, "--limit", "20"), "--limit")
+    since = pop_option(args, "--since")
+    until = pop_option(args, "--until")
+    output_format = pop_option(args, "--format", "rich").lower()
+    fields = parse_fields(pop_option(args, "--fields") or "id,slug,title,created,score,snippet")
+    if output_format not in OUTPUT_FORMATS:
+        console.print(f"Unknown format: {output_format}. Must be one of: {', '.join(OUTPUT_FORMATS)}", style="bold red")
+        sys.exit(1)
+    if len(args) < 2:
+        console.print("Must specify a collection and a query with [bold purple]search[/bold purple]. Run [bold]\"writepyly help search\"[/bold] for more details.", style="red")
+        sys.exit(1)
+    try:
+        since = since and date.fromisoformat(since).isoformat()
+        # Include the whole day given to --until.
+        until = until and (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+    except ValueError:
+        console.print("Dates given to --since and --until must look like 2023-01-31.", style="bold red")
+        sys.exit(1)
+
+    current_config = load_config(console)
+    collection, query = args[0], " ".join(args[1:])
+    mirror = Mirror()
+    if not mirror.searchable:
+        console.print("Searching requires a version of SQLite with FTS5.", style="bold red")
+        sys.exit(1)
+
+    # Searching never contacts the instance, unless the collection has to be
+    # mirrored first.
+    if refresh or not mirror.has_collection(current_config.instance, collection):
+        write_client = client_from_config(current_config, collection=collection)
+        if not write_client.check_collection():
+            sys.exit(1)
+        Console(stderr=True).print(f"Syncing [bold purple]{collection}[/bold purple] to the local mirror.")
+        try:
+            mirror.sync(write_client)
+        except Exception as e:
+            console.print(f"Failed to sync {collection} with error: {e}", style="bold red")
+            sys.exit(1)
+
+    # Control characters mark the matched words so they survive escaping.
+    highlight = ("\x02", "\x03") if output_format == "rich" else ("", "")
+    try:
+        posts = list(mirror.search(current_config.instance, collection, query, since=since, until=until, limit=limit, highlight=highlight))
+    except ValueError as e:
+        console.print(str(e), style="bold red")
+        sys.exit(1)
+
+    if output_format != "rich":
+        write_records(posts, output_format, fields)
+        return
+    if not posts:
+        console.print(f"No posts in {collection} match: {query}")
+        return
+    for single_post in posts:
+        snippet = escape(" ".join(single_post["snippet"].split()))
+        snippet = snippet.replace("\x02", "[bold yellow]").replace("\x03", "[/bold yellow]")
+        console.print(f"[bold purple]Title:[/bold purple]   [white]{escape(single_post.get('title') or single_post.get('slug') or '')}[/white]")
+        console.print(f"[bold purple]Created:[/bold purple] [white]{single_post.get('created')}[/white]")
+        console.print(f"[bold purple]ID:[/bold purple]      [white]{single_post.get('id')}[/white]")
+        console.print(f"[bold purple]Match:[/bold purple]   {snippet}\n")
+
+def command_export(args: list) -> None:
+    from rich.console import Console
+    from export import FORMATS, Exporter
+
+    console = Console()
+    output_format = pop_option(args, "--format", "jsonl").lower()
+    output = pop_option(args, "--output")
+    restart = pop_flag(args, "--restart")
+    if not args:
+        console.print("Must specify a collection with [bold purple]export[/bold purple]. Please include the collection name.")
+        sys.exit(1)
+    if output_format not in FORMATS:
+        console.print(f"Unknown format {output_format}! Use one of: {', '.join(FORMATS)}", style="bold red")
+        sys.exit(1)
+    if output is None:
+        output = f"{args[0]}.jsonl" if output_format == "jsonl" else args[0]
+
+    current_config = load_config(console)
+    write_client = client_from_config(current_config, collection=args[0])
+    if not write_client.check_collection():
+        sys.exit(1)
+
+    try:
+        count = Exporter(write_client, output, output_format).run(restart=restart)
+    except Exception as e:
+        console.print(f"Export stopped with error: {e}", style="bold red")
+        console.print("Run the same command again to resume.")
+        sys.exit(1)
+    console.print(f"Exported [bold purple]{count}[/bold purple] posts to: {output}")
+
+def command_import(args: list) -> None:
+    from rich.console import Console
+    from bulk import Bulk
+    from importer import Importer
+    from journal import Journal
+    from session import WriteSession
+
+    console = Console()
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)))
+    if len(args) < 2:
+        console.print("Must specify a dump and a collection with [bold purple]import[/bold purple]. Run [bold]\"writepyly help import\"[/bold] for more details.", style="red")
+        sys.exit(1)
+    if not os.path.exists(args[0]):
+        console.print(f"Unable to find a file or directory at given path of: {args[0]}", style="bold red")
+        sys.exit(1)
+
+    current_config = load_config(console)
+    session = WriteSession.from_config(current_config)
+    write_client = client_from_config(current_config, collection=args[1], session=session)
+    if not write_client.check_collection():
+        sys.exit(1)
+
+    bulk = Bulk(current_config.instance, current_config.access_token, session=session, workers=workers, journal=Journal.from_config(current_config))
+    try:
+        _, _, failures = Importer(bulk, write_client).run(args[0])
+    except Exception as e:
+        console.print(f"Import stopped with error: {e}", style="bold red")
+        console.print("Run the same command again to resume.")
+        sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+def command_sync_dir(args: list) -> None:
+    from rich.console import Console
+    from bulk import Bulk
+    from dirsync import DirectorySync
+    from journal import Journal
+    from session import WriteSession
+
+    console = Console()
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)), "--workers")
+    delete = pop_flag(args, "--delete")
+    dry_run = pop_flag(args, "--dry-run")
+    if len(args) < 2:
+        console.print("Must specify a directory and a collection with [bold purple]sync-dir[/bold purple]. Run [bold]\"writepyly help sync-dir\"[/bold] for more details.", style="red")
+        sys.exit(1)
+    if not os.path.isdir(args[0]):
+        console.print(f"Unable to find a directory at given path of: {args[0]}", style="bold red")
+        sys.exit(1)
+
+    current_config = load_config(console)
+    session = WriteSession.from_config(current_config)
+    write_client = client_from_config(current_config, collection=args[1], session=session)
+    if not write_client.check_collection():
+        sys.exit(1)
+
+    bulk = Bulk(current_config.instance, current_config.access_token, session=session, workers=workers, journal=Journal.from_config(current_config))
+    deleted, failures = DirectorySync(bulk, write_client, args[0]).run(delete=delete, dry_run=dry_run)
+    forget_deleted(current_config, [(current_config.instance, post_id) for post_id in deleted])
+    if failures:
+        sys.exit(1)
+
+def command_delete(args: list) -> None:
+    from rich.console import Console
+    from bulk import Bulk, read_ids
+    from session import WriteSession
+
+    console = Console()
+    id_file = pop_option(args, "--from-file")
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)))
+    if not args and id_file is None:
         console.print("Must specify a post ID with 'delete'. Run [bold]\"writepyly help delete\"[/bold] for more details.", style="red")
+        sys.exit(1)
+
+    # Read the IDs up front so a bad path fails before anything is deleted.
+    post_ids = None
+    if id_file is not None:
+        if not os.path.isfile(id_file):
+            console.print(f"Unable to find a file at given path of: {id_file}", style="bold red")
+            sys.exit(1)
+        with open(id_file, "r") as file:
+            post_ids = read_ids(file)
+    elif args[0] == "-":
+        post_ids = read_ids(sys.stdin)
+
+    current_config = load_config(console)
+    session = WriteSession.from_config(current_config)
+
+    if post_ids is None:
+        # Create the client and attempt to delete the post.
+        write_client = client_from_config(current_config, session=session)
+        deleted = [args[0]] if write_client.delete_post(args[0]) else list()
+        failures = list()
     else:
-        console.print("Entered arguments don't match known values. Run [bold]\"writepyly help\"[/bold] for instructions.", style="red")
+        bulk = Bulk(current_config.instance, current_config.access_token, session=session, workers=workers)
+        deleted, failures = bulk.delete(post_ids)
+
+    forget_deleted(current_config, [(current_config.instance, post_id) for post_id in deleted])
+    if failures:
+        sys.exit(1)
+
+def command_apply(args: list, action: str, name: str) -> None:
+    """
+    Runs `move`, `pin` or `unpin`: applies an action to every post given by
+    ID, or read from a file or STDIN, with batched requests.
+
+    Args:
+        args (list): Arguments of the command, the collection last.
+        action (str): "collect", "pin" or "unpin".
+        name (str): Name of the command, for messages.
+    """
+    from rich.console import Console
+    from bulk import Bulk, read_ids
+    from session import WriteSession
+
+    console = Console()
+    id_file = pop_option(args, "--from-file")
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)), "--workers")
+    batch_size = pop_option(args, "--batch-size")
+    verify = not pop_flag(args, "--no-verify")
+    if not args or (id_file is None and len(args) < 2):
+        console.print(f"Must specify post IDs and a collection with '{name}'. Run [bold]\"writepyly help {name}\"[/bold] for more details.", style="red")
+        sys.exit(1)
+    collection = args[-1]
+
+    # Read the IDs up front so a bad path fails before anything is sent.
+    if id_file is not None:
+        if not os.path.isfile(id_file):
+            console.print(f"Unable to find a file at given path of: {id_file}", style="bold red")
+            sys.exit(1)
+        with open(id_file, "r") as file:
+            post_ids = read_ids(file)
+    elif args[:-1] == ["-"]:
+        post_ids = read_ids(sys.stdin)
+    else:
+        post_ids = list(dict.fromkeys(args[:-1]))
+    if not post_ids:
+        console.print("No post IDs given.")
+        return
+
+    current_config = load_config(console)
+    if batch_size is not None:
+        current_config.batch_size = string_to_int(batch_size, "--batch-size")
+    session = WriteSession.from_config(current_config)
+    if verify:
+        write_client = client_from_config(current_config, collection=collection, session=session)
+        if not write_client.check_collection():
+            sys.exit(1)
+
+    bulk = Bulk(current_config.instance, current_config.access_token, session=session, workers=workers)
+    succeeded, failures = bulk.apply(action, post_ids, collection, current_config.batch_size)
+
+    if action == "collect" and succeeded and os.path.isfile(MIRROR_PATH):
+        from mirror import Mirror
+
+        # Moved posts leave the collection they were mirrored in.
+        mirror = Mirror()
+        for post_id, _ in succeeded:
+            mirror.remove_post(current_config.instance, post_id)
+        mirror_published(current_config.instance, collection, [post for _, post in succeeded])
+    if failures:
+        sys.exit(1)
+
+def command_move(args: list) -> None:
+    command_apply(args, "collect", "move")
+
+def command_pin(args: list) -> None:
+    command_apply(args, "pin", "pin")
+
+def command_unpin(args: list) -> None:
+    command_apply(args, "unpin", "unpin")
+
+def command_batch(args: list) -> None:
+    from rich.console import Console
+    from batch import BatchRunner
+    from config import ConfigObj
+
+    console = Console(stderr=True)
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)), "--workers")
+    verify = not pop_flag(args, "--no-verify")
+    if not args:
+        console.print("Must specify a file of operations with [bold purple]batch[/bold purple], or - for STDIN. Run [bold]\"writepyly help batch\"[/bold] for more details.", style="red")
+        sys.exit(1)
+    if args[0] != "-" and not os.path.isfile(args[0]):
+        console.print(f"Unable to find a file at given path of: {args[0]}", style="bold red")
+        sys.exit(1)
+
+    current_config = ConfigObj()
+    profiles = current_config.read_profiles()
+    if not profiles:
+        console.print("Unable to load any login.", style="bold red")
+        exit_with_login_message(console)
+
+    runner = BatchRunner(current_config, profiles, workers=workers, verify=verify)
+    stream = sys.stdin if args[0] == "-" else open(args[0], "r")
+    with stream:
+        failures = runner.run(stream)
+
+    for instance, collection, published in runner.published:
+        mirror_published(instance, collection, [published])
+    forget_deleted(current_config, runner.deleted)
+    if runner.moved and os.path.isfile(MIRROR_PATH):
+        from mirror import Mirror
+
+        mirror = Mirror()
+        for instance, _, post_id, _ in runner.moved:
+            mirror.remove_post(instance, post_id)
+    for instance, collection, _, post in runner.moved:
+        mirror_published(instance, collection, [post])
+    if failures:
+        sys.exit(1)
+
+def command_daemon(args: list) -> None:
+    from rich.console import Console
+    import daemon
+
+    console = Console()
+    if args and args[0] == "stop":
+        if daemon.stop():
+            console.print("Stopped the daemon.")
+        else:
+            console.print("No daemon is running.")
+        return
+    if daemon.is_running():
+        console.print(f"A daemon is already listening at: {DAEMON_SOCKET}", style="bold red")
+        sys.exit(1)
+
+    console.print(f"Listening at: [bold purple]{DAEMON_SOCKET}[/bold purple]")
+    console.print("Commands run with writepyly are now handled here. Stop with Ctrl+C or \"writepyly daemon stop\".")
+    daemon.Daemon(execute).serve()
+
+def command_flush(args: list) -> None:
+    import time
+    from rich.console import Console
+    from journal import Journal
+    from outbox import Outbox
+    from session import WriteSession
+
+    console = Console()
+    workers = string_to_int(pop_option(args, "--workers", str(WORKERS)), "--workers")
+    outbox = Outbox()
+    if pop_flag(args, "--list"):
+        entries = outbox.entries()
+        for entry in entries:
+            console.print(f"[bold purple]{entry['id']}[/bold purple] {entry['title'] or 'untitled post'} -> {entry['collection'] or 'drafts'} on {entry['instance']}")
+            if entry["error"]:
+                console.print(f"	Failed {entry['attempts']} times, last with: {entry['error']}", style="red")
+        console.print(f"{len(entries)} posts queued.")
+        return
+
+    current_config = load_config(console)
+    pending = [entry for entry in outbox.entries() if entry["instance"] == current_config.instance]
+    if not pending:
+        console.print("Nothing to publish.")
+        return
+
+    def report(entry: dict, post_id: str, error: Exception) -> None:
+        if error is None:
+            console.print(f"{entry['title'] or entry['id']}: [bold purple]{post_id}[/bold purple]")
+        else:
+            console.print(f"{entry['title'] or entry['id']}: failed with error: {error}", style="bold red")
+
+    start = time.perf_counter()
+    published, failures = outbox.flush(
+        current_config.instance,
+        current_config.access_token,
+        session=WriteSession.from_config(current_config),
+        workers=workers,
+        on_result=report,
+        journal=Journal.from_config(current_config))
+    if not published and not failures:
+        console.print("Another flush is already publishing the outbox.", style="bold red")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    console.print(f"\nPublished [bold purple]{len(published)}[/bold purple] of {len(published) + len(failures)} in {elapsed:.2f}s.")
+    if failures:
+        console.print(f"{len(failures)} failed and stay queued for the next flush.", style="bold red")
+        sys.exit(1)
+
+# Maps each command to the function running it.
+COMMANDS = {
+    "help": command_help,
+    "login": command_login,
+    "logout": command_logout,
+    "post": command_post,
+    "get": command_get,
+    "sync": command_sync,
+    "search": command_search,
+    "delete": command_delete,
+    "move": command_move,
+    "pin": command_pin,
+    "unpin": command_unpin,
+    "export": command_export,
+    "import": command_import,
+    "sync-dir": command_sync_dir,
+    "batch": command_batch,
+    "daemon": command_daemon,
+    "flush": command_flush,
+}
+
+# Options accepted by every command, mapped to the setting they override.
+GLOBAL_OPTIONS = {
+    "--rate": ("rate", float),
+    "--retries": ("max_retries", int),
+    "--retry-budget": ("retry_budget", int),
+    "--host-concurrency": ("host_concurrency", int),
+}
+
+def apply_global_options(args: list) -> None:
+    """
+    Removes the options shared by every command from the argument list and
+    records them as overrides of the configuration.
+
+    Args:
+        args (list): Arguments to search, modified in place.
+    """
+    overrides = dict()
+    for option, (setting, convert) in GLOBAL_OPTIONS.items():
+        value = pop_option(args, option)
+        if value is not None:
+            overrides[setting] = string_to_int(value, option, convert)
+    if overrides:
+        from config import ConfigObj
+
+        ConfigObj.overrides.update(overrides)
+
+def run_command(args: list) -> None:
+    if not args:
+        command_tui(list())
+        return
+
+    command = COMMANDS.get(args[0].lower())
+    if command is None:
+        from rich.console import Console
+
+        Console().print("Entered arguments don't match known values. Run [bold]\"writepyly help\"[/bold] for instructions.", style="red")
+        return
+    command(args[1:])
+
+def execute(args: list) -> None:
+    """
+    Runs a command from its arguments, including the options shared by every
+    command. Used both by `main` and by the daemon.
+    """
+    apply_global_options(args)
+    trace = pop_flag(args, "--trace")
+    metrics_path = pop_option(args, "--metrics-json")
+    if not trace and metrics_path is None:
+        run_command(args)
+        return
+
+    import metrics
+
+    tracer = metrics.enable()
+    try:
+        run_command(args)
+    finally:
+        # Also reports the requests of commands that exited with an error.
+        if trace:
+            tracer.print_summary()
+        if metrics_path is not None:
+            tracer.write_json(metrics_path)
+
+# Commands always run in the calling process rather than in the daemon.
+LOCAL_COMMANDS = ("help", "daemon")
+
+def main():
+    args = sys.argv[1:]
+    local = pop_flag(args, "--no-daemon") or not args or args[0].lower() in LOCAL_COMMANDS
+    # Tracing measures this process' own connections.
+    local = local or "--trace" in args or "--metrics-json" in args
+    if not local and os.path.exists(DAEMON_SOCKET):
+        from daemon import STDIN_ARGUMENTS, forward
+
+        # Commands reading STDIN stream it from this process rather than
+        # copying all of it to the daemon first.
+        if not any(arg in STDIN_ARGUMENTS for arg in args):
+            code = forward(args)
+            if code is not None:
+                sys.exit(code)
+    execute(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,291 @@
+"""
+Request building and response parsing for the Write Freely API, shared by the
+synchronous (`WriteFreely`, `Post`, `Authenticator`) and asynchronous
+(`AsyncWriteFreely`) clients. Nothing in here touches the network.
+"""
+import json
+import re
+import zlib
+
+from typing import Iterable, Iterator
+
+# Characters read at a time when streaming a post body.
+CHUNK_SIZE = 65536
+
+# The rest of a JSON string up to its closing quote, escapes included.
+STRING_REST = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+
+
+class PostError(Exception):
+    """
+    Raised when the Write Freely instance doesn't accept a post.
+
+    Args:
+        message (str): What went wrong.
+        status_code (int): Status code of the response, if there was one.
+    """
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def base_url(instance: str) -> str:
+    """
+    Returns the root URL of an instance given by its domain name. An instance
+    that already includes a scheme, e.g. "http://localhost:8080" for a local
+    test server, is used as-is.
+
+    Args:
+        instance (str): Domain of the instance, e.g. "write.as".
+
+    Returns:
+        str: The instance's URL.
+    """
+    if "://" in instance:
+        return instance.rstrip("/")
+    return f"https://{instance}"
+
+
+def collection_url(instance: str, collection: str) -> str:
+    return f"{base_url(instance)}/api/collections/{collection}"
+
+
+def posts_url(instance: str, collection: str = None, page: int = None) -> str:
+    """
+    Returns the URL to list or create posts, either in a collection or
+    anonymously when no collection is given.
+    """
+    if not collection:
+        return f"{base_url(instance)}/api/posts"
+    url = f"{collection_url(instance, collection)}/posts"
+    if page is not None:
+        url = f"{url}?page={page}"
+    return url
+
+
+def collection_action_url(instance: str, collection: str, action: str) -> str:
+    """
+    Returns the URL of an action applied to many posts of a collection at
+    once: "collect" moves posts into it, "pin" and "unpin" change which of its
+    posts are pinned.
+    """
+    return f"{collection_url(instance, collection)}/{action}"
+
+
+def me_posts_url(instance: str) -> str:
+    return f"{base_url(instance)}/api/me/posts"
+
+
+def post_url(instance: str, post_id: str) -> str:
+    return f"{base_url(instance)}/api/posts/{post_id}"
+
+
+def login_url(instance: str) -> str:
+    return f"{base_url(instance)}/api/auth/login"
+
+
+def logout_url(instance: str) -> str:
+    return f"{base_url(instance)}/api/auth/me"
+
+
+def build_post_dto(body: str, title: str = None) -> str:
+    """
+    Puts together the JSON body of a request creating a post.
+
+    Args:
+        body (str): Content of the post.
+        title (str): Title of the post, if any.
+
+    Returns:
+        str: The serialized post.
+    """
+    # This will need to change a LOT.
+    post_dict = {"body": body}
+    if title is not None and title != "":
+        post_dict['title'] = title
+    return json.dumps(post_dict)
+
+
+def iter_post_dto(chunks: Iterable[str], title: str = None) -> Iterator[bytes]:
+    """
+    Streams the same JSON as `build_post_dto` while only holding one chunk of
+    the body in memory at a time.
+
+    Args:
+        chunks (Iterable[str]): Content of the post, piece by piece.
+        title (str): Title of the post, if any.
+
+    Yields:
+        bytes: Consecutive pieces of the serialized post.
+    """
+    yield b'{"body": "'
+    for chunk in chunks:
+        # Encoding each piece as its own JSON string and dropping the quotes
+        # gives exactly the escaping of the whole body.
+        yield json.dumps(chunk)[1:-1].encode("utf-8")
+    yield b'"'
+    if title is not None and title != "":
+        yield f', "title": {json.dumps(title)}'.encode("utf-8")
+    yield b'}'
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compresses a stream of bytes into a gzip stream as it's consumed.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def build_bulk_dto(action: str, post_ids: list, position: int = 1) -> str:
+    """
+    Puts together the JSON body of a request applying an action to many posts.
+
+    Args:
+        action (str): "collect", "pin" or "unpin".
+        post_ids (list): IDs of the posts, in order.
+        position (int): Position the first post is pinned at; the others
+            follow it in order.
+
+    Returns:
+        str: The serialized list of posts.
+    """
+    if action == "pin":
+        return json.dumps([{"id": post_id, "position": position + offset} for offset, post_id in enumerate(post_ids)])
+    return json.dumps([{"id": post_id} for post_id in post_ids])
+
+
+def parse_bulk_results(status_code: int, payload: dict, post_ids: list) -> list:
+    """
+    Pairs every post of a bulk request with its own result. The instance
+    answers for each post, in the order they were sent.
+
+    Returns:
+        list: Tuples of the post ID, the post as returned by the instance (or
+        `None`) and the error (or `None`).
+
+    Raises:
+        PostError: The instance rejected the whole request.
+    """
+    if status_code != 200:
+        raise PostError(f"Request unsuccessful with status code: {status_code}", status_code)
+
+    results = list()
+    answers = payload.get('data') or list()
+    for index, post_id in enumerate(post_ids):
+        answer = answers[index] if index < len(answers) else {"error_msg": "No result returned."}
+        if answer.get('code') == 200:
+            results.append((post_id, answer.get('post'), None))
+        else:
+            error = answer.get('error_msg') or f"status code {answer.get('code')}"
+            results.append((post_id, None, error))
+    return results
+
+
+def drop_bodies(chunks: Iterable[bytes]) -> bytes:
+    """
+    Reads a JSON response piece by piece, replacing the value of every
+    "body" string with `null` as it goes. A post echoed back by the instance
+    is then never held in memory, however large its content.
+
+    Args:
+        chunks (Iterable[bytes]): The response, piece by piece.
+
+    Returns:
+        bytes: The JSON without its bodies.
+    """
+    kept = bytearray()
+    in_string = dropping = escaped = False
+    # Start of the string being read, enough to tell whether it's "body".
+    current = bytearray()
+    last_string = None
+    for chunk in chunks:
+        index = 0
+        while index < len(chunk):
+            if not in_string:
+                quote = chunk.find(b'"', index)
+                if quote == -1:
+                    kept += chunk[index:]
+                    break
+                kept += chunk[index:quote]
+                # Only whitespace and a colon separate a key from its value.
+                dropping = last_string == b"body" and kept.rstrip().endswith(b":")
+                kept += b"null" if dropping else b'"'
+                in_string = True
+                current = bytearray()
+                index = quote + 1
+            elif escaped:
+                # The previous chunk ended with a backslash.
+                if not dropping:
+                    kept += chunk[index:index + 1]
+                escaped = False
+                index += 1
+            else:
+                end = STRING_REST.match(chunk, index).end()
+                if not dropping:
+                    kept += chunk[index:end]
+                    if len(current) < 8:
+                        current += chunk[index:min(end, index + 8)]
+                index = end
+                if index == len(chunk):
+                    break
+                if chunk[index:index + 1] == b"\\":
+                    # A backslash ending the chunk escapes the next one's start.
+                    escaped = True
+                    if not dropping:
+                        kept += b"\\"
+                else:
+                    if not dropping:
+                        kept += b'"'
+                    last_string = None if dropping else bytes(current)
+                    in_string = dropping = False
+                index += 1
+    return bytes(kept)
+
+
+def build_login_dto(user_name: str, password: str) -> str:
+    return json.dumps({"alias": user_name, "pass": password})
+
+
+def parse_page(status_code: int, payload: dict) -> list:
+    """
+    Extracts the posts from a page of a collection.
+
+    Args:
+        status_code (int): Status code of the response.
+        payload (dict): Decoded JSON body of the response, or `None` for a 404.
+
+    Returns:
+        list: The posts on the page. Empty once past the last page.
+    """
+    # Pages past the end of the collection come back as a 404.
+    if status_code == 404:
+        return list()
+    return payload.get('data').get('posts') or list()
+
+
+def parse_post_id(status_code: int, payload: dict) -> str:
+    """
+    Extracts the ID of a newly created post.
+
+    Raises:
+        PostError: The instance rejected the post or didn't return an ID.
+    """
+    if status_code != 201:
+        raise PostError(f"Post unsuccessful with status code: {status_code}", status_code)
+
+    post_id = payload.get('data').get('id')
+    if not post_id:
+        raise PostError(f"No post ID found. Full response was: {payload}", status_code)
+    return post_id
+
+
+def parse_access_token(payload: dict) -> str:
+    """
+    Extracts the access token from a successful login, or `None` if missing.
+    """
+    return (payload.get('data') or dict()).get('access_token')
@@ -0,0 +1,229 @@
+import asyncio
+import json
+
+from typing import AsyncIterator
+
+import aiohttp
+
+from __init__ import POOL_SIZE, TIMEOUT, WORKERS
+from api import (PostError, build_login_dto, build_post_dto, collection_url, login_url,
+    logout_url, parse_access_token, parse_page, parse_post_id, post_url, posts_url)
+from scheduler import Scheduler
+
+
+class AsyncWriteFreely:
+    """
+    asyncio counterpart of `WriteFreely` and `Post` for embedding in async
+    services. Requests share one aiohttp connection pool and at most `workers`
+    of them run at the same time. Unlike the CLI classes nothing is printed and
+    nothing exits: results are returned and failures raised.
+
+    Use it as an async context manager so the pool gets closed:
+
+        async with AsyncWriteFreely("write.as", token, collection="blog") as client:
+            post_id = await client.create_post("Hello!", title="First")
+    """
+    def __init__(self, instance: str, access_token: str = None, **kwargs):
+        self.instance = instance
+        self.access_token = access_token
+        self.collection = kwargs.get("collection")
+        self.pool_size = kwargs.get("pool_size", POOL_SIZE)
+        self.timeout = kwargs.get("timeout", TIMEOUT)
+        self.workers = kwargs.get("workers", WORKERS)
+        self.semaphore = asyncio.Semaphore(self.workers)
+        # Shares the sync client's rate limiting and retry rules.
+        self.scheduler = kwargs.get("scheduler") or Scheduler()
+        self.session = None
+
+    async def __aenter__(self) -> "AsyncWriteFreely":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """
+        Creates the connection pool. Called automatically by `async with`.
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"})
+
+    async def close(self) -> None:
+        """
+        Closes every pooled connection.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method: str, url: str, data: str = None) -> tuple:
+        """
+        Sends a request once a concurrency slot is free, retrying throttled
+        and failed attempts through the scheduler.
+
+        Returns:
+            tuple: The status code and the decoded JSON body, or `None` when the
+            response has no JSON body.
+        """
+        await self.open()
+        headers = dict()
+        if self.access_token:
+            headers["Authorization"] = f"Token {self.access_token}"
+
+        async def send() -> tuple:
+            async with self.semaphore:
+                async with self.session.request(method, url, data=data, headers=headers) as response:
+                    body = await response.read()
+                    try:
+                        payload = json.loads(body) if body else None
+                    except ValueError:
+                        # Error pages from proxies aren't always JSON.
+                        payload = None
+                    return response.status, response.headers, payload
+
+        status_code, _, payload = await self.scheduler.run_async(
+            method,
+            send,
+            connect_failed=lambda error: isinstance(error, aiohttp.ClientConnectorError))
+        return status_code, payload
+
+    async def check_collection(self) -> bool:
+        """
+        Checks that the collection exists.
+
+        Returns:
+            bool: Indicates if the collection exists (`True`) or not (`False`)
+        """
+        if not self.collection:
+            return False
+        status_code, _ = await self.request("GET", collection_url(self.instance, self.collection))
+        return status_code == 200
+
+    async def fetch_page(self, page: int) -> list:
+        """
+        Fetches a single page of posts from the collection.
+
+        Args:
+            page (int): Page number, starting at 1.
+
+        Returns:
+            list: The raw post dictionaries on that page. Empty once past the
+            last page.
+
+        Raises:
+            PostError: The instance answered with an error.
+        """
+        status_code, payload = await self.request("GET", posts_url(self.instance, self.collection, page))
+        if status_code not in (200, 404):
+            raise PostError(f"Failed to fetch page {page} with status code: {status_code}", status_code)
+        return parse_page(status_code, payload)
+
+    async def iter_posts(self, pages: int = 1) -> AsyncIterator[dict]:
+        """
+        Yields the raw posts of the collection newest first. Pages are fetched
+        concurrently, bounded by the semaphore, but always yielded in order.
+
+        Args:
+            pages (int): Maximum number of pages to read, or `None` for all of them.
+        """
+        page_size = 0
+        next_page = 1
+        in_flight = list()
+        try:
+            while True:
+                while len(in_flight) < self.workers and (pages is None or next_page <= pages):
+                    in_flight.append(asyncio.ensure_future(self.fetch_page(next_page)))
+                    next_page += 1
+                if not in_flight:
+                    return
+
+                page_posts = await in_flight.pop(0)
+                for single_post in page_posts:
+                    yield single_post
+
+                # An empty or short page means we've reached the end.
+                page_size = max(page_size, len(page_posts))
+                if len(page_posts) == 0 or len(page_posts) < page_size:
+                    return
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def get_posts(self, pages: int = 1) -> list:
+        """
+        Returns the posts of the collection newest first.
+
+        Args:
+            pages (int): Number of pages to read, or `None` for every page.
+        """
+        return [single_post async for single_post in self.iter_posts(pages=pages)]
+
+    async def create_post(self, body: str, title: str = None, collection: str = None) -> str:
+        """
+        Publishes a post to the given collection, the client's collection, or
+        anonymously when there is neither.
+
+        Returns:
+            str: The ID of the post.
+
+        Raises:
+            PostError: The instance rejected the post or didn't return an ID.
+        """
+        status_code, payload = await self.request(
+            "POST",
+            posts_url(self.instance, collection or self.collection),
+            data=build_post_dto(body, title))
+        return parse_post_id(status_code, payload)
+
+    async def update_post(self, post_id: str, body: str, title: str = None) -> bool:
+        """
+        Replaces the title and content of an existing post.
+
+        Returns:
+            bool: Indicates if the post was updated.
+        """
+        status_code, _ = await self.request(
+            "POST", post_url(self.instance, post_id), data=build_post_dto(body, title))
+        return status_code == 200
+
+    async def delete_post(self, post_id: str) -> bool:
+        """
+        Deletes a post via the post ID.
+
+        Returns:
+            bool: Indicates if the post was deleted.
+        """
+        status_code, _ = await self.request("DELETE", post_url(self.instance, post_id))
+        return status_code == 204
+
+    async def login(self, user_name: str, password: str) -> str:
+        """
+        Authenticates and uses the new access token for later requests. The
+        token isn't written to the local configuration.
+
+        Returns:
+            str: The access token, or `None` if authentication failed.
+        """
+        status_code, payload = await self.request(
+            "POST", login_url(self.instance), data=build_login_dto(user_name, password))
+        if status_code != 200 or payload is None:
+            return None
+        self.access_token = parse_access_token(payload)
+        return self.access_token
+
+    async def logout(self) -> bool:
+        """
+        Invalidates the current access token.
+
+        Returns:
+            bool: Indicates if the instance accepted the logout.
+        """
+        status_code, _ = await self.request("DELETE", logout_url(self.instance))
+        if status_code == 204:
+            self.access_token = None
+            return True
+        return False
@@ -1,35 +1,38 @@
-import json
 import sys
 
-import requests
-
+from api import build_login_dto, login_url, logout_url, parse_access_token
 from config import ConfigObj
 from rich.console import Console
+from session import WriteSession
 
 
 class Authenticator():
-    def __init__(self):
+    def __init__(self, session: WriteSession = None):
         self.console = Console()
+        self.session = session or WriteSession()
 
-    def supply_credentials(self, instance_name: str, user_name: str, password: str) -> None:
+    def supply_credentials(self, instance_name: str, user_name: str, password: str, profile: str = None) -> None:
         self.instance_name = instance_name
         self.user_name = user_name
         self.password = password
+        self.profile = profile
 
-    def remove_login(self, instance_name: str, access_token: str) -> None:
+    def remove_login(self, instance_name: str, access_token: str, profile: str = None) -> None:
         """
-        Invalidates an existing access token and removes the JSON file storing it.
+        Invalidates an existing access token and removes it from the JSON file
+        storing it.
 
         Args:
             instance_name (str): Name of the instance associated with the token.
             access_token (str): Value of the access token to invalidate.
+            profile (str): Profile the token belongs to, or `None` for the
+                default login.
         """
         # Invalidate the existing token.
-        logout_url = f"https://{instance_name}/api/auth/me"
-        print(f"Using logout URL: {logout_url}")
+        print(f"Using logout URL: {logout_url(instance_name)}")
         try:
-            logout_response = requests.delete(
-                url=logout_url,
+            logout_response = self.session.delete(
+                logout_url(instance_name),
                 headers={"Authorization": f"Token {access_token}"}
                 )
 
@@ -44,8 +47,9 @@ class Authenticator():
             print("Proceeding with removal of local files...")
 
         # Delete the local configuration.
+        self.session.clear_token()
         current_config = ConfigObj()
-        current_config.delete()
+        current_config.remove_login(profile)
 
     def new_login(self, write_stdout: bool = True):
         """
@@ -54,25 +58,21 @@ class Authenticator():
         if write_stdout:
             print(f"Attempting login with username {self.user_name}, password {self.password}, and instance {self.instance_name}")
         try:
-            login_url = f"https://{self.instance_name}/api/auth/login"
-            login_dto = json.dumps({"alias": self.user_name, "pass": self.password})
+            login_dto = build_login_dto(self.user_name, self.password)
             if write_stdout:
                 print(f"Login DTO is: {login_dto}")
-            auth_response = requests.post(
-                url=login_url,
-                data=login_dto,
-                headers={"Content-Type": "application/json"}
-                )
+            auth_response = self.session.post(login_url(self.instance_name), data=login_dto)
 
             if write_stdout:
                 print(f"JSON response is: {auth_response.json()}")
             if auth_response.status_code == 200:
-                access_token = auth_response.json().get('data').get('access_token')
+                access_token = parse_access_token(auth_response.json())
 
                 # Save the access token and instance.
                 if access_token:
                     current_config = ConfigObj()
-                    current_config.create(self.instance_name, access_token)
+                    current_config.create(self.instance_name, access_token, profile=getattr(self, "profile", None))
+                    self.session.set_token(access_token)
                 else:
                     if write_stdout:
                         self.console.print(f"[bold red]ERROR:[/bold red] Server response was 200 but no access token was provided.")
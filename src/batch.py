@@ -0,0 +1,241 @@
+import json
+import sys
+import threading
+
+from concurrent.futures import Future
+
+from typing import Iterable, Iterator, TextIO
+
+from __init__ import WORKERS
+from api import PostError
+from bulk import apply_in_chunks, run_concurrently
+from cache import CollectionCache
+from client import WriteFreely
+from journal import Journal
+from post import Post, split_title
+from session import WriteSession
+
+# Operations understood in a batch file.
+OPERATIONS = ("post", "get", "delete", "move", "pin", "unpin")
+
+
+def read_operations(lines: Iterable[str]) -> Iterator[tuple]:
+    """
+    Reads operations from a batch file, one JSON object per line. Blank lines
+    are skipped. Lines that aren't valid JSON objects are passed on as errors
+    so they're reported like any other failure.
+
+    Yields:
+        tuple: The line number and the operation (or the error).
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            operation = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(operation, dict):
+            yield line_number, ValueError("Each line must be a JSON object.")
+            continue
+        yield line_number, operation
+
+
+class BatchRunner:
+    """
+    Runs the operations of a batch file in a single process, sharing one
+    pooled session per profile and the collection cache between them.
+    Operations are independent of each other and run concurrently; a result
+    is written as one JSON line as soon as its operation completes, so the
+    results come back in completion order with the line they answer. Since
+    the batch already keeps the workers busy, an operation spanning several
+    requests (pages of a `get`, chunks of a `move`) sends them one after the
+    other.
+    """
+    def __init__(self, config, profiles: dict, workers: int = WORKERS, verify: bool = True):
+        self.config = config
+        self.profiles = profiles
+        self.workers = workers
+        self.verify = verify
+        self.cache = CollectionCache.from_config(config)
+        self.journal = Journal.from_config(config)
+        self.sessions = dict()
+        self.checked = dict()
+        self.lock = threading.Lock()
+        self.check_lock = threading.Lock()
+        self.deleted = list()
+        self.published = list()
+        self.moved = list()
+
+    def client(self, operation: dict, collection: str = None) -> WriteFreely:
+        """
+        Returns a client for the operation's profile ("default" unless given),
+        sharing the profile's session.
+        """
+        profile_name = operation.get("profile", "default")
+        profile = self.profiles.get(profile_name)
+        if profile is None:
+            raise ValueError(f"Unknown profile: {profile_name}")
+        with self.lock:
+            if profile_name not in self.sessions:
+                self.sessions[profile_name] = WriteSession.from_config(self.config, profile["access_token"])
+        return WriteFreely(
+            profile["instance"],
+            profile["access_token"],
+            collection=collection,
+            session=self.sessions[profile_name],
+            cache=self.cache)
+
+    def check(self, write_client: WriteFreely) -> None:
+        """
+        Makes sure the client's collection exists, checking each collection
+        only once per batch. Different collections are checked concurrently;
+        operations on a collection being checked wait for its answer.
+
+        Raises:
+            PostError: The collection doesn't exist.
+        """
+        if not self.verify or not write_client.collection:
+            return
+        key = (write_client.instance, write_client.collection)
+        with self.check_lock:
+            checked = self.checked.get(key)
+            first = checked is None
+            if first:
+                checked = self.checked[key] = Future()
+        if first:
+            try:
+                checked.set_result(write_client.collection_exists())
+            except Exception as e:
+                # Let a later operation try again.
+                with self.check_lock:
+                    del self.checked[key]
+                checked.set_exception(e)
+        if not checked.result():
+            raise PostError(f"Collection {write_client.collection} is not valid.")
+
+    def run_post(self, operation: dict) -> dict:
+        write_client = self.client(operation, operation.get("collection"))
+        self.check(write_client)
+        if "file" in operation:
+            with open(operation["file"], "r") as post_file:
+                post_title, post_content = split_title(post_file.read())
+        else:
+            post_title, post_content = None, operation["body"]
+        current_post = Post(
+            post_content,
+            write_client.instance,
+            write_client.access_token,
+            collection=write_client.collection,
+            title=operation.get("title") or post_title,
+            session=write_client.session,
+            journal=self.journal)
+        post_id = current_post.submit()
+        if write_client.collection:
+            with self.lock:
+                self.published.append((write_client.instance, write_client.collection, current_post.published))
+        return {"id": post_id}
+
+    def run_get(self, operation: dict) -> dict:
+        write_client = self.client(operation, operation["collection"])
+        self.check(write_client)
+        pages = None if operation.get("all") else operation.get("pages", 1)
+        posts = list(write_client.iter_posts(pages=pages, workers=1))
+        fields = operation.get("fields")
+        if fields:
+            posts = [{field: post.get(field) for field in fields} for post in posts]
+        return {"posts": posts}
+
+    def run_delete(self, operation: dict) -> dict:
+        write_client = self.client(operation)
+        status_code = write_client.remove_post(operation["id"])
+        if status_code != 204:
+            raise PostError(f"Delete unsuccessful with status code: {status_code}")
+        with self.lock:
+            self.deleted.append((write_client.instance, operation["id"]))
+        return {"deleted": operation["id"]}
+
+    def run_apply(self, operation: dict, action: str, key: str) -> dict:
+        """
+        Applies an action to the operation's posts, given as "ids" or a single
+        "id", with batched requests. Posts that failed are listed under
+        "failed" with their errors, which fails the operation too.
+        """
+        write_client = self.client(operation, operation["collection"])
+        self.check(write_client)
+        post_ids = operation["ids"] if "ids" in operation else [operation["id"]]
+        succeeded = list()
+        failed = dict()
+        for post_id, post, error in apply_in_chunks(write_client, action, post_ids, self.config.batch_size, workers=1):
+            if error is None:
+                succeeded.append(post_id)
+                if action == "collect":
+                    with self.lock:
+                        self.moved.append((write_client.instance, write_client.collection, post_id, post))
+            else:
+                failed[post_id] = str(error)
+        result = {key: succeeded}
+        if failed:
+            result["failed"] = failed
+        return result
+
+    def run_move(self, operation: dict) -> dict:
+        return self.run_apply(operation, "collect", "moved")
+
+    def run_pin(self, operation: dict) -> dict:
+        return self.run_apply(operation, "pin", "pinned")
+
+    def run_unpin(self, operation: dict) -> dict:
+        return self.run_apply(operation, "unpin", "unpinned")
+
+    def run_operation(self, item: tuple) -> dict:
+        """
+        Runs a single operation.
+
+        Args:
+            item (tuple): The line number and the operation.
+
+        Returns:
+            dict: The fields specific to the operation's result.
+        """
+        _, operation = item
+        if isinstance(operation, Exception):
+            raise operation
+        name = operation.get("op")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}. Must be one of: {', '.join(OPERATIONS)}")
+        try:
+            return getattr(self, f"run_{name}")(operation)
+        except KeyError as e:
+            raise ValueError(f"Missing field for {name}: {e}")
+
+    def run(self, lines: Iterable[str], output: TextIO = None) -> int:
+        """
+        Runs every operation, writing one JSON result per line to `output`.
+
+        Returns:
+            int: The number of operations that failed.
+        """
+        output = output or sys.stdout
+        failures = 0
+        for item, result, error in run_concurrently(self.run_operation, read_operations(lines), self.workers):
+            line_number, operation = item
+            record = {"line": line_number}
+            if isinstance(operation, dict):
+                record["op"] = operation.get("op")
+                if "ref" in operation:
+                    record["ref"] = operation["ref"]
+            if error is None:
+                # Operations on many posts succeed only if all of them did.
+                record["ok"] = "failed" not in result
+                record.update(result)
+                if not record["ok"]:
+                    failures += 1
+            else:
+                failures += 1
+                record["ok"] = False
+                record["error"] = str(error)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+        return failures
@@ -0,0 +1,282 @@
+import asyncio
+import os
+import subprocess
+import uuid
+
+from collections import OrderedDict
+from typing import Callable
+
+from rich.console import Console
+from rich.markdown import Markdown
+from rich.markup import escape
+from rich.table import Table
+
+from async_client import AsyncWriteFreely
+from client import summarize_title
+from journal import Journal
+from post import split_title
+
+from __init__ import TEMP_BASE
+
+# Lines of the screen taken by everything but the rows: the table's header
+# and borders, the footer and the prompt.
+CHROME_LINES = 9
+# Fewest rows shown, however small the terminal.
+MIN_ROWS = 5
+
+
+def describe_error(error: Exception) -> str:
+    """
+    Returns a message for an error that can always be printed. Some
+    exceptions fail in `str()`, and a failing error message mustn't take the
+    TUI down with it.
+    """
+    try:
+        message = str(error)
+    except Exception:
+        message = ""
+    return message or type(error).__name__
+
+
+class PostBrowser:
+    """
+    Scrollable list of the posts in a collection for the TUI. Only the rows
+    that fit on the screen are rendered, and the pages of the API holding them
+    are fetched when they first come into view, with the next one prefetched
+    in the background. Pages far from the window are dropped, so memory and
+    render time depend on the size of the terminal, not of the collection.
+
+    Args:
+        client (AsyncWriteFreely): Client for the collection to browse.
+        console (Console): rich `Console` object to render with.
+        read_input (Callable): Coroutine function reading a line from the user.
+        first_page (list): Posts of the first page when already fetched.
+        journal (Journal): Journal to forget deleted posts from, if any.
+    """
+    def __init__(self, client: AsyncWriteFreely, console: Console, read_input: Callable, first_page: list = None, journal: Journal = None):
+        self.client = client
+        self.journal = journal
+        self.console = console
+        self.read_input = read_input
+        self.pages = OrderedDict()
+        self.pending = dict()
+        # Posts per page of the API, learned from the first page.
+        self.page_size = None
+        # Number of the last page, once a short or empty one has been seen.
+        self.last_page = None
+        self.start = 0
+        if first_page is not None:
+            self.store_page(1, first_page)
+
+    @property
+    def rows(self) -> int:
+        return max(MIN_ROWS, self.console.size.height - CHROME_LINES)
+
+    def store_page(self, page: int, posts: list) -> None:
+        if self.page_size is None and posts:
+            self.page_size = len(posts)
+        if self.page_size is None or len(posts) < self.page_size:
+            self.last_page = page if posts else page - 1
+        self.pages[page] = posts
+
+    def fetch(self, page: int) -> asyncio.Future:
+        """
+        Returns the task fetching a page, starting it unless it's already
+        running.
+        """
+        if page not in self.pending:
+            task = asyncio.ensure_future(self.client.fetch_page(page))
+            # A prefetch that failed is retried when its page is needed.
+            task.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+            self.pending[page] = task
+        return self.pending[page]
+
+    async def load(self, page: int) -> list:
+        """
+        Returns the posts of a page, fetching it if needed.
+        """
+        if page in self.pages:
+            self.pages.move_to_end(page)
+            return self.pages[page]
+        try:
+            posts = await self.fetch(page)
+        finally:
+            self.pending.pop(page, None)
+        self.store_page(page, posts)
+        return posts
+
+    def page_of(self, index: int) -> int:
+        return index // (self.page_size or 10) + 1
+
+    async def window(self) -> list:
+        """
+        Returns the posts in view, fetching the pages they're on concurrently
+        and prefetching the page after them.
+
+        Returns:
+            list: Tuples of the index and the post for every row in view.
+        """
+        if self.page_size is None:
+            # The size of the pages is needed to tell which ones are in view.
+            await self.load(1)
+        if self.page_size is None:
+            return list()
+        first, last = self.page_of(self.start), self.page_of(self.start + self.rows - 1)
+        if self.last_page is not None:
+            last = min(last, self.last_page)
+        pages = list(range(first, last + 1))
+        loaded = await asyncio.gather(*(self.load(page) for page in pages))
+
+        # Keep the pages in view and their neighbours, and nothing else.
+        for page in list(self.pages):
+            if page < first - 1 or page > last + 1:
+                del self.pages[page]
+        for page in list(self.pending):
+            if page < first - 1 or page > last + 1:
+                self.pending.pop(page).cancel()
+        if self.last_page is None or last < self.last_page:
+            if last + 1 not in self.pages:
+                self.fetch(last + 1)
+
+        rows = list()
+        for page, posts in zip(pages, loaded):
+            for offset, post in enumerate(posts):
+                index = (page - 1) * self.page_size + offset
+                if self.start <= index < self.start + self.rows:
+                    rows.append((index, post))
+        return rows
+
+    def render(self, rows: list) -> None:
+        table = Table(title=f"Posts in {escape(self.client.collection)}", title_style="bold purple", expand=True)
+        table.add_column("#", justify="right", style="bold")
+        table.add_column("Title", overflow="ellipsis", no_wrap=True, ratio=1)
+        table.add_column("Created", no_wrap=True)
+        table.add_column("ID", no_wrap=True)
+        for index, post in rows:
+            table.add_row(str(index + 1), escape(summarize_title(post)), post.get("created") or "", post.get("id") or "")
+        self.console.print(table)
+        if rows:
+            total = ""
+            if self.last_page in self.pages:
+                total = f" of {(self.last_page - 1) * self.page_size + len(self.pages[self.last_page])}"
+            self.console.print(f"Posts {rows[0][0] + 1}-{rows[-1][0] + 1}{total}.", style="dim")
+        self.console.print("[bold]n[/bold]ext, [bold]p[/bold]revious, [bold]t[/bold]op, a number to select a post, [bold]q[/bold] to go back")
+
+    async def run(self) -> None:
+        """
+        Shows the browser until the user goes back to the menu.
+        """
+        try:
+            await self.browse()
+        finally:
+            for task in self.pending.values():
+                task.cancel()
+
+    async def browse(self) -> None:
+        while True:
+            try:
+                rows = await self.window()
+            except Exception as e:
+                self.console.print(f"Failed to retrieve posts with error: {describe_error(e)}", style="bold red")
+                return
+            if not rows and self.start > 0:
+                # Scrolled past the end, e.g. after deleting the last post.
+                self.start = max(0, self.start - self.rows)
+                continue
+            self.render(rows)
+            command = (await self.read_input()).strip().lower()
+            if command in ("q", "quit", ""):
+                return
+            elif command in ("n", "next"):
+                if len(rows) == self.rows:
+                    self.start += self.rows
+            elif command in ("p", "previous"):
+                self.start = max(0, self.start - self.rows)
+            elif command in ("t", "top"):
+                self.start = 0
+            elif command.isdigit() and any(index == int(command) - 1 for index, _ in rows):
+                await self.select(dict(rows)[int(command) - 1], int(command) - 1)
+            else:
+                self.console.print(f"[bold red]{escape(command)} is not valid!")
+
+    async def select(self, post: dict, index: int) -> None:
+        """
+        Asks what to do with the selected post.
+        """
+        self.console.print(f"[bold purple]{escape(summarize_title(post))}[/bold purple] ({post.get('id')})")
+        self.console.print("[bold]v[/bold]iew, [bold]e[/bold]dit, [bold]d[/bold]elete, [bold]b[/bold]ack")
+        action = (await self.read_input()).strip().lower()
+        if action in ("v", "view"):
+            if post.get("title"):
+                self.console.rule(f"[bold purple]{escape(post['title'])}", style="purple")
+            self.console.print(Markdown(post.get("body") or ""))
+            self.console.rule(style="purple")
+        elif action in ("e", "edit"):
+            await self.edit(post)
+        elif action in ("d", "delete"):
+            await self.delete(post, index)
+
+    async def delete(self, post: dict, index: int) -> None:
+        self.console.print(f"Delete [bold purple]{post.get('id')}[/bold purple]? (y/n)")
+        if (await self.read_input()).strip().lower() not in ("y", "yes"):
+            return
+        try:
+            deleted = await self.client.delete_post(post.get("id"))
+        except Exception as e:
+            self.console.print(f"Failed to delete {post.get('id')} with error: {describe_error(e)}", style="bold red")
+            return
+        if not deleted:
+            self.console.print(f"Unable to delete post: {post.get('id')}", style="bold red")
+            return
+        self.console.print(f"Deleted post: [bold purple]{post.get('id')}[/bold purple]")
+        if self.journal is not None:
+            self.journal.forget(self.client.instance, post.get("id"))
+        # Every later post moves up a row, so their pages are fetched again.
+        page = self.page_of(index)
+        for known in [known for known in self.pages if known >= page]:
+            del self.pages[known]
+        for known in [known for known in self.pending if known >= page]:
+            self.pending.pop(known).cancel()
+        self.last_page = None
+
+    async def edit(self, post: dict) -> None:
+        """
+        Opens the post in the user's editor and saves the changes to the
+        instance.
+        """
+        if not os.environ.get("EDITOR"):
+            self.console.print("No [bold red]EDITOR[/bold red] found. Be sure this environment variable is set for Unix goodness!")
+            return
+        temp_file = f"{TEMP_BASE}/writepyly_{uuid.uuid4()}.md"
+        original = (f"# {post['title']}\n" if post.get("title") else "") + (post.get("body") or "")
+        with open(temp_file, "w") as file:
+            file.write(original)
+        try:
+            editor_result = await asyncio.to_thread(subprocess.run, [os.environ["EDITOR"], temp_file])
+            if editor_result.returncode != 0:
+                self.console.print(f"Aborting. Editor exited with code: {editor_result.returncode}", style="bold red")
+                return
+            with open(temp_file, "r") as file:
+                content = file.read()
+            if content == original:
+                self.console.print("No changes made.")
+                return
+            post_title, post_body = split_title(content)
+            try:
+                updated = await self.client.update_post(post.get("id"), post_body, title=post_title)
+            except Exception as e:
+                self.console.print(f"Failed to update {post.get('id')} with error: {describe_error(e)}", style="bold red")
+                self.console.print(f"Its content is still in: {temp_file}", style="bold red")
+                temp_file = None
+                return
+            if not updated:
+                self.console.print(f"Unable to update post: {post.get('id')}", style="bold red")
+                self.console.print(f"Its content is still in: {temp_file}", style="bold red")
+                temp_file = None
+                return
+            # Show the edit right away without fetching the page again.
+            post["title"], post["body"] = post_title, post_body
+            self.console.print(f"Updated post: [bold purple]{post.get('id')}[/bold purple]")
+        finally:
+            if temp_file is not None:
+                os.remove(temp_file)
@@ -0,0 +1,290 @@
+import glob
+import json
+import os
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, TextIO
+
+from rich.console import Console
+
+from __init__ import BATCH_SIZE, WORKERS
+from client import WriteFreely
+from journal import Journal
+from post import Post, split_title
+from session import WriteSession
+
+# Verb and past participle describing each action of `Bulk.apply`.
+ACTIONS = {
+    "collect": ("move", "Moved"),
+    "pin": ("pin", "Pinned"),
+    "unpin": ("unpin", "Unpinned"),
+}
+
+
+def run_concurrently(task: Callable, items: Iterable, workers: int = WORKERS) -> Iterator[tuple]:
+    """
+    Runs `task` on every item with a bounded pool of threads, yielding results
+    as they complete. Exceptions are collected instead of stopping the batch.
+    Items are pulled from `items` only as workers free up, so a long generator
+    is never held in memory all at once.
+
+    Args:
+        task (Callable): Function called with a single item.
+        items (Iterable): Items to process.
+        workers (int): Maximum number of tasks running at the same time.
+
+    Yields:
+        tuple: The item, the task's result (or `None`) and the exception
+        raised (or `None`).
+    """
+    items = iter(items)
+    pending = dict()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Keep a couple of items queued per worker so none of them idle.
+            for item in items:
+                pending[executor.submit(task, item)] = item
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+
+
+def expand_paths(pattern: str) -> list:
+    """
+    Expands a directory or glob pattern into the Markdown files it names.
+
+    Args:
+        pattern (str): A directory, which selects every `.md` file in it, or a glob.
+
+    Returns:
+        list: Sorted paths of the matching files.
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.md")
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def read_ids(lines: TextIO) -> list:
+    """
+    Reads post IDs, one per line. Blank lines and comments starting with `#`
+    are skipped. The output of `writepyly get` is accepted too, in which case
+    only the values of the `ID:` lines are used, and so is the output of
+    `writepyly get --format ndjson`, using the `id` of every object.
+
+    Args:
+        lines (TextIO): File or STDIN to read from.
+
+    Returns:
+        list: The post IDs in the order they were read, without duplicates.
+    """
+    # Keys keep the order the IDs were read in.
+    post_ids = dict()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            line = json.loads(line).get("id")
+            if not line:
+                continue
+        elif ":" in line:
+            label, value = line.split(":", 1)
+            if label.strip() != "ID":
+                continue
+            line = value.strip()
+        post_ids[line] = None
+    return list(post_ids)
+
+
+def chunked(items: list, size: int) -> Iterator[tuple]:
+    """
+    Splits a list into consecutive chunks of at most `size` items.
+
+    Yields:
+        tuple: The index of the chunk's first item and the chunk.
+    """
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def apply_in_chunks(write_client: WriteFreely, action: str, post_ids: list, batch_size: int = BATCH_SIZE, workers: int = WORKERS) -> Iterator[tuple]:
+    """
+    Applies an action to many posts of a collection with as few requests as
+    possible: the IDs are split into chunks of `batch_size`, each sent as a
+    single request, with up to `workers` requests in flight at once. Pinned
+    posts keep the order they were given in across chunks.
+
+    Args:
+        write_client (WriteFreely): Client for the collection.
+        action (str): "collect", "pin" or "unpin".
+        post_ids (list): IDs of the posts.
+        batch_size (int): Most posts sent in a single request.
+        workers (int): Maximum number of requests sent at the same time.
+
+    Yields:
+        tuple: The post ID, the post as returned by the instance (or `None`)
+        and the error (or `None`) for every post, a chunk at a time as they
+        complete. A request that failed as a whole fails each of its posts.
+    """
+    results = run_concurrently(
+        lambda chunk: write_client.apply_to_posts(action, chunk[1], position=chunk[0] + 1),
+        chunked(post_ids, max(1, batch_size)),
+        workers)
+    for (_, chunk), chunk_results, error in results:
+        if error is None:
+            yield from chunk_results
+        else:
+            for post_id in chunk:
+                yield post_id, None, error
+
+
+class Bulk:
+    """
+    Runs the same operation against many posts at once over a shared session.
+    """
+    def __init__(self, instance: str, access_token: str, session: WriteSession = None, workers: int = WORKERS, journal: Journal = None, force: bool = False):
+        self.instance = instance
+        self.access_token = access_token
+        self.session = session or WriteSession(access_token)
+        self.workers = workers
+        # Keeps reruns from publishing the same post twice, unless `force`.
+        self.journal = journal
+        self.force = force
+        self.console = Console()
+
+    def publish_file(self, path: str, collection: str = None) -> str:
+        """
+        Publishes a single Markdown file, using a leading heading as the title.
+
+        Args:
+            path (str): Path of the file to publish.
+            collection (str): Collection to publish to, if any.
+
+        Returns:
+            str: The ID of the new post.
+        """
+        with open(path, "r") as file:
+            post_title, post_content = split_title(file.read())
+        current_post = Post(
+            post_content,
+            self.instance,
+            self.access_token,
+            collection=collection,
+            title=post_title,
+            session=self.session,
+            journal=self.journal,
+            force=self.force)
+        return current_post.submit()
+
+    def publish(self, paths: list, collection: str = None) -> list:
+        """
+        Publishes many Markdown files concurrently, printing each post ID as it
+        is created and a throughput summary at the end.
+
+        Args:
+            paths (list): Paths of the files to publish.
+            collection (str): Collection to publish to, if any.
+
+        Returns:
+            list: Tuples of the path and error for every file that failed.
+        """
+        failures = list()
+        start = time.perf_counter()
+        results = run_concurrently(
+            lambda path: self.publish_file(path, collection), paths, self.workers)
+        for path, post_id, error in results:
+            if error is None:
+                self.console.print(f"{path}: [bold purple]{post_id}[/bold purple]")
+            else:
+                failures.append((path, error))
+                self.console.print(f"{path}: failed with error: {error}", style="bold red")
+
+        self.print_summary("Published", len(paths), failures, time.perf_counter() - start)
+        return failures
+
+    def delete(self, post_ids: list) -> tuple:
+        """
+        Deletes many posts concurrently, printing the result for each as it
+        arrives and a summary at the end.
+
+        Args:
+            post_ids (list): IDs of the posts to remove.
+
+        Returns:
+            tuple: The list of deleted IDs and the list of tuples of the ID and
+            error for every post that couldn't be deleted.
+        """
+        write_client = WriteFreely(self.instance, self.access_token, session=self.session)
+        deleted = list()
+        failures = list()
+        start = time.perf_counter()
+        for post_id, status_code, error in run_concurrently(write_client.remove_post, post_ids, self.workers):
+            if error is None and status_code == 204:
+                deleted.append(post_id)
+                self.console.print(f"Deleted: [bold purple]{post_id}[/bold purple]")
+            else:
+                if error is None:
+                    error = f"status code {status_code}"
+                failures.append((post_id, error))
+                self.console.print(f"Failed to delete {post_id}: {error}", style="bold red")
+
+        self.print_summary("Deleted", len(post_ids), failures, time.perf_counter() - start)
+        return deleted, failures
+
+    def apply(self, action: str, post_ids: list, collection: str, batch_size: int = BATCH_SIZE) -> tuple:
+        """
+        Moves, pins or unpins many posts with batched requests sent
+        concurrently, printing the result for each post as it arrives and a
+        summary at the end.
+
+        Args:
+            action (str): "collect" to move the posts into the collection,
+                "pin" or "unpin".
+            post_ids (list): IDs of the posts.
+            collection (str): Collection to move the posts into, or to pin
+                them to or unpin them from.
+            batch_size (int): Most posts sent in a single request.
+
+        Returns:
+            tuple: The list of posts as returned by the instance for every
+            post that succeeded (or `None` when the instance didn't return
+            it) along with their IDs, and the list of tuples of the ID and
+            error for every post that failed.
+        """
+        verb, past = ACTIONS[action]
+        write_client = WriteFreely(self.instance, self.access_token, collection=collection, session=self.session)
+        succeeded = list()
+        failures = list()
+        start = time.perf_counter()
+        for post_id, post, error in apply_in_chunks(write_client, action, post_ids, batch_size, self.workers):
+            if error is None:
+                succeeded.append((post_id, post))
+                self.console.print(f"{past}: [bold purple]{post_id}[/bold purple]")
+            else:
+                failures.append((post_id, error))
+                self.console.print(f"Failed to {verb} {post_id}: {error}", style="bold red")
+
+        self.print_summary(past, len(post_ids), failures, time.perf_counter() - start)
+        return succeeded, failures
+
+    def print_summary(self, action: str, total: int, failures: list, elapsed: float) -> None:
+        """
+        Prints how many items succeeded and failed and the overall throughput.
+        """
+        succeeded = total - len(failures)
+        rate = succeeded / elapsed if elapsed > 0 else 0
+        self.console.print(f"\n{action} [bold purple]{succeeded}[/bold purple] of {total} in {elapsed:.2f}s ({rate:.1f}/s).")
+        if failures:
+            self.console.print(f"{len(failures)} failed:", style="bold red")
+            for item, error in failures:
+                self.console.print(f"\t{item}: {error}", style="red")
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+
+from __init__ import COLLECTION_CACHE_PATH, COLLECTION_TTL, NEGATIVE_TTL
+
+
+class CollectionCache:
+    """
+    Remembers which collections were found to be valid (or invalid) so that
+    they don't need to be checked against the instance before every command.
+    """
+    # Caches kept in memory across commands by the daemon, keyed by path.
+    # `None` outside of the daemon.
+    shared = None
+
+    def __init__(self, ttl: float = COLLECTION_TTL, negative_ttl: float = NEGATIVE_TTL, path: str = COLLECTION_CACHE_PATH):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self.entries = None
+        # Checks may be looked up and stored from several threads at once.
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "CollectionCache":
+        """
+        Creates a cache using the TTLs of a loaded `ConfigObj`.
+        """
+        if cls.shared is None:
+            return cls(ttl=config.collection_ttl, negative_ttl=config.negative_ttl)
+        cache = cls.shared.setdefault(COLLECTION_CACHE_PATH, cls())
+        cache.ttl, cache.negative_ttl = config.collection_ttl, config.negative_ttl
+        return cache
+
+    def load(self) -> dict:
+        """
+        Reads the cache file once, ignoring it if it's missing or unreadable.
+        """
+        if self.entries is None:
+            self.entries = dict()
+            if os.path.isfile(self.path):
+                try:
+                    with open(self.path, "r") as cache_file:
+                        self.entries = json.load(cache_file)
+                except Exception:
+                    pass
+        return self.entries
+
+    def lookup(self, instance: str, collection: str):
+        """
+        Looks up a previous check of a collection.
+
+        Returns:
+            bool: Whether the collection was valid, or `None` if it hasn't been
+            checked or the result has expired.
+        """
+        # Read under the same lock as `store`, which may be loading the file or
+        # adding an entry from another thread.
+        with self.lock:
+            entry = self.load().get(f"{instance}/{collection}")
+        if entry is None:
+            return None
+        ttl = self.ttl if entry.get("valid") else self.negative_ttl
+        if time.time() - entry.get("checked", 0) > ttl:
+            return None
+        return entry.get("valid")
+
+    def store(self, instance: str, collection: str, valid: bool) -> None:
+        """
+        Records the result of checking a collection.
+        """
+        with self.lock:
+            entries = self.load()
+            entries[f"{instance}/{collection}"] = {"valid": valid, "checked": time.time()}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # Write to a temporary file first so a crash never leaves a torn file.
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w") as cache_file:
+                    json.dump(entries, cache_file)
+                os.replace(temp_path, self.path)
+            except Exception:
+                # The cache is only an optimization; the check already succeeded.
+                pass
@@ -1,35 +1,79 @@
-import requests
 import sys
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
 from rich.console import Console
 
+from __init__ import WORKERS
+from api import (build_bulk_dto, collection_action_url, collection_url, parse_bulk_results,
+    parse_page, post_url, posts_url)
+from session import WriteSession
+
+
+def summarize_title(post: dict) -> str:
+    """
+    Returns the title of a post, or the start of its body when it has none.
+
+    Args:
+        post (dict): Post as returned by the API.
+
+    Returns:
+        str: Title to display, at most 50 characters when taken from the body.
+    """
+    if post.get('title'):
+        return post.get('title')
+    elif len(post.get('body')) <= 50:
+        return post.get('body').strip().replace("\n", " ")
+    else:
+        return post.get('body')[0:47].strip().replace("\n", " ") + "..."
+
 
 class WriteFreely:
     def __init__(self, instance: str, access_token: str, **kwargs):
         self.instance = instance
         self.access_token = access_token
-        if kwargs.get("collection"):
-            self.collection = kwargs.get("collection")
+        self.collection = kwargs.get("collection")
+        # Reuse the caller's pooled session when given one so that all calls
+        # in a command share a single keep-alive connection.
+        self.session = kwargs.get("session") or WriteSession(access_token)
+        # Optional `CollectionCache` remembering earlier checks.
+        self.cache = kwargs.get("cache")
         self.console = Console()
 
+    def collection_exists(self) -> bool:
+        """
+        Asks the instance whether the collection exists, without printing
+        anything. When the client has a cache, a recent answer is reused
+        instead of asking the instance again.
+
+        Returns:
+            bool: Whether the collection exists.
+        """
+        valid = None
+        if self.cache is not None:
+            valid = self.cache.lookup(self.instance, self.collection)
+        if valid is None:
+            # Get the user's collections and validate that this is one of them.
+            collection_response = self.session.get(collection_url(self.instance, self.collection))
+            valid = collection_response.status_code == 200
+            if self.cache is not None:
+                self.cache.store(self.instance, self.collection, valid)
+        return valid
+
     def check_collection(self) -> bool:
         """
         Checks for the presence of a collection to assert that a specified
-        collection is valid.
+        collection is valid. When the client has a cache, a recent answer is
+        reused instead of asking the instance again.
 
         Returns:
             bool: Indicates if the client exists (`True`) or not (`False`)
         """
         if self.collection:
             try:
-                collection_url = f"https://{self.instance}/api/collections/{self.collection}"
-                # Get the user's collections and validate that this is one of them.
-                collection_response = requests.get(
-                    url=collection_url,
-                    headers={"Content-Type": "application/json",
-                        "Authorization": f"Token {self.access_token}"})
-
-                if collection_response.status_code != 200:
+                if not self.collection_exists():
                     self.console.print(f"Error: Specified collection of {self.collection} is not valid!", style="bold red")
                     self.console.print(f"Are you sure you have the correct name for your collection?")
                     return False
@@ -42,51 +86,122 @@ class WriteFreely:
         else:
             return False
 
-    def get_posts(self):
+    def fetch_page(self, page: int) -> list:
         """
-        Gets the posts from a collection, printing their titles, IDs, and
-        publication dates. Content will be sorted with the newest posts appearing
-        first. The first 10 posts are returned, matching what the API responds with.
+        Fetches a single page of posts from the collection.
+
+        Args:
+            page (int): Page number, starting at 1.
+
+        Returns:
+            list: The raw post dictionaries on that page. Empty once past the
+            last page.
+        """
+        page_response = self.session.get(posts_url(self.instance, self.collection, page))
+        if page_response.status_code == 404:
+            return parse_page(404, None)
+        page_response.raise_for_status()
+        return parse_page(page_response.status_code, page_response.json())
+
+    def iter_posts(self, pages: int = 1, workers: int = WORKERS) -> Iterator[dict]:
+        """
+        Yields the raw posts of the collection newest first, page by page.
+        Pages are fetched concurrently by a bounded pool of workers but always
+        yielded in order, so posts stream out as soon as their page arrives.
+
+        Args:
+            pages (int): Maximum number of pages to read, or `None` for all of them.
+            workers (int): Maximum number of pages requested at the same time.
         """
-        post_url = f"https://{self.instance}/api/collections/{self.collection}/posts"
+        page_size = 0
+        next_page = 1
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    # Keep the window of requested pages full.
+                    while len(in_flight) < workers and (pages is None or next_page <= pages):
+                        in_flight.append(executor.submit(self.fetch_page, next_page))
+                        next_page += 1
+                    if not in_flight:
+                        return
+
+                    page_posts = in_flight.popleft().result()
+                    yield from page_posts
 
+                    # An empty or short page means we've reached the end.
+                    page_size = max(page_size, len(page_posts))
+                    if len(page_posts) == 0 or len(page_posts) < page_size:
+                        return
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def print_posts(self, posts: Iterable[dict]) -> None:
+        """
+        Prints the title, creation date and ID of each post.
+
+        Args:
+            posts (Iterable[dict]): Posts as returned by the API.
+        """
+        for single_post in posts:
+            # Print the current post to STDOUT.
+            self.console.print(f"[bold purple]Title:[/bold purple]   [white]{summarize_title(single_post)}[/white]")
+            self.console.print(f"[bold purple]Created:[/bold purple] [white]{single_post.get('created')}[/white]")
+            self.console.print(f"[bold purple]ID:[/bold purple]      [white]{single_post.get('id')}[/white]\n")
+
+    def get_posts(self, pages: int = 1, workers: int = WORKERS):
+        """
+        Gets the posts from a collection, printing their titles, IDs, and
+        publication dates. Content is streamed newest first as pages arrive.
+        By default only the first page (the 10 most recent posts) is shown.
+
+        Args:
+            pages (int): Number of pages to display, or `None` for every page.
+            workers (int): Maximum number of pages requested at the same time.
+        """
         # Retrieving content from public collections doesn't require authentication
         # but do it anyway in case future limits impede the number of calls since
         # we can't make it to this point without valid authentication anyway.
         try:
-            collection_results = requests.get(
-                post_url,
-                headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Token: {self.access_token}"
-                })
+            self.print_posts(self.iter_posts(pages=pages, workers=workers))
         except Exception as e:
             self.console.print(f"Failed to retrieve posts with error: {e}", style="bold red")
             sys.exit(1)
 
-        # Process the results.
-        post_list = list()
-        for single_post in collection_results.json().get('data').get('posts'):
-            current_title = ""
-            if single_post.get('title'):
-                current_title = single_post.get('title')
-            elif len(single_post.get('body')) <= 50:
-                current_title = single_post.get('body').strip().replace("\n", " ")
-            else:
-                current_title = single_post.get('body')[0:47].strip().replace("\n", " ") + "..."
-            post_list.append({
-                "title": current_title,
-                "created": single_post.get('created'),
-                "id": single_post.get('id')})
+    def remove_post(self, post_id: str) -> int:
+        """
+        Sends the request to delete a post without printing anything.
 
-        sorted_posts = sorted(post_list, key = lambda p: p['created'], reverse=True)
+        Args:
+            post_id (str): ID of the post to remove.
 
-        # Process how to render them.
-        for single_post in sorted_posts:
-            # Print the current post to STDOUT.
-            self.console.print(f"[bold purple]Title:[/bold purple]   [white]{single_post.get('title')}[/white]")
-            self.console.print(f"[bold purple]Created:[/bold purple] [white]{single_post.get('created')}[/white]")
-            self.console.print(f"[bold purple]ID:[/bold purple]      [white]{single_post.get('id')}[/white]\n")
+        Returns:
+            int: Status code of the response, 204 on success.
+        """
+        return self.session.delete(post_url(self.instance, post_id)).status_code
+
+    def apply_to_posts(self, action: str, post_ids: list, position: int = 1) -> list:
+        """
+        Sends a single request applying an action to many posts of the
+        collection, without printing anything: "collect" moves them into the
+        collection, "pin" and "unpin" pin them to it or unpin them.
+
+        Args:
+            action (str): "collect", "pin" or "unpin".
+            post_ids (list): IDs of the posts.
+            position (int): Position the first post is pinned at.
+
+        Returns:
+            list: Tuples of the post ID, the post as returned by the instance
+            (or `None`) and the error (or `None`) for every post.
+        """
+        response = self.session.post(
+            collection_action_url(self.instance, self.collection, action),
+            data=build_bulk_dto(action, post_ids, position),
+            headers={"Content-Type": "application/json"})
+        payload = response.json() if response.status_code == 200 else None
+        return parse_bulk_results(response.status_code, payload, post_ids)
 
     def delete_post(self, post_id: str, exit_on_fail=True):
         """
@@ -95,23 +210,22 @@ class WriteFreely:
 
         Args:
             post_id (str): ID of the post to remove.
+
+        Returns:
+            bool: Indicates if the post was deleted.
         """
-        delete_url = f"https://{self.instance}/api/posts/{post_id}"
         try:
-            deletion_response = requests.delete(
-                delete_url,
-                headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Token {self.access_token}"
-                })
+            status_code = self.remove_post(post_id)
 
             # Validate the deletion was successful.
-            if deletion_response.status_code == 204:
+            if status_code == 204:
                 self.console.print(f"Successfully deleted post: [bold purple]{post_id}[/bold purple]")
+                return True
             else:
-                self.console.print(f"Failed to delete post {post_id} with status code: {deletion_response.status_code}", style="bold red")
+                self.console.print(f"Failed to delete post {post_id} with status code: {status_code}", style="bold red")
         except Exception as e:
             self.console.print(f"Failed to delete post with ID: {post_id}", style="bold red")
             self.console.print(f"Error was: {e}", style="bold red")
             if exit_on_fail:
                 sys.exit(1)
+        return False
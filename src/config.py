@@ -3,25 +3,62 @@ import os
 
 from rich.console import Console
 
-from __init__ import JSON_PATH, WRITEPYLY_PATH
+from __init__ import (BACKOFF, BATCH_SIZE, COLLECTION_TTL, HOST_CONCURRENCY, JOURNAL_TTL, JSON_PATH,
+    MAX_BACKOFF, MAX_RETRIES, NEGATIVE_TTL, POOL_SIZE, RATE, RETRY_BUDGET, TIMEOUT, WRITEPYLY_PATH)
+
+# Optional settings read from config.json along with their defaults.
+SETTINGS = {
+    "pool_size": POOL_SIZE,
+    "timeout": TIMEOUT,
+    "collection_ttl": COLLECTION_TTL,
+    "negative_ttl": NEGATIVE_TTL,
+    "journal_ttl": JOURNAL_TTL,
+    "batch_size": BATCH_SIZE,
+    "gzip": False,
+    "rate": RATE,
+    "host_concurrency": HOST_CONCURRENCY,
+    "max_retries": MAX_RETRIES,
+    "backoff": BACKOFF,
+    "max_backoff": MAX_BACKOFF,
+    "retry_budget": RETRY_BUDGET,
+}
 
 
 class ConfigObj:
     instance: str
     access_token: str
+    # Settings given on the command line, taking precedence over config.json.
+    overrides = dict()
 
     def __init__(self):
         self.console = Console()
+        for key, default in SETTINGS.items():
+            setattr(self, key, self.overrides.get(key, default))
 
-    def create(self, instance: str, access_token: str) -> None:
+    def create(self, instance: str, access_token: str, profile: str = None) -> None:
         """
         Creates a configuration file with an access token and the desired instance.
 
         Args:
             instance (str): The instance to use.
             access_token (str): The access token for the Write Freely service.
+            profile (str): Name of the profile to save the login as, or `None`
+                for the default login.
+        """
+        config = self.read_raw()
+        if profile is None:
+            config.update({"instance": instance, "access_token": access_token})
+        else:
+            config.setdefault("profiles", dict())[profile] = {"instance": instance, "access_token": access_token}
+        self.write(config)
+
+    def write(self, config: dict) -> None:
+        """
+        Writes the whole configuration file.
+
+        Args:
+            config (dict): Contents of the configuration file.
         """
-        config = {"instance": instance, "access_token": access_token}
         json_config = json.dumps(config, indent=4)
         self.create_dir()
 
@@ -32,6 +69,64 @@ class ConfigObj:
         except Exception as e:
             self.console.print(f"ERROR: Unable to write the config file with error: {e}", style="bold red")
 
+    def read_raw(self) -> dict:
+        """
+        Reads the JSON configuration as-is so that settings other than the
+        instance and access token survive a new login.
+
+        Returns:
+            dict: Contents of the configuration file, or an empty dict.
+        """
+        if os.path.isfile(JSON_PATH):
+            try:
+                with open(JSON_PATH, "r") as config_file:
+                    return json.load(config_file)
+            except Exception:
+                pass
+        return dict()
+
+    def read_profiles(self) -> dict:
+        """
+        Reads every login from the configuration: the named profiles created
+        with `login --profile`, plus the default login as "default". The
+        optional settings are loaded too, as in `load`.
+
+        Returns:
+            dict: Maps each profile name to a dict with its instance and
+            access token.
+        """
+        configuration = self.read_raw()
+        for key, default in SETTINGS.items():
+            setattr(self, key, self.overrides.get(key, configuration.get(key, default)))
+        profiles = dict(configuration.get("profiles") or dict())
+        if configuration.get("instance") and configuration.get("access_token"):
+            profiles.setdefault("default", {
+                "instance": configuration["instance"],
+                "access_token": configuration["access_token"]})
+        return profiles
+
+    def remove_login(self, profile: str = None) -> None:
+        """
+        Removes a login from the configuration. The file itself is only
+        deleted once no login is left in it.
+
+        Args:
+            profile (str): Name of the profile to remove, or `None` for the
+                default login.
+        """
+        config = self.read_raw()
+        if profile is None:
+            config.pop("instance", None)
+            config.pop("access_token", None)
+        else:
+            (config.get("profiles") or dict()).pop(profile, None)
+        if not config.get("profiles"):
+            config.pop("profiles", None)
+            if not config.get("instance"):
+                self.delete()
+                return
+        self.write(config)
+
     def delete(self) -> None:
         """
         Deletes the local JSON configuration file if it exists.
@@ -59,7 +154,9 @@ class ConfigObj:
     def load(self) -> bool:
         """
         Loads the JSON configuration, storing the instance and access token to the
-        `instance` and `access_token` properties of the current object.
+        `instance` and `access_token` properties of the current object. The
+        optional keys listed in `SETTINGS` are stored as properties too, unless
+        they were overridden on the command line.
 
         Returns:
             bool: Indicates whether or not the operation was successful.
@@ -69,6 +166,8 @@ class ConfigObj:
                 configuration = json.load(file)
                 self.instance = configuration.get("instance")
                 self.access_token = configuration.get("access_token")
+                for key, default in SETTINGS.items():
+                    setattr(self, key, self.overrides.get(key, configuration.get(key, default)))
 
             if self.instance is None:
                 self.console.print(f"ERROR loading configuration file at: {JSON_PATH}", style="bold red")
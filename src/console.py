@@ -1,29 +1,58 @@
+import asyncio
 import getpass
 import json
 import os
 import subprocess
 import sys
-import time
+import threading
 import uuid
 
+from typing import Callable
+
 from rich.console import Console
 
+from async_client import AsyncWriteFreely
 from auth import Authenticator
+from browser import PostBrowser
+from cache import CollectionCache
 from config import ConfigObj
-from client import WriteFreely
-from post import Post
+from journal import Journal
+from outbox import Outbox, OutboxWorker
+from post import split_title
+from scheduler import Scheduler
+from session import WriteSession
 
 from __init__ import JSON_PATH, TEMP_BASE
 
 
 class WriteConsole:
+    """
+    Interactive console. It runs on an asyncio event loop: the menu waits for
+    input on a separate thread while checking the collection, loading its
+    recent posts and deleting posts happen in the background, so the menu is
+    never held up by the network. A status line above the menu shows how the
+    background work is getting on.
+    """
     # https://rich.readthedocs.io/en/latest/console.html
     def __init__(self):
         self.console = Console()
         self.current_config = ConfigObj()
         self.client = None
         self.collection = ""
-        self.print_greeting()
+        self.loop = None
+        # Background checks of the collection and loading of its recent posts.
+        self.validation = None
+        self.recent = None
+        self.tasks = set()
+        # Messages from background work, shown with the next status line.
+        self.notices = list()
+        self.notices_lock = threading.Lock()
+        # One pooled session is kept alive for the whole interactive session.
+        self.session = WriteSession()
+        # New posts are queued in the outbox and published in the background.
+        self.outbox = Outbox()
+        self.worker = None
+        asyncio.run(self.print_greeting())
 
     def print_missing_config(self) -> None:
         """
@@ -32,6 +61,99 @@ class WriteConsole:
         """
         self.console.print("Try running [bold purple]login[/bold purple]")
 
+    async def read_input(self, prompt: str = "> ", reader: Callable = input) -> str:
+        """
+        Reads a line from the user on a separate thread so the event loop keeps
+        running background work while the prompt waits. The thread is a daemon
+        so a prompt left waiting never keeps the process alive.
+
+        Args:
+            prompt (str): Prompt to show.
+            reader (Callable): Function reading the line, e.g. `getpass.getpass`.
+
+        Returns:
+            str: The line entered by the user.
+        """
+        future = self.loop.create_future()
+
+        def resolve(result, error) -> None:
+            if future.done():
+                return
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        def read() -> None:
+            try:
+                line = reader(prompt)
+            except BaseException as e:
+                self.loop.call_soon_threadsafe(resolve, None, e)
+            else:
+                self.loop.call_soon_threadsafe(resolve, line, None)
+
+        threading.Thread(target=read, daemon=True).start()
+        return await future
+
+    def notify(self, message: str) -> None:
+        """
+        Records a message from background work, to be shown with the next
+        status line rather than in the middle of a prompt or the editor. Safe
+        to call from any thread.
+        """
+        with self.notices_lock:
+            self.notices.append(message)
+
+    def spawn(self, coroutine) -> asyncio.Task:
+        """
+        Runs a coroutine in the background, keeping a reference until it's done
+        and swallowing its outcome, which it reports itself.
+        """
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+
+        def done(finished: asyncio.Task) -> None:
+            self.tasks.discard(finished)
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    def print_status(self) -> None:
+        """
+        Prints the status line: the state of the collection, of its recent
+        posts and of the outbox, followed by anything background work had to
+        say since the last time.
+        """
+        with self.notices_lock:
+            notices, self.notices = self.notices, list()
+        for message in notices:
+            self.console.print(message)
+
+        parts = list()
+        if self.validation is not None:
+            if not self.validation.done():
+                state = "checking"
+            elif self.validation.cancelled() or self.validation.exception() is not None:
+                state = "unreachable"
+            else:
+                state = "valid" if self.validation.result() else "not found"
+            parts.append(f"Collection: {self.collection} ({state})")
+        if self.recent is not None:
+            if not self.recent.done():
+                parts.append("Recent posts: loading")
+            elif self.recent.cancelled() or self.recent.exception() is not None:
+                parts.append("Recent posts: failed to load")
+            else:
+                parts.append(f"Recent posts: {len(self.recent.result())} ready")
+        queued = len(self.outbox.entries())
+        parts.append(f"Outbox: {queued} queued" if queued else "Outbox: empty")
+        running = len(self.tasks - {self.validation, self.recent})
+        if running:
+            parts.append(f"{running} tasks running")
+        self.console.print(" | ".join(parts), style="dim")
+
     def process_menu_input(self, user_input: str, max_value: int):
         """
         Takes the menu option entered by the user and validates that it can both
@@ -72,20 +194,26 @@ class WriteConsole:
         else:
             return True
 
-    def get_collection(self) -> None:
+    async def get_collection(self) -> None:
         """
-        Gets the desired collection from the user.
+        Gets the desired collection from the user and, when logged in, starts
+        checking it and loading its recent posts right away.
         """
         # Define the collection.
         self.console.print("Enter the name of the current [bold purple]collection[/bold purple]:")
-        self.collection = input("> ")
+        self.collection = await self.read_input()
         self.console.print(f"Saved collection of: [bold purple]{self.collection}[/bold purple]")
+        if self.client is not None:
+            self.client.collection = self.collection
+            self.prefetch()
+        elif self.current_config.load():
+            self.check_client()
 
     def check_client(self) -> bool:
         """
         Determines if a client has already been instantiated. If not, it creates
         the client, including loading the configuration and the checks which
-        go along with that process.
+        go along with that process, and starts prefetching the collection.
 
         Returns:
             bool: Indicates if there's currently a client or not.
@@ -97,41 +225,188 @@ class WriteConsole:
                 return False
             else:
                 # Create the client.
-                self.client = WriteFreely(
+                self.session.set_token(self.current_config.access_token)
+                self.session.timeout = self.current_config.timeout
+                self.client = AsyncWriteFreely(
                     self.current_config.instance,
                     self.current_config.access_token,
-                    collection=self.collection
-                )
-
-                # Ensure the passed collection was valid.
-                if not self.client.check_collection():
-                    self.console.print("Invalid collection! Specify a new one with option 3.", style="bold red")
-                    return False
+                    collection=self.collection,
+                    pool_size=self.current_config.pool_size,
+                    timeout=self.current_config.timeout,
+                    scheduler=Scheduler.from_config(self.current_config))
+                if self.collection:
+                    self.prefetch()
+        if self.worker is None:
+            self.start_worker()
         return True
 
-    def authenticate(self) -> None:
+    async def reset_client(self) -> None:
+        """
+        Drops the client and its background work, so the next action picks up
+        a new login.
+        """
+        for task in (self.validation, self.recent):
+            if task is not None:
+                task.cancel()
+        self.validation = None
+        self.recent = None
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def prefetch(self) -> None:
+        """
+        Starts checking the collection and loading its recent posts in the
+        background, replacing whatever was running for the previous one.
+        """
+        for task in (self.validation, self.recent):
+            if task is not None:
+                task.cancel()
+        self.validation = self.spawn(self.validate_collection())
+        self.recent = self.spawn(self.client.get_posts())
+
+    def refresh_recent(self) -> None:
+        """
+        Reloads the recent posts in the background after they've changed.
+        """
+        if self.client is not None and self.collection:
+            if self.recent is not None:
+                self.recent.cancel()
+            self.recent = self.spawn(self.client.get_posts())
+
+    async def validate_collection(self) -> bool:
+        """
+        Checks that the collection exists, reusing a recent answer from the
+        collection cache.
+        """
+        cache = CollectionCache.from_config(self.current_config)
+        valid = cache.lookup(self.client.instance, self.collection)
+        if valid is None:
+            valid = await self.client.check_collection()
+            cache.store(self.client.instance, self.collection, valid)
+        return valid
+
+    async def collection_valid(self) -> bool:
+        """
+        Waits for the background check of the collection, which has usually
+        finished by the time it's needed, and reports an invalid one.
+
+        Returns:
+            bool: Indicates if the collection exists.
+        """
+        if not self.validation.done():
+            self.console.print(f"Checking [bold purple]{self.collection}[/bold purple]...")
+        try:
+            valid = await asyncio.shield(self.validation)
+        except Exception as e:
+            self.console.print(f"Failed to check the collection with error: {e}", style="bold red")
+            # Try again the next time.
+            self.validation = self.spawn(self.validate_collection())
+            return False
+        if not valid:
+            self.console.print(f"Error: Specified collection of {self.collection} is not valid!", style="bold red")
+            self.console.print("Invalid collection! Specify a new one with option 3.", style="bold red")
+        return valid
+
+    def start_worker(self) -> None:
+        """
+        Starts the background worker publishing the outbox, which also sends
+        anything left queued by earlier sessions.
+        """
+        self.worker = OutboxWorker(
+            self.outbox,
+            self.current_config.instance,
+            self.current_config.access_token,
+            session=self.session,
+            on_result=self.report_published,
+            journal=Journal.from_config(self.current_config))
+        self.worker.start()
+
+    def stop_worker(self) -> None:
+        """
+        Stops the background worker once the posts it's sending are done.
+        Anything still queued stays in the outbox.
+        """
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+    def report_published(self, entry: dict, post_id: str, error: Exception) -> None:
+        """
+        Reports the outcome of a queued post, called from the background worker.
+        """
+        post_title = entry['title'] or "untitled post"
+        if error is None:
+            self.notify(f"Published [bold purple]{post_title}[/bold purple] with ID: [bold purple]{post_id}[/bold purple]")
+            if entry['collection'] == self.collection:
+                self.loop.call_soon_threadsafe(self.refresh_recent)
+        else:
+            self.notify(f"[bold red]Couldn't publish {post_title} yet, will retry. Error was: {error}")
+
+    async def delete_post(self, post_id: str) -> None:
+        """
+        Deletes a post in the background, reporting the outcome with the next
+        status line.
+        """
+        try:
+            deleted = await self.client.delete_post(post_id)
+        except Exception as e:
+            self.notify(f"[bold red]Failed to delete {post_id} with error: {e}")
+            return
+        if deleted:
+            self.notify(f"Deleted post: [bold purple]{post_id}[/bold purple]")
+            Journal.from_config(self.current_config).forget(self.current_config.instance, post_id)
+            self.refresh_recent()
+        else:
+            self.notify(f"[bold red]Unable to delete post: {post_id}")
+
+    async def browse_posts(self) -> None:
+        """
+        Opens the post browser on the collection. The first page is usually
+        loaded already; the browser fetches the others as they come into
+        view. The recent posts are loaded again afterwards since they may
+        have been edited or deleted.
+        """
+        if not self.recent.done():
+            self.console.print("Still loading the recent posts...")
+        try:
+            first_page = await asyncio.shield(self.recent)
+        except Exception:
+            # The browser fetches it again.
+            first_page = None
+        await PostBrowser(self.client, self.console, self.read_input, first_page=first_page, journal=Journal.from_config(self.current_config)).run()
+        self.refresh_recent()
+
+    async def authenticate(self) -> None:
         """
         Authenticates the user, either creating or overwriting the local
         configuration file.
         """
-        auth_obj = Authenticator()
+        auth_obj = Authenticator(session=self.session)
         self.console.print("Enter your instance name.")
-        instance = input("> ")
+        instance = await self.read_input()
         self.console.print("Enter your username.")
-        username = input("> ")
+        username = await self.read_input()
         self.console.print("Enter your password.")
-        password = getpass.getpass("> ")
+        password = await self.read_input(reader=getpass.getpass)
         auth_obj.supply_credentials(
             instance_name=instance,
             user_name=username,
             password=password
         )
-        auth_obj.new_login(write_stdout=False)
-
-    def deauthenticate(self) -> None:
+        await asyncio.to_thread(auth_obj.new_login, write_stdout=False)
+        # Pick up the new access token the next time it's needed.
+        await asyncio.to_thread(self.stop_worker)
+        await self.reset_client()
+        if self.collection and self.current_config.load():
+            self.check_client()
+
+    async def deauthenticate(self) -> None:
         """
         Invalidates any authentication token which may be found and removes the local config file.
         """
+        await asyncio.to_thread(self.stop_worker)
+        await self.reset_client()
         if os.path.isfile(JSON_PATH):
             current_config = dict()
             try:
@@ -141,9 +416,10 @@ class WriteConsole:
                 self.console.print(f"ERROR: Unable to read {JSON_PATH} with error: {e}", style="bold red")
 
             if current_config != {} and current_config.get('instance') and current_config.get('access_token'):
-                auth_obj = Authenticator()
+                auth_obj = Authenticator(session=self.session)
                 try:
-                    auth_obj.remove_login(
+                    await asyncio.to_thread(
+                        auth_obj.remove_login,
                         current_config['instance'],
                         current_config['access_token'])
                 except KeyError as e:
@@ -155,12 +431,13 @@ class WriteConsole:
         else:
             self.console.print(f"No config file found at: {JSON_PATH}")
 
-    def new_post(self, file_name: str) -> None:
+    async def new_post(self, file_name: str) -> None:
         """
         Creates a new post. This method requires the $EDITOR environment
         variable to be set. If it is, then it will automatically open with
         a new temporary file. Once the file is saved, it will be ingested and
-        posted. Once the post has been completed, the file is removed.
+        queued in the outbox, where the background worker publishes it. The
+        file is only removed once the post is safely queued.
 
         Args:
             file_name (str): The name of the temporary file.
@@ -169,8 +446,9 @@ class WriteConsole:
         temp_file = f"{TEMP_BASE}/{file_name}"
         # Safe since EDITOR is checked prior to getting here.
         while True:
-            editor_result = subprocess.run([os.environ["EDITOR"], temp_file])
-            
+            # Background work carries on while the editor is open.
+            editor_result = await asyncio.to_thread(subprocess.run, [os.environ["EDITOR"], temp_file])
+
             # Make sure the editor exited cleanly.
             if editor_result.returncode != 0:
                 self.console.print(f"Aborting. Editor exited with code: {editor_result.returncode}", style="bold red")
@@ -181,7 +459,7 @@ class WriteConsole:
             self.console.print("1. Publish")
             self.console.print("2. Edit")
             self.console.print("3. Discard")
-            selection = input("> ")
+            selection = await self.read_input()
 
             if selection == "1" or selection == "3":
                 break
@@ -191,31 +469,22 @@ class WriteConsole:
                 self.console.print("Invalid selection!", style="bold red")
 
 
-        # Create the post.
+        # Queue the post.
         if selection == "1":
-            self.console.print("Creating the post...")
             with open(temp_file, "r") as file:
                 post_content = file.read()
 
             # Check if a title was specified.
-            post_content_list = post_content.split('\n')
-            post_title = None
-            if post_content_list[0].startswith('#'):
-                post_title = post_content_list[0].replace("#", "").strip()
-                post_content_list.remove(post_content_list[0])
-                post_content = '\n'.join(post_content_list)
-
-            # Create a post object and validate the collection if one was provided.
-            current_post = Post(
-                post_content,
-                self.current_config.instance,
-                self.current_config.access_token,
-                collection=self.collection,
-                title=post_title)
-
-            # Make the post.
-            post_id = current_post.create_post()
-            self.console.print(f"Successfully created post with ID: [bold purple]{post_id}[/bold purple]")
+            post_title, post_content = split_title(post_content)
+
+            try:
+                self.outbox.enqueue(self.current_config.instance, self.collection, post_title, post_content)
+            except Exception as e:
+                self.console.print(f"Failed to queue the post with error: {e}", style="bold red")
+                self.console.print(f"Its content is still in: {temp_file}", style="bold red")
+                return
+            self.console.print("Post queued. It's being published in the background.")
+            self.worker.notify()
 
         # Delete the file.
         self.console.print(f"Deleting {temp_file}")
@@ -224,15 +493,16 @@ class WriteConsole:
         except Exception as e:
             self.console.print(f"Failed to remove file '{temp_file}' with error: {e}", style="bold red")
 
-    def print_greeting(self):
+    async def print_greeting(self):
         """
         Prints a basic greeting to the user.
         """
+        self.loop = asyncio.get_running_loop()
         self.console.rule("[bold purple]WritePyly :memo:", style="purple")
         self.console.print("[underline]Welcome to the interactive console!")
-        self.print_main_menu()
+        await self.print_main_menu()
 
-    def print_main_menu(self):
+    async def print_main_menu(self):
         """
         Prints the main menu to the user and collects input for what the user
         would like to do.
@@ -242,19 +512,20 @@ class WriteConsole:
             "Logout",
             "Define collection",
             "Create post",
-            "Get 10 most recent posts",
+            "Browse posts",
             "Delete a post",
             "Quit"]
         while True:
             # Check if there's a collection and get one first if not.
             if self.collection == "":
-                self.get_collection()
+                await self.get_collection()
 
+            self.print_status()
             counter = 0
             for option in options:
                 counter += 1
                 self.console.print(f"[bold]{counter}. [/bold]{option}")
-            selection = self.console.input("> ")
+            selection = await self.read_input()
 
             # Check if it's valid.
             int_value = self.process_menu_input(selection, len(options))
@@ -265,16 +536,16 @@ class WriteConsole:
                 # Call whatever method is required by the user's selection.
                 if int_value == 1:
                     # Initiate a new login.
-                    self.authenticate()
+                    await self.authenticate()
                 elif int_value == 2:
                     # Logout from the current session and remove the configuration.
-                    self.deauthenticate()
+                    await self.deauthenticate()
                 elif int_value == 3:
                     # Define the collection.
-                    self.get_collection()
+                    await self.get_collection()
                 elif int_value == 4:
                     # Ensure we have a collection and client.
-                    if self.check_collection() and self.check_client():
+                    if self.check_collection() and self.check_client() and await self.collection_valid():
                         # Create a new post.
                         if not os.environ.get("EDITOR"):
                             self.console.print("No [bold red]EDITOR[/bold red] found. Be sure this environment variable is set for Unix goodness!")
@@ -283,25 +554,24 @@ class WriteConsole:
                         else:
                             file_name = f"writepyly_{str(uuid.uuid4())}.md"
                             self.console.print(f"Launching your editor with temporary file: [bold purple]{file_name}[/bold purple]")
-                            time.sleep(2)
-                            self.new_post(file_name)
+                            await self.new_post(file_name)
                 elif int_value == 5:
-                    # Show the 10 most recent posts.
-                    # Check that there's a collection.
-                    if self.check_collection() and self.check_client():
-                        if self.client is not None:
-                            self.client.get_posts()
-                        else:
-                            self.console.print("We should never get here! Try logging in again...")
+                    # Browse the posts, starting with the prefetched recent ones.
+                    if self.check_collection() and self.check_client() and await self.collection_valid():
+                        await self.browse_posts()
                 elif int_value == 6:
-                    # Delete a post.
+                    # Delete a post in the background.
                     if self.check_collection() and self.check_client():
                         self.console.print("Enter the post ID to remove.")
-                        if self.client is not None:
-                            self.client.delete_post(input("> "), exit_on_fail=False)
-                        else:
-                            # Should never reach but it makes pyright happy.
-                            self.console.print("Unable to delete the post as the client still doesn't exist!", style="bold red")
+                        post_id = await self.read_input()
+                        self.spawn(self.delete_post(post_id))
+                        self.console.print(f"Deleting [bold purple]{post_id}[/bold purple] in the background.")
                 elif int_value == 7:
+                    await asyncio.to_thread(self.stop_worker)
+                    queued = len(self.outbox.entries())
+                    if queued:
+                        self.console.print(f"{queued} posts are still queued. Run [bold purple]writepyly flush[/bold purple] to publish them.")
                     self.console.print("[bold purple]Goodbye![/bold purple]")
-                    sys.exit(0)
+                    await self.reset_client()
+                    self.session.close()
+                    return
@@ -0,0 +1,111 @@
+import time
+
+from rich.console import Console
+
+from api import PostError
+from bulk import run_concurrently
+from cache import CollectionCache
+from journal import Journal
+from post import Post
+from session import WriteSession
+
+
+def parse_targets(value: str) -> list:
+    """
+    Parses the value of `post --to`: comma-separated targets, each a profile
+    optionally followed by a collection, e.g. "work:blog,personal:notes".
+    A profile without a collection posts to its drafts.
+
+    Returns:
+        list: Tuples of the profile name and the collection (or `None`).
+    """
+    targets = list()
+    for target in value.split(","):
+        target = target.strip()
+        if not target:
+            continue
+        profile, _, collection = target.partition(":")
+        targets.append((profile, collection or None))
+    return targets
+
+
+class CrossPoster:
+    """
+    Publishes one post to several instances and collections at once. Every
+    profile gets its own pooled session, so posting to several collections of
+    the same instance shares its connections, and all targets are sent
+    concurrently.
+    """
+    def __init__(self, config, profiles: dict, verify: bool = True, force: bool = False):
+        self.config = config
+        self.profiles = profiles
+        self.verify = verify
+        # Publish even to targets the journal says already have the post.
+        self.force = force
+        self.cache = CollectionCache.from_config(config)
+        self.journal = Journal.from_config(config)
+        self.sessions = dict()
+        self.console = Console()
+
+    def session(self, profile: str) -> WriteSession:
+        if profile not in self.sessions:
+            self.sessions[profile] = WriteSession.from_config(self.config, self.profiles[profile]["access_token"])
+        return self.sessions[profile]
+
+    def publish(self, target: tuple, post_title: str, post_content: str) -> tuple:
+        """
+        Publishes the post to a single target.
+
+        Returns:
+            tuple: The ID of the new post and how long it took in seconds.
+        """
+        profile, collection = target
+        start = time.perf_counter()
+        current_post = Post(
+            post_content,
+            self.profiles[profile]["instance"],
+            self.profiles[profile]["access_token"],
+            collection=collection,
+            title=post_title,
+            session=self.session(profile),
+            cache=self.cache,
+            journal=self.journal,
+            force=self.force)
+        if collection and self.verify and not current_post.check_collection():
+            raise PostError(f"Collection {collection} is not valid.")
+        return current_post.submit(), time.perf_counter() - start
+
+    def run(self, targets: list, post_title: str, post_content: str) -> list:
+        """
+        Publishes the post to every target concurrently, printing the ID and
+        latency of each as it completes.
+
+        Args:
+            targets (list): Tuples of the profile name and the collection.
+            post_title (str): Title of the post, or `None`.
+            post_content (str): Content of the post.
+
+        Returns:
+            list: Tuples of the target and error for every failure.
+        """
+        failures = list()
+        # Open the sessions up front so the workers never race to create them.
+        for profile, _ in targets:
+            self.session(profile)
+        try:
+            results = run_concurrently(
+                lambda target: self.publish(target, post_title, post_content), targets, len(targets))
+            for target, result, error in results:
+                label = f"{target[0]}:{target[1] or 'drafts'}"
+                if error is None:
+                    post_id, elapsed = result
+                    self.console.print(f"{label}: [bold purple]{post_id}[/bold purple] ({elapsed * 1000:.0f} ms)")
+                else:
+                    failures.append((target, error))
+                    self.console.print(f"{label}: failed with error: {error}", style="bold red")
+        finally:
+            # The daemon's shared sessions stay warm for its next command.
+            if WriteSession.shared is None:
+                for session in self.sessions.values():
+                    session.close()
+        return failures
@@ -0,0 +1,238 @@
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+
+from __init__ import DAEMON_SOCKET
+
+# Arguments telling a command to read from STDIN, e.g. `post --` and `delete -`.
+# Such commands aren't forwarded, so STDIN is streamed instead of copied.
+STDIN_ARGUMENTS = ("-", "--")
+
+
+def connect(path: str = DAEMON_SOCKET) -> socket.socket:
+    """
+    Connects to the daemon's socket.
+
+    Returns:
+        socket.socket: The connection, or `None` when no daemon is listening.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def is_running(path: str = DAEMON_SOCKET) -> bool:
+    client = connect(path)
+    if client is None:
+        return False
+    client.close()
+    return True
+
+
+def forward(args: list, path: str = DAEMON_SOCKET):
+    """
+    Runs a command in the daemon if one is listening, relaying its output.
+    Commands reading STDIN shouldn't be forwarded, see `STDIN_ARGUMENTS`.
+
+    Args:
+        args (list): Command line arguments, without the program name.
+        path (str): Path of the daemon's socket.
+
+    Returns:
+        int: The command's exit code, or `None` when no daemon is running and
+        the command should run in this process instead.
+    """
+    client = connect(path)
+    if client is None:
+        return None
+
+    with client, client.makefile("rwb") as stream:
+        request = {
+            "argv": args,
+            "cwd": os.getcwd(),
+            "tty": sys.stdout.isatty(),
+            "columns": shutil.get_terminal_size().columns}
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        try:
+            for line in stream:
+                frame = json.loads(line)
+                if "out" in frame:
+                    sys.stdout.write(frame["out"])
+                    sys.stdout.flush()
+                elif "err" in frame:
+                    sys.stderr.write(frame["err"])
+                    sys.stderr.flush()
+                elif "exit" in frame:
+                    return frame["exit"]
+        except BrokenPipeError:
+            # The reader, e.g. `head`, has seen enough. Hanging up stops the
+            # command in the daemon too.
+            sys.stdout = open(os.devnull, "w")
+            return 0
+    print("The daemon closed the connection before the command finished.", file=sys.stderr)
+    return 1
+
+
+def stop(path: str = DAEMON_SOCKET) -> bool:
+    """
+    Asks a running daemon to shut down.
+
+    Returns:
+        bool: Whether a daemon was running.
+    """
+    client = connect(path)
+    if client is None:
+        return False
+    with client, client.makefile("rwb") as stream:
+        stream.write(json.dumps({"stop": True}).encode("utf-8") + b"\n")
+        stream.flush()
+        stream.readline()
+    return True
+
+
+class FrameWriter(io.TextIOBase):
+    """
+    Text stream sending everything written to it to the client as frames of
+    one output stream, standing in for STDOUT or STDERR while a command runs.
+    """
+    def __init__(self, wfile, name: str, tty: bool):
+        self.wfile = wfile
+        self.name = name
+        self.tty = tty
+        self.hung_up = False
+        # Commands may print from worker threads.
+        self.lock = threading.Lock()
+
+    def write(self, data: str) -> int:
+        if data and not self.hung_up:
+            frame = json.dumps({self.name: data}).encode("utf-8") + b"\n"
+            with self.lock:
+                try:
+                    self.wfile.write(frame)
+                except OSError:
+                    # Let the command notice once, then drop its output.
+                    self.hung_up = True
+                    raise BrokenPipeError("The client hung up.")
+        return len(data)
+
+    def isatty(self) -> bool:
+        # Lets rich keep colors when the client writes to a terminal.
+        return self.tty
+
+
+class Daemon:
+    """
+    Long-running process executing commands sent by the CLI over a Unix
+    socket. Imported modules, pooled sessions and the collection cache stay
+    warm between commands, so a command costs little more than its requests
+    to the instance. Commands run one at a time since each one takes over the
+    process' working directory and standard streams.
+
+    Args:
+        execute (Callable): Runs a command from its argument list, like the
+            CLI's `main` does.
+        path (str): Path of the socket to listen on.
+    """
+    def __init__(self, execute, path: str = DAEMON_SOCKET):
+        self.execute = execute
+        self.path = path
+
+    def run_request(self, request: dict, wfile) -> int:
+        """
+        Runs one command with the client's working directory and terminal,
+        sending its output back as it's written.
+
+        Returns:
+            int: The exit code of the command.
+        """
+        import traceback
+        from config import ConfigObj
+
+        saved = (sys.stdin, sys.stdout, sys.stderr, os.getcwd(), os.environ.get("COLUMNS"))
+        # Commands reading STDIN run in the client instead.
+        sys.stdin = io.StringIO()
+        sys.stdout = FrameWriter(wfile, "out", request.get("tty", False))
+        sys.stderr = FrameWriter(wfile, "err", request.get("tty", False))
+        os.environ["COLUMNS"] = str(request.get("columns") or 80)
+        # Options given to an earlier command mustn't leak into this one.
+        ConfigObj.overrides.clear()
+        try:
+            os.chdir(request.get("cwd") or "/")
+            self.execute(list(request.get("argv") or list()))
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr, cwd, columns = saved
+            os.chdir(cwd)
+            if columns is None:
+                os.environ.pop("COLUMNS", None)
+            else:
+                os.environ["COLUMNS"] = columns
+        return code
+
+    def serve(self) -> None:
+        """
+        Listens until stopped with `writepyly daemon stop` or a signal.
+        """
+        import signal
+        import socketserver
+        from cache import CollectionCache
+        from session import WriteSession
+
+        # Reuse sessions and the collection cache across commands.
+        WriteSession.shared = dict()
+        CollectionCache.shared = dict()
+
+        daemon = self
+        lock = threading.Lock()
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                line = self.rfile.readline()
+                if not line:
+                    # Only checking whether the daemon is running.
+                    return
+                request = json.loads(line)
+                if request.get("stop"):
+                    self.wfile.write(json.dumps({"exit": 0}).encode("utf-8") + b"\n")
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                with lock:
+                    code = daemon.run_request(request, self.wfile)
+                try:
+                    self.wfile.write(json.dumps({"exit": code}).encode("utf-8") + b"\n")
+                except OSError:
+                    pass
+
+        if os.path.exists(self.path):
+            # Left behind by a daemon that didn't shut down cleanly.
+            os.remove(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        previous_umask = os.umask(0o077)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(previous_umask)
+        server.daemon_threads = True
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
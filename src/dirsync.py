@@ -0,0 +1,204 @@
+import json
+import os
+import time
+
+from rich.console import Console
+
+from api import PostError
+from bulk import Bulk, run_concurrently
+from client import WriteFreely
+from mirror import body_hash
+from post import Post, split_title
+
+# Name of the manifest kept at the root of a synced directory.
+MANIFEST_NAME = ".writepyly-manifest.json"
+# Results recorded between saves of the manifest.
+SAVE_EVERY = 50
+
+
+def walk_markdown(directory: str) -> list:
+    """
+    Finds every Markdown file below a directory, skipping hidden files and
+    directories such as `.git`.
+
+    Returns:
+        list: Sorted paths relative to `directory`.
+    """
+    paths = list()
+    for root, directories, files in os.walk(directory):
+        directories[:] = [name for name in directories if not name.startswith(".")]
+        for name in files:
+            if name.endswith(".md") and not name.startswith("."):
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(paths)
+
+
+class DirectorySync:
+    """
+    Keeps a collection in step with a directory of Markdown files, rsync
+    style. A manifest in the directory maps each file to the ID of its post
+    and the hash of its content, so a run only sends requests for files that
+    were added, changed or (with `delete`) removed since the last one. Files
+    whose size and modification time are unchanged aren't even read.
+    """
+    def __init__(self, bulk: Bulk, client: WriteFreely, directory: str):
+        self.bulk = bulk
+        self.client = client
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        # The same directory can be synced to several collections.
+        self.target = f"{client.instance} {client.collection}"
+        self.manifest = self.load_manifest()
+        self.files = self.manifest.setdefault(self.target, dict())
+        self.console = Console()
+
+    def load_manifest(self) -> dict:
+        if not os.path.isfile(self.manifest_path):
+            return dict()
+        with open(self.manifest_path, "r") as manifest_file:
+            return json.load(manifest_file)
+
+    def save_manifest(self) -> None:
+        """
+        Atomically writes the manifest.
+        """
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def read_file(self, path: str) -> tuple:
+        """
+        Reads a file of the directory.
+
+        Returns:
+            tuple: The content, its hash and the file's manifest entry
+            without the post ID.
+        """
+        full_path = os.path.join(self.directory, path)
+        stat = os.stat(full_path)
+        with open(full_path, "r") as post_file:
+            content = post_file.read()
+        digest = body_hash(content)
+        return content, digest, {"hash": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def plan(self) -> tuple:
+        """
+        Compares the directory with the manifest.
+
+        Returns:
+            tuple: Lists of the paths to create, to update and that were
+            removed locally, and the number of unchanged files.
+        """
+        creates, updates = list(), list()
+        unchanged = 0
+        paths = walk_markdown(self.directory)
+        for path in paths:
+            known = self.files.get(path)
+            if known is None:
+                creates.append(path)
+                continue
+            stat = os.stat(os.path.join(self.directory, path))
+            if known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            _, digest, entry = self.read_file(path)
+            if digest == known.get("hash"):
+                # Touched but not edited; remember the new timestamp.
+                known.update(entry)
+                unchanged += 1
+            else:
+                updates.append(path)
+        removed = sorted(set(self.files) - set(paths))
+        return creates, updates, removed, unchanged
+
+    def apply(self, operation: tuple) -> dict:
+        """
+        Creates, updates or deletes the post of one file.
+
+        Args:
+            operation (tuple): The action ("create", "update" or "delete") and
+                the path of the file.
+
+        Returns:
+            dict: The file's new manifest entry, or `None` once deleted.
+        """
+        action, path = operation
+        if action == "delete":
+            status_code = self.client.remove_post(self.files[path]["id"])
+            # Already gone from the instance is as good as deleted.
+            if status_code not in (204, 404):
+                raise PostError(f"Delete unsuccessful with status code: {status_code}")
+            return None
+
+        content, _, entry = self.read_file(path)
+        post_title, post_content = split_title(content)
+        current_post = Post(
+            post_content,
+            self.client.instance,
+            self.client.access_token,
+            collection=self.client.collection,
+            title=post_title,
+            session=self.bulk.session,
+            journal=self.bulk.journal)
+        if action == "update":
+            status_code = current_post.update(self.files[path]["id"])
+            if status_code == 200:
+                entry["id"] = self.files[path]["id"]
+                return entry
+            # The post was deleted on the instance, so publish it again.
+            if status_code != 404:
+                raise PostError(f"Update unsuccessful with status code: {status_code}")
+        entry["id"] = current_post.submit()
+        return entry
+
+    def run(self, delete: bool = False, dry_run: bool = False) -> tuple:
+        """
+        Syncs the directory to the collection.
+
+        Args:
+            delete (bool): Delete the posts of files removed from the directory.
+            dry_run (bool): Only print what would be done.
+
+        Returns:
+            tuple: The IDs of the posts deleted and the list of tuples of the
+            path and error for every failure.
+        """
+        creates, updates, removed, unchanged = self.plan()
+        operations = [("create", path) for path in creates] + [("update", path) for path in updates]
+        if delete:
+            operations += [("delete", path) for path in removed]
+
+        if dry_run:
+            for action, path in operations:
+                self.console.print(f"Would {action}: {path}")
+            self.console.print(f"{len(operations)} changes, {unchanged} files unchanged.")
+            return list(), list()
+
+        deleted = list()
+        failures = list()
+        start = time.perf_counter()
+        try:
+            for index, (operation, entry, error) in enumerate(run_concurrently(self.apply, operations, self.bulk.workers), start=1):
+                action, path = operation
+                if error is not None:
+                    failures.append((path, error))
+                    self.console.print(f"{path}: failed to {action} with error: {error}", style="bold red")
+                    continue
+                if entry is None:
+                    deleted.append(self.files.pop(path)["id"])
+                    self.console.print(f"{path}: deleted")
+                else:
+                    self.files[path] = entry
+                    self.console.print(f"{path}: {action}d [bold purple]{entry['id']}[/bold purple]")
+                if index % SAVE_EVERY == 0:
+                    self.save_manifest()
+        finally:
+            # Keep whatever was done so an interrupted run isn't repeated.
+            self.save_manifest()
+
+        self.bulk.print_summary("Synced", len(operations), failures, time.perf_counter() - start)
+        self.console.print(f"{unchanged} files unchanged.")
+        if removed and not delete:
+            self.console.print(f"{len(removed)} files were removed locally but their posts were kept. Add --delete to remove them.")
+        return deleted, failures
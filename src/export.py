@@ -0,0 +1,181 @@
+import json
+import os
+
+from rich.console import Console
+
+from client import WriteFreely
+
+FORMATS = ("jsonl", "markdown")
+
+
+def post_to_markdown(post: dict) -> str:
+    """
+    Renders a post as Markdown, with its title as a heading on the first line
+    so that publishing the file again keeps the title.
+
+    Args:
+        post (dict): Post as returned by the API.
+
+    Returns:
+        str: The Markdown content.
+    """
+    body = post.get('body') or ""
+    if post.get('title'):
+        return f"# {post.get('title')}\n{body}"
+    return body
+
+
+class Exporter:
+    """
+    Writes every post of a collection to disk page by page, recording a
+    checkpoint after each page so an interrupted export resumes where it
+    stopped. Only one page of posts is held in memory at a time.
+
+    Posts published or deleted in the meantime shift every page, so the
+    checkpoint also records when the last exported post was created. Pages
+    are newest first: a resumed export starts from the page holding that
+    post and skips everything up to it.
+
+    The `jsonl` format writes one JSON object per line to a single file. The
+    `markdown` format writes one file per post into a directory.
+    """
+    def __init__(self, client: WriteFreely, output: str, output_format: str = "jsonl"):
+        self.client = client
+        self.output = output
+        self.output_format = output_format
+        if output_format == "jsonl":
+            self.checkpoint_path = f"{output}.checkpoint"
+        else:
+            self.checkpoint_path = os.path.join(output, ".checkpoint")
+        self.console = Console()
+
+    def load_checkpoint(self) -> dict:
+        """
+        Reads the checkpoint of an earlier, unfinished export of the same
+        collection and format.
+
+        Returns:
+            dict: The last finished page and the size of the output at that
+            point, or an empty dict when starting over.
+        """
+        if not os.path.isfile(self.checkpoint_path):
+            return dict()
+        try:
+            with open(self.checkpoint_path, "r") as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except Exception:
+            return dict()
+        if checkpoint.get("collection") != self.client.collection or checkpoint.get("format") != self.output_format:
+            return dict()
+        return checkpoint
+
+    def save_checkpoint(self, page: int, offset: int, count: int, last_created: str = None, last_ids: set = None) -> None:
+        """
+        Atomically records that every page up to `page` has been written, up
+        to the posts created at `last_created` whose IDs are `last_ids`.
+        """
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump({
+                "collection": self.client.collection,
+                "format": self.output_format,
+                "page": page,
+                "offset": offset,
+                "count": count,
+                "last_created": last_created,
+                "last_ids": sorted(last_ids or ())}, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def resume_page(self, page: int, last_created: str) -> int:
+        """
+        Finds the page to resume from: the last page that was exported,
+        unless deleted posts moved the last exported post to an earlier one.
+
+        Args:
+            page (int): Last page written by the interrupted export.
+            last_created (str): Creation time of the last exported post.
+
+        Returns:
+            int: The first page that may hold posts not exported yet.
+        """
+        while page > 1:
+            page_posts = self.client.fetch_page(page)
+            if page_posts and (page_posts[0].get('created') or "") >= last_created:
+                break
+            page -= 1
+        return page
+
+    def write_markdown(self, posts: list) -> None:
+        for post in posts:
+            file_name = f"{post.get('slug') or post.get('id')}.md"
+            with open(os.path.join(self.output, file_name), "w") as post_file:
+                post_file.write(post_to_markdown(post))
+
+    def run(self, restart: bool = False) -> int:
+        """
+        Exports the collection, resuming from the checkpoint unless `restart`.
+
+        Returns:
+            int: The total number of posts exported.
+        """
+        checkpoint = dict() if restart else self.load_checkpoint()
+        page = checkpoint.get("page", 0)
+        count = checkpoint.get("count", 0)
+        # The oldest posts exported so far, newer posts having been exported
+        # before them.
+        last_created = checkpoint.get("last_created")
+        last_ids = set(checkpoint.get("last_ids") or ())
+        if page:
+            self.console.print(f"Resuming export after page {page} ({count} posts).")
+
+        output_file = None
+        if self.output_format == "jsonl":
+            output_dir = os.path.dirname(os.path.abspath(self.output))
+            os.makedirs(output_dir, exist_ok=True)
+            output_file = open(self.output, "ab" if page else "wb")
+            # Drop anything written after the last checkpoint.
+            output_file.truncate(checkpoint.get("offset", 0))
+            output_file.seek(0, os.SEEK_END)
+        else:
+            os.makedirs(self.output, exist_ok=True)
+
+        def exported(post: dict) -> bool:
+            created = post.get('created') or ""
+            return last_created is not None and (created > last_created or (created == last_created and post.get('id') in last_ids))
+
+        try:
+            if page and last_created is not None:
+                # The loop below fetches the page after `page`.
+                page = self.resume_page(page, last_created) - 1
+            while True:
+                page_posts = self.client.fetch_page(page + 1)
+                if not page_posts:
+                    break
+                page += 1
+
+                page_posts = [post for post in page_posts if not exported(post)]
+                for post in page_posts:
+                    if (post.get('created') or "") != last_created:
+                        last_created = post.get('created') or ""
+                        last_ids = set()
+                    last_ids.add(post.get('id'))
+
+                if output_file is not None:
+                    for post in page_posts:
+                        output_file.write(json.dumps(post).encode("utf-8") + b"\n")
+                    output_file.flush()
+                    os.fsync(output_file.fileno())
+                else:
+                    self.write_markdown(page_posts)
+
+                count += len(page_posts)
+                self.save_checkpoint(page, output_file.tell() if output_file else 0, count, last_created, last_ids)
+                self.console.print(f"Exported page {page} ({count} posts).")
+        finally:
+            if output_file is not None:
+                output_file.close()
+
+        # The export is complete, so there's nothing left to resume.
+        if os.path.isfile(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return count
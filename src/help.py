@@ -14,9 +14,11 @@ class Helper:
         `writepyly help`
         """
         print("writepyly - CLI tool for posting to a Write Freely instance.")
-        print("\n\twritepyly help | login | logout | post | get | delete")
+        print("\n\twritepyly help | login | logout | post | get | delete | move | pin | unpin | sync | search | export | import | sync-dir | flush | daemon | batch")
         print("\nHelp can be combined with other commands for additional detail:")
-        print("\n\twritepyly help login\n")
+        print("\n\twritepyly help login")
+        print("\nAny command also accepts --trace to print the timings of its requests,")
+        print("and --metrics-json <file> to write them to a file as JSON.\n")
 
     def help_login(self) -> None:
         """
@@ -42,6 +44,9 @@ class Helper:
         print("\nBe aware that if you have a strong password with special characters")
         print("you may need to wrap it in single quotes so that it is treated")
         print("literally by your shell.")
+        print("\nTo keep logins to several instances, add --profile with a name for")
+        print("each. Profiles are used by \"writepyly post --to\":")
+        print("\n\twritepyly login myusername password123 write.as --profile personal")
 
     def help_logout(self) -> None:
         """
@@ -56,6 +61,9 @@ class Helper:
         print("\n\twritepyly logout")
         print("\nThe configuration file is located at:")
         print("\n\t~/.config/writepyly/config.json\n")
+        print("Add --profile to log out of a profile created with \"login --profile\"")
+        print("instead, leaving the other logins in place:")
+        print("\n\twritepyly logout --profile personal\n")
 
     def help_post(self) -> None:
         """
@@ -74,6 +82,28 @@ class Helper:
         print("\nThis example shows the same as above, but the post content")
         print("is submitted via STDIN:")
         print("\n\tcat ../sample_data/test_post.md | writepyly post -- api-tester\n")
+        print("Content is streamed to the instance as it's read, so large posts")
+        print("don't need to fit in memory. Add --gzip to compress the upload if")
+        print("your instance accepts gzip-encoded requests.\n")
+        print("Many files can be published at once with --batch, given either a")
+        print("directory (every .md file in it) or a glob pattern:")
+        print("\n\twritepyly post --batch ../sample_data api-tester")
+        print("\twritepyly post --batch '../sample_data/**/*.md' api-tester\n")
+        print("Files are uploaded concurrently (4 at a time, which can be changed")
+        print("with --workers). Failures are reported at the end instead of")
+        print("stopping the batch.")
+        print("\nCollections that were recently found to be valid aren't checked")
+        print("again. Add --no-verify to skip the check entirely.")
+        print("\nTo publish the same post to several instances or collections at once,")
+        print("list profiles (see \"writepyly help login\") and collections with --to.")
+        print("\"default\" is the login made without --profile:")
+        print("\n\twritepyly post post.md --to default:blog,personal:notes\n")
+        print("Add --queue to save the post to the outbox instead of sending it")
+        print("right away. Queued posts are published by \"writepyly flush\".")
+        print("\nPosting the same title and content to the same collection again")
+        print("within a week returns the existing post instead of publishing a")
+        print("duplicate (see journal_ttl in the README). Add --force to publish it")
+        print("again anyway; this works with --batch and --to too.")
 
     def help_get(self) -> None:
         """
@@ -83,9 +113,26 @@ class Helper:
         """
         print("Returns the title, post date, and ID of your posts at the specified")
         print("collection. ONLY collections can be queried for posts, so the")
-        print("collection name must be included. As the API will return only")
-        print("the last 10 posts, that's how many will be displayed here.")
+        print("collection name must be included. By default only the first page")
+        print("the API returns (the last 10 posts) will be displayed here.")
         print("\n\twritepyly get {collection}\n")
+        print("To walk the whole collection, add --all. To read only the first")
+        print("few pages, use --pages with the number of pages:")
+        print("\n\twritepyly get {collection} --all")
+        print("\twritepyly get {collection} --pages 5\n")
+        print("Add --no-verify to skip checking that the collection exists first.")
+        print("Pages are fetched concurrently and posts are shown as soon as")
+        print("their page arrives. The number of pages requested at once can")
+        print("be changed with --workers (default: 4).")
+        print("\nOnce a collection has been synced with \"writepyly sync\", posts are")
+        print("listed from the local mirror instead. Add --refresh to ask the")
+        print("server anyway:")
+        print("\n\twritepyly get {collection} --refresh\n")
+        print("For scripts, --format json, ndjson or tsv writes plain records to")
+        print("STDOUT as they arrive instead. --fields picks what each record holds")
+        print("(default: id,slug,title,created,updated):")
+        print("\n\twritepyly get {collection} --all --format ndjson --fields id,title")
+        print("\twritepyly get {collection} --format ndjson | writepyly delete -\n")
 
     def help_delete(self) -> None:
         """
@@ -96,7 +143,189 @@ class Helper:
         print("Requires a post ID to be given as a parameter after the delete")
         print("command:")
         print("\n\twritepyly delete {post_id}\n")
+        print("Many posts can be deleted at once by reading their IDs, one per")
+        print("line, from a file or from STDIN with -:")
+        print("\n\twritepyly delete --from-file ids.txt")
+        print("\twritepyly get {collection} --all | writepyly delete -\n")
+        print("Posts are deleted concurrently (4 at a time, which can be changed")
+        print("with --workers) and a summary is printed once all have been tried.")
         print("Post IDs can be obtained from:")
         print("\n\twritepyly get\n")
         print("For additional information see:")
         print("\n\twritepyly help get")
+
+    def help_move(self) -> None:
+        """
+        Help message when `move` is passed as an additional parameter.
+
+        `writepyly help move`
+        """
+        print("Moves posts into a collection. Requires the IDs of the posts")
+        print("followed by the alias of the collection:")
+        print("\n\twritepyly move {post_id} [{post_id}...] {collection}\n")
+        print("IDs can also be read, one per line, from a file or from STDIN")
+        print("with -:")
+        print("\n\twritepyly move --from-file ids.txt {collection}")
+        print("\twritepyly get {collection} --all | writepyly move - {other_collection}\n")
+        print("Posts are sent 50 per request (change this with --batch-size or")
+        print("the batch_size setting), 4 requests at a time (change this with")
+        print("--workers). The result is printed for every post, followed by a")
+        print("summary. Add --no-verify to skip checking that the collection")
+        print("exists first.")
+
+    def help_pin(self) -> None:
+        """
+        Help message when `pin` or `unpin` is passed as an additional parameter.
+
+        `writepyly help pin`
+        """
+        print("Pins posts to the top of their collection, or unpins them.")
+        print("Requires the IDs of the posts followed by the alias of the")
+        print("collection:")
+        print("\n\twritepyly pin {post_id} [{post_id}...] {collection}")
+        print("\twritepyly unpin {post_id} [{post_id}...] {collection}\n")
+        print("Posts are pinned in the order they're given. Like with move, IDs")
+        print("can be read from a file with --from-file or from STDIN with -,")
+        print("and --batch-size, --workers and --no-verify are accepted. See:")
+        print("\n\twritepyly help move")
+
+    def help_sync(self) -> None:
+        """
+        Help message when `sync` is passed as an additional parameter.
+
+        `writepyly help sync`
+        """
+        print("Keeps a local copy of a collection's posts so that \"writepyly get\"")
+        print("can answer without contacting the server:")
+        print("\n\twritepyly sync {collection}\n")
+        print("The first sync downloads every post. Later syncs only read pages")
+        print("until they reach posts that are already known and unchanged.")
+        print("Edits to older posts or deletions made elsewhere are picked up")
+        print("by a full sync:")
+        print("\n\twritepyly sync {collection} --full\n")
+        print("The mirror is stored in:")
+        print("\n\t~/.config/writepyly/mirror.db\n")
+
+    def help_search(self) -> None:
+        """
+        Help message when `search` is passed as an additional parameter.
+
+        `writepyly help search`
+        """
+        print("Finds posts in a collection by the words in their title and body,")
+        print("best match first, without contacting the server:")
+        print("\n\twritepyly search {collection} garden coffee\n")
+        print("Every word must be present; OR between two words accepts either.")
+        print("Words in double quotes must appear as a phrase and a word ending")
+        print("in * matches any word starting with it. Only keep posts created")
+        print("on or between dates with --since and --until:")
+        print("\n\twritepyly search {collection} '\"morning routine\"' --since 2023-01-01\n")
+        print("Searches use the local mirror (see \"writepyly help sync\"). A")
+        print("collection that was never synced is synced first; add --sync to")
+        print("bring it up to date before searching. --limit changes the number")
+        print("of results (default: 20), and --format and --fields work like they")
+        print("do for \"writepyly get\", with score and snippet as extra fields.")
+
+    def help_export(self) -> None:
+        """
+        Help message when `export` is passed as an additional parameter.
+
+        `writepyly help export`
+        """
+        print("Backs up every post of a collection. By default the posts are")
+        print("written as JSON, one per line, to {collection}.jsonl:")
+        print("\n\twritepyly export {collection}\n")
+        print("Use --format markdown to write one Markdown file per post into a")
+        print("directory instead, and --output to choose the file or directory:")
+        print("\n\twritepyly export {collection} --format markdown --output backup/\n")
+        print("Progress is saved after every page, so running the same command")
+        print("again after an interruption resumes where it stopped. Add")
+        print("--restart to start over.")
+
+    def help_import(self) -> None:
+        """
+        Help message when `import` is passed as an additional parameter.
+
+        `writepyly help import`
+        """
+        print("Publishes a dump of posts to a collection. The dump can be a JSONL")
+        print("file or a directory of Markdown files, such as those written by")
+        print("\"writepyly export\":")
+        print("\n\twritepyly import backup.jsonl {collection}")
+        print("\twritepyly import backup/ {collection}\n")
+        print("Posts whose content is already in the collection are skipped, so")
+        print("an interrupted import can simply be run again. Posts are published")
+        print("concurrently (4 at a time, which can be changed with --workers).")
+
+    def help_sync_dir(self) -> None:
+        """
+        Help message when `sync-dir` is passed as an additional parameter.
+
+        `writepyly help sync-dir`
+        """
+        print("Keeps a collection in step with a directory of Markdown files,")
+        print("including its subdirectories:")
+        print("\n\twritepyly sync-dir blog/ {collection}\n")
+        print("The first run publishes every file. A manifest saved in the")
+        print("directory (.writepyly-manifest.json) remembers each file's post, so")
+        print("later runs only publish new files and update the posts of files")
+        print("that changed. Add --delete to also delete the posts of files that")
+        print("were removed, and --dry-run to see what would be done first:")
+        print("\n\twritepyly sync-dir blog/ {collection} --delete --dry-run\n")
+        print("Changes are sent concurrently (4 at a time, which can be changed")
+        print("with --workers).")
+
+    def help_batch(self) -> None:
+        """
+        Help message when `batch` is passed as an additional parameter.
+
+        `writepyly help batch`
+        """
+        print("Runs the operations in a file, one JSON object per line, or from STDIN")
+        print("with -:")
+        print("\n\twritepyly batch ops.jsonl\n")
+        print("Each line has an \"op\" and its fields:")
+        print("\n\t{\"op\": \"post\", \"collection\": \"blog\", \"file\": \"post.md\"}")
+        print("\t{\"op\": \"post\", \"collection\": \"blog\", \"title\": \"Hi\", \"body\": \"...\"}")
+        print("\t{\"op\": \"get\", \"collection\": \"blog\", \"pages\": 2, \"fields\": [\"id\"]}")
+        print("\t{\"op\": \"delete\", \"id\": \"rf3t35fkax0aw\"}")
+        print("\t{\"op\": \"move\", \"collection\": \"blog\", \"ids\": [\"rf3t35fkax0aw\"]}")
+        print("\t{\"op\": \"pin\", \"collection\": \"blog\", \"ids\": [\"rf3t35fkax0aw\"]}\n")
+        print("Any operation can add a \"profile\" to use and a \"ref\" to find its")
+        print("result by. Operations run concurrently (4 at a time, which can be")
+        print("changed with --workers) and each result is printed as a JSON line with")
+        print("the line it answers as soon as it's done. Add --no-verify to skip")
+        print("checking collections.")
+
+    def help_daemon(self) -> None:
+        """
+        Help message when `daemon` is passed as an additional parameter.
+
+        `writepyly help daemon`
+        """
+        print("Starts a background process that keeps connections to your instance,")
+        print("the configuration and the collection cache warm between commands:")
+        print("\n\twritepyly daemon &\n")
+        print("While it's running, every other writepyly command is sent to it over")
+        print("the socket at ~/.config/writepyly/daemon.sock and runs there, so a")
+        print("command costs little more than its requests to the instance. Commands")
+        print("run one at a time. Add --no-daemon to any command to run it on its")
+        print("own instead. Stop the daemon with Ctrl+C or:")
+        print("\n\twritepyly daemon stop\n")
+
+    def help_flush(self) -> None:
+        """
+        Help message when `flush` is passed as an additional parameter.
+
+        `writepyly help flush`
+        """
+        print("Publishes the posts waiting in the outbox at:")
+        print("\n\t~/.config/writepyly/outbox\n")
+        print("Posts end up there when created with \"writepyly post --queue\" or")
+        print("from the interactive console. A post only leaves the outbox once")
+        print("the instance has accepted it; failed posts stay queued for the")
+        print("next flush.")
+        print("\n\twritepyly flush\n")
+        print("Posts are published concurrently (4 at a time, which can be changed")
+        print("with --workers). Add --list to see what's queued without sending it:")
+        print("\n\twritepyly flush --list\n")
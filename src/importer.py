@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+from typing import Iterator
+
+from rich.console import Console
+
+from bulk import Bulk, expand_paths, run_concurrently
+from client import WriteFreely
+from mirror import Mirror, body_hash
+from post import Post, split_title
+
+
+def read_jsonl(path: str) -> Iterator[tuple]:
+    """
+    Reads posts from a JSONL dump such as the one written by `export`.
+
+    Yields:
+        tuple: A label for the post, its title and its body.
+    """
+    with open(path, "r") as dump_file:
+        for line_number, line in enumerate(dump_file, start=1):
+            if not line.strip():
+                continue
+            post = json.loads(line)
+            yield f"{path}:{line_number}", post.get('title'), post.get('body') or ""
+
+
+def read_markdown(path: str) -> Iterator[tuple]:
+    """
+    Reads posts from a directory of Markdown files, using a heading on the
+    first line as the title like `post` does.
+
+    Yields:
+        tuple: The path of the file, the post's title and its body.
+    """
+    for file_path in expand_paths(path):
+        with open(file_path, "r") as post_file:
+            post_title, post_content = split_title(post_file.read())
+        yield file_path, post_title, post_content
+
+
+class Importer:
+    """
+    Publishes a dump of posts to a collection in parallel, skipping posts whose
+    normalized body is already in the collection. The collection's hashes come
+    from the local mirror, which is synced first, so rerunning an interrupted
+    import only costs the requests for the posts that are still missing.
+    """
+    def __init__(self, bulk: Bulk, client: WriteFreely, mirror: Mirror = None):
+        self.bulk = bulk
+        self.client = client
+        self.mirror = mirror or Mirror()
+        self.console = Console()
+
+    def known_hashes(self) -> set:
+        """
+        Syncs the collection's mirror and returns the body hashes of its posts.
+        """
+        self.mirror.sync(self.client)
+        return self.mirror.body_hashes(self.client.instance, self.client.collection)
+
+    def run(self, source: str) -> tuple:
+        """
+        Imports a JSONL file or a directory of Markdown files.
+
+        Returns:
+            tuple: The number of posts published, the number skipped and the
+            list of tuples of the label and error for every failure.
+        """
+        known = self.known_hashes()
+        entries = read_markdown(source) if os.path.isdir(source) else read_jsonl(source)
+        skipped = 0
+
+        def pending() -> Iterator[tuple]:
+            nonlocal skipped
+            for label, post_title, post_content in entries:
+                digest = body_hash(post_content)
+                if digest in known:
+                    skipped += 1
+                    continue
+                # Also skips duplicates within the dump itself.
+                known.add(digest)
+                yield label, post_title, post_content
+
+        def publish(entry: tuple) -> str:
+            _, post_title, post_content = entry
+            current_post = Post(
+                post_content,
+                self.client.instance,
+                self.client.access_token,
+                collection=self.client.collection,
+                title=post_title,
+                session=self.bulk.session,
+                journal=self.bulk.journal)
+            return current_post.submit()
+
+        published = 0
+        failures = list()
+        start = time.perf_counter()
+        for entry, post_id, error in run_concurrently(publish, pending(), self.bulk.workers):
+            if error is None:
+                published += 1
+                self.console.print(f"{entry[0]}: [bold purple]{post_id}[/bold purple]")
+            else:
+                failures.append((entry[0], error))
+                self.console.print(f"{entry[0]}: failed with error: {error}", style="bold red")
+
+        self.bulk.print_summary("Imported", published + len(failures), failures, time.perf_counter() - start)
+        self.console.print(f"Skipped {skipped} posts already in the collection.")
+        return published, skipped, failures
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from __init__ import JOURNAL_PATH, JOURNAL_TTL
+
+
+def submission_key(instance: str, collection: str, title: str, digest: str) -> str:
+    """
+    Returns the idempotency key of a post: the same title and content sent to
+    the same collection (or to drafts) of the same instance always gets the
+    same key.
+
+    Args:
+        instance (str): Instance the post is sent to.
+        collection (str): Collection the post is sent to, or `None` for drafts.
+        title (str): Title of the post, or `None`.
+        digest (str): Hash of the post's content, see `mirror.body_hash`.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the submission.
+    """
+    identity = json.dumps([instance, collection or "", title or "", digest])
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class Journal:
+    """
+    Local SQLite record of the posts being created, so that sending the same
+    post again never creates a duplicate. A submission is recorded as pending
+    before its request is sent and completed with the post's ID once the
+    instance accepts it. When a request fails without telling whether the
+    post was created, e.g. it timed out, the entry stays pending and the
+    collection is searched for the post before it's sent again.
+
+    Completed entries are kept for `ttl` seconds, during which an identical
+    post to the same collection returns the existing ID instead of being
+    published again, as long as the post still exists. Pending entries are
+    kept until they're resolved, and entries of deleted posts are forgotten.
+    """
+    def __init__(self, path: str = JOURNAL_PATH, ttl: float = JOURNAL_TTL):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        # Posts may be submitted from several threads at once.
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    key TEXT PRIMARY KEY,
+                    instance TEXT NOT NULL,
+                    collection TEXT,
+                    title TEXT,
+                    digest TEXT NOT NULL,
+                    post_id TEXT,
+                    started REAL NOT NULL,
+                    finished REAL)""")
+            self.connection.execute(
+                "DELETE FROM submissions WHERE post_id IS NOT NULL AND finished < ?",
+                (time.time() - self.ttl,))
+
+    @classmethod
+    def from_config(cls, config) -> "Journal":
+        """
+        Creates a journal using the TTL of a loaded `ConfigObj`.
+        """
+        return cls(ttl=config.journal_ttl)
+
+    def lookup(self, key: str) -> dict:
+        """
+        Looks up a submission.
+
+        Returns:
+            dict: The entry, with a `post_id` of `None` while it's pending, or
+            `None` when there's no entry or its post was published longer than
+            `ttl` seconds ago.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM submissions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row["post_id"] is not None and time.time() - row["finished"] > self.ttl:
+            return None
+        return dict(row)
+
+    def begin(self, key: str, instance: str, collection: str, title: str, digest: str) -> float:
+        """
+        Records a submission as pending, right before its request is sent.
+
+        Returns:
+            float: The time the submission started.
+        """
+        started = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?, ?, ?, NULL, ?, NULL)",
+                (key, instance, collection, title, digest, started))
+        return started
+
+    def complete(self, key: str, post_id: str) -> None:
+        """
+        Records the ID of the post created by a submission.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE submissions SET post_id = ?, finished = ? WHERE key = ?",
+                (post_id, time.time(), key))
+
+    def discard(self, key: str) -> None:
+        """
+        Forgets a submission that certainly didn't create a post, e.g. one the
+        instance rejected.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM submissions WHERE key = ?", (key,))
+
+    def forget(self, instance: str, post_id: str) -> None:
+        """
+        Forgets the submission that created a post once the post is deleted,
+        so the same content can be published again.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM submissions WHERE instance = ? AND post_id = ?",
+                (instance, post_id))
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,239 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Timings recorded for every request, in milliseconds, and their headings.
+PHASES = ("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "total_ms")
+HEADINGS = ("DNS", "Connect", "TLS", "TTFB", "Total")
+
+# Tracer picked up by every new `WriteSession`, set by `--trace` and
+# `--metrics-json`. `None` leaves the transport untouched.
+TRACER = None
+
+
+class Tracer:
+    """
+    Records the timings of every HTTP request sent through a `WriteSession`:
+    DNS resolution, TCP connect, TLS handshake, time to first byte and total,
+    along with the bytes sent and received and the status. Connection setup
+    is only paid by the requests that opened a new connection, the others
+    report 0 for those phases.
+    """
+    def __init__(self):
+        self.records = list()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def current(self) -> dict:
+        """
+        Returns the record of the request being sent by this thread, if any.
+        """
+        return getattr(self.local, "record", None)
+
+    def send(self, method: str, url: str, send):
+        """
+        Sends a request once, recording its timings.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): Full URL of the request.
+            send (Callable): Sends the request and returns the response.
+
+        Returns:
+            requests.Response: The response from the server.
+        """
+        record = {"method": method, "url": url, "status": None, "bytes_sent": 0, "bytes_received": 0}
+        record.update(dict.fromkeys(PHASES, 0.0))
+        self.local.record = record
+        start = time.perf_counter()
+        try:
+            response = send()
+            record["status"] = response.status_code
+            # Streamed responses are read by the caller; don't load them here.
+            record["bytes_received"] = int(response.headers.get("Content-Length") or 0) or len(response.content)
+            return response
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["total_ms"] = (time.perf_counter() - start) * 1000
+            self.local.record = None
+            with self.lock:
+                self.records.append(record)
+
+    def summary(self) -> dict:
+        """
+        Aggregates the recorded requests.
+
+        Returns:
+            dict: The number of requests and errors, the bytes transferred and
+            the sum of every phase.
+        """
+        with self.lock:
+            records = list(self.records)
+        totals = {phase: sum(record[phase] for record in records) for phase in PHASES}
+        totals.update({
+            "requests": len(records),
+            "errors": sum(1 for record in records if record["status"] is None or record["status"] >= 400),
+            "bytes_sent": sum(record["bytes_sent"] for record in records),
+            "bytes_received": sum(record["bytes_received"] for record in records)})
+        return totals
+
+    def print_summary(self) -> None:
+        """
+        Prints a table of every request and the totals to STDERR, keeping
+        STDOUT clean for the command's own output.
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        table = Table(title="Requests (ms)")
+        table.add_column("Request", overflow="fold")
+        table.add_column("Status", justify="right")
+        for heading in HEADINGS:
+            table.add_column(heading, justify="right")
+        table.add_column("Sent B", justify="right")
+        table.add_column("Recv B", justify="right")
+
+        with self.lock:
+            records = list(self.records)
+        for record in records:
+            table.add_row(
+                f"{record['method']} {urlsplit(record['url']).path}",
+                str(record["status"] or record.get("error")),
+                *(f"{record[phase]:.1f}" for phase in PHASES),
+                str(record["bytes_sent"]),
+                str(record["bytes_received"]))
+
+        totals = self.summary()
+        table.add_row(
+            f"Total ({totals['requests']})",
+            f"{totals['errors']} err",
+            *(f"{totals[phase]:.1f}" for phase in PHASES),
+            str(totals["bytes_sent"]),
+            str(totals["bytes_received"]),
+            style="bold")
+        Console(stderr=True).print(table)
+
+    def write_json(self, path: str) -> None:
+        """
+        Atomically writes every record and the summary as JSON to `path`.
+        """
+        with self.lock:
+            records = list(self.records)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            json.dump({"requests": records, "summary": self.summary()}, metrics_file, indent=2)
+        os.replace(temp_path, path)
+
+
+class TracedConnectionMixin:
+    """
+    Times the phases of a urllib3 connection into the record of the request
+    being sent by the current thread.
+    """
+    tracer = None
+
+    def record(self) -> dict:
+        return self.tracer.current() if self.tracer is not None else None
+
+    def _new_conn(self):
+        record = self.record()
+        if record is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            address = socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+        except socket.gaierror:
+            # Let urllib3 fail the usual way.
+            address = self._dns_host
+        resolved = time.perf_counter()
+        record["dns_ms"] = (resolved - start) * 1000
+
+        # Connect to the address resolved above; the host name is still used
+        # for TLS and the Host header.
+        dns_host = self._dns_host
+        self._dns_host = address
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+            record["connect_ms"] = (time.perf_counter() - resolved) * 1000
+
+    def connect(self):
+        record = self.record()
+        if record is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.connected_at = time.perf_counter()
+            # Whatever connecting took beyond DNS and TCP was the handshake.
+            setup_ms = (self.connected_at - start) * 1000
+            record["tls_ms"] = max(0.0, setup_ms - record["dns_ms"] - record["connect_ms"])
+
+    def request(self, *args, **kwargs):
+        self.started_at = time.perf_counter()
+        return super().request(*args, **kwargs)
+
+    def request_chunked(self, *args, **kwargs):
+        self.started_at = time.perf_counter()
+        return super().request_chunked(*args, **kwargs)
+
+    def send(self, data):
+        record = self.record()
+        if record is not None and hasattr(data, "__len__"):
+            record["bytes_sent"] += len(data)
+        return super().send(data)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        record = self.record()
+        if record is not None:
+            # Plain HTTP connections are opened lazily within `request`.
+            sent_at = max(getattr(self, "started_at", 0.0), getattr(self, "connected_at", 0.0))
+            record["ttfb_ms"] = (time.perf_counter() - sent_at) * 1000
+        return response
+
+
+class TracingAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connections report their timings to `tracer`.
+    Only mounted when tracing is enabled, so the default transport carries
+    none of this.
+    """
+    def __init__(self, tracer: Tracer, **kwargs):
+        connection_classes = {
+            "http": type("TracedHTTPConnection", (TracedConnectionMixin, HTTPConnection), {"tracer": tracer}),
+            "https": type("TracedHTTPSConnection", (TracedConnectionMixin, HTTPSConnection), {"tracer": tracer}),
+        }
+        self.pool_classes = {
+            "http": type("TracedHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": connection_classes["http"]}),
+            "https": type("TracedHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": connection_classes["https"]}),
+        }
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+
+def enable() -> Tracer:
+    """
+    Turns on tracing for every `WriteSession` created from now on.
+
+    Returns:
+        Tracer: The tracer collecting the timings.
+    """
+    global TRACER
+    TRACER = Tracer()
+    return TRACER
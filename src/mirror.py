@@ -0,0 +1,383 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+from typing import Iterator
+
+from __init__ import MIRROR_PATH
+
+# Weights of the title and body columns when ranking search results.
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+# Words of context around the matched terms in a search snippet.
+SNIPPET_WORDS = 12
+
+
+class BodyHasher:
+    """
+    Hashes a post body fed in pieces, e.g. as it's streamed from a file, after
+    normalizing line endings and surrounding whitespace so that cosmetic
+    differences don't change the result. Trailing whitespace is dropped from
+    every line, and blank lines and whitespace at either end of the body are
+    dropped too.
+    """
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.line = ""
+        self.started = False
+        # Blank lines held back until more content shows they aren't trailing.
+        self.blank_lines = 0
+
+    def add_line(self, line: str) -> None:
+        line = line.rstrip()
+        if not self.started:
+            line = line.lstrip()
+            if not line:
+                return
+            self.started = True
+        elif not line:
+            self.blank_lines += 1
+            return
+        else:
+            line = "\n" * (self.blank_lines + 1) + line
+            self.blank_lines = 0
+        self.digest.update(line.encode("utf-8"))
+
+    def update(self, chunk: str) -> None:
+        lines = (self.line + chunk).split("\n")
+        self.line = lines.pop()
+        for line in lines:
+            self.add_line(line)
+
+    def hexdigest(self) -> str:
+        """
+        Returns the hex SHA-256 digest of the normalized body. Nothing can be
+        added afterwards.
+        """
+        self.add_line(self.line)
+        self.line = ""
+        return self.digest.hexdigest()
+
+
+def body_hash(body: str) -> str:
+    """
+    Hashes a post body after normalizing line endings and surrounding
+    whitespace so that cosmetic differences don't change the result.
+
+    Args:
+        body (str): Post body.
+
+    Returns:
+        str: Hex SHA-256 digest of the normalized body.
+    """
+    hasher = BodyHasher()
+    hasher.update(body)
+    return hasher.hexdigest()
+
+
+def build_match(query: str) -> str:
+    """
+    Turns a search query into an FTS5 match expression. Words must all be
+    present, "quoted words" must appear as a phrase, a trailing * matches
+    any word starting with what precedes it and OR between two words accepts
+    either of them. Everything else is quoted, so punctuation in the query
+    can never be read as FTS5 syntax.
+
+    Args:
+        query (str): Query as typed by the user.
+
+    Returns:
+        str: The match expression.
+
+    Raises:
+        ValueError: The query has no words to search for.
+    """
+    terms = list()
+    for phrase, word in re.findall(r'"([^"]*)"?|(\S+)', query):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word == "OR" and terms and terms[-1] != "OR":
+            terms.append("OR")
+        elif word.rstrip("*"):
+            prefix = "*" if word.endswith("*") else ""
+            terms.append('"' + word.rstrip("*") + '"' + prefix)
+    if terms and terms[-1] == "OR":
+        terms.pop()
+    if not terms:
+        raise ValueError("The query has no words to search for.")
+    return " ".join(terms)
+
+
+class Mirror:
+    """
+    Local SQLite copy of the posts in one or more collections, so that listing
+    a collection doesn't require downloading it again.
+
+    Titles and bodies are also kept in a full-text index (an FTS5 table over
+    the posts table). Triggers update the index along with every post that's
+    stored or removed, so it never has to be rebuilt after a sync. If SQLite
+    was built without FTS5 the mirror still works, but can't be searched.
+    """
+    def __init__(self, path: str = MIRROR_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        # Makes `INSERT OR REPLACE` fire the delete trigger of the replaced row.
+        self.connection.execute("PRAGMA recursive_triggers = ON")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS posts (
+                    instance TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    slug TEXT,
+                    title TEXT,
+                    created TEXT,
+                    updated TEXT,
+                    body_hash TEXT,
+                    body TEXT,
+                    PRIMARY KEY (instance, collection, id))""")
+            self.connection.execute("""
+                CREATE INDEX IF NOT EXISTS posts_created
+                ON posts (instance, collection, created)""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS collections (
+                    instance TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    synced REAL,
+                    newest TEXT,
+                    PRIMARY KEY (instance, collection))""")
+            columns = [row["name"] for row in self.connection.execute("PRAGMA table_info(collections)")]
+            if "newest" not in columns:
+                # Mirrors created before syncs kept a high-water mark.
+                self.connection.execute("ALTER TABLE collections ADD COLUMN newest TEXT")
+        self.searchable = self.create_index()
+
+    def create_index(self) -> bool:
+        """
+        Creates the full-text index and the triggers keeping it in step with
+        the posts table. An index added to an existing mirror is filled from
+        the posts already stored.
+
+        Returns:
+            bool: Whether the index is available.
+        """
+        existing = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'posts_search'").fetchone()
+        try:
+            with self.connection:
+                self.connection.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5 (
+                        title, body,
+                        content = 'posts',
+                        tokenize = 'porter unicode61 remove_diacritics 2')""")
+                self.connection.execute("""
+                    CREATE TRIGGER IF NOT EXISTS posts_search_insert AFTER INSERT ON posts BEGIN
+                        INSERT INTO posts_search (rowid, title, body)
+                        VALUES (new.rowid, new.title, new.body);
+                    END""")
+                self.connection.execute("""
+                    CREATE TRIGGER IF NOT EXISTS posts_search_delete AFTER DELETE ON posts BEGIN
+                        INSERT INTO posts_search (posts_search, rowid, title, body)
+                        VALUES ('delete', old.rowid, old.title, old.body);
+                    END""")
+                self.connection.execute("""
+                    CREATE TRIGGER IF NOT EXISTS posts_search_update AFTER UPDATE ON posts BEGIN
+                        INSERT INTO posts_search (posts_search, rowid, title, body)
+                        VALUES ('delete', old.rowid, old.title, old.body);
+                        INSERT INTO posts_search (rowid, title, body)
+                        VALUES (new.rowid, new.title, new.body);
+                    END""")
+                if existing is None:
+                    self.connection.execute("INSERT INTO posts_search (posts_search) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            # No FTS5 in this build of SQLite.
+            return False
+        return True
+
+    def has_collection(self, instance: str, collection: str) -> bool:
+        """
+        Checks whether a collection has been synced at least once.
+
+        Returns:
+            bool: `True` if the mirror holds the collection.
+        """
+        row = self.connection.execute(
+            "SELECT 1 FROM collections WHERE instance = ? AND collection = ?",
+            (instance, collection)).fetchone()
+        return row is not None
+
+    def high_water_mark(self, instance: str, collection: str) -> str:
+        """
+        Returns the creation time of the newest post seen by a sync of the
+        collection, or `None` if it was never synced. Posts added to the
+        mirror by other commands don't move it, so every post created after
+        it is downloaded by the next sync.
+        """
+        row = self.connection.execute(
+            "SELECT newest FROM collections WHERE instance = ? AND collection = ?",
+            (instance, collection)).fetchone()
+        return row["newest"] if row is not None else None
+
+    def known_posts(self, instance: str, collection: str) -> dict:
+        """
+        Returns the `updated` timestamp of every mirrored post, keyed by ID.
+        """
+        rows = self.connection.execute(
+            "SELECT id, updated FROM posts WHERE instance = ? AND collection = ?",
+            (instance, collection))
+        return {row["id"]: row["updated"] for row in rows}
+
+    def body_hashes(self, instance: str, collection: str) -> set:
+        """
+        Returns the normalized body hashes of every mirrored post.
+        """
+        rows = self.connection.execute(
+            "SELECT body_hash FROM posts WHERE instance = ? AND collection = ?",
+            (instance, collection))
+        return {row["body_hash"] for row in rows}
+
+    def store_posts(self, instance: str, collection: str, posts: list) -> None:
+        """
+        Inserts or replaces posts as returned by the API.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(instance, collection, post.get('id'), post.get('slug'),
+                    post.get('title'), post.get('created'), post.get('updated'),
+                    body_hash(post.get('body') or ""), post.get('body'))
+                    for post in posts])
+
+    def remove_post(self, instance: str, post_id: str) -> None:
+        """
+        Removes a post from the mirror, whichever collection it belongs to.
+        """
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM posts WHERE instance = ? AND id = ?",
+                (instance, post_id))
+
+    def posts(self, instance: str, collection: str, limit: int = None) -> Iterator[dict]:
+        """
+        Yields the mirrored posts of a collection newest first.
+
+        Args:
+            limit (int): Maximum number of posts to return, or `None` for all.
+        """
+        rows = self.connection.execute(
+            "SELECT * FROM posts WHERE instance = ? AND collection = ? "
+            "ORDER BY created DESC LIMIT ?",
+            (instance, collection, -1 if limit is None else limit))
+        for row in rows:
+            yield dict(row)
+
+    def search(self, instance: str, collection: str, query: str, since: str = None, until: str = None, limit: int = 20, highlight: tuple = ("", "")) -> Iterator[dict]:
+        """
+        Yields the mirrored posts of a collection matching a query, best
+        match first, ranked with BM25 and titles weighing more than bodies.
+        Each post comes with its `score` (lower is better) and a `snippet` of
+        the body around the matched words.
+
+        Args:
+            query (str): Words and "quoted phrases" to look for, see `build_match`.
+            since (str): Only posts created at or after this ISO 8601 date.
+            until (str): Only posts created before this ISO 8601 date.
+            limit (int): Maximum number of posts to return.
+            highlight (tuple): Text placed before and after each matched word
+                in the snippet.
+
+        Raises:
+            ValueError: The query has no words to search for.
+        """
+        filters = ["posts_search MATCH ?", "posts.instance = ?", "posts.collection = ?"]
+        parameters = [build_match(query), instance, collection]
+        if since:
+            filters.append("posts.created >= ?")
+            parameters.append(since)
+        if until:
+            filters.append("posts.created < ?")
+            parameters.append(until)
+        rows = self.connection.execute(
+            "SELECT posts.id, posts.slug, posts.title, posts.created, posts.updated, "
+            f"snippet(posts_search, 1, ?, ?, '…', {SNIPPET_WORDS}) AS snippet, "
+            f"bm25(posts_search, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            "FROM posts_search JOIN posts ON posts.rowid = posts_search.rowid "
+            f"WHERE {' AND '.join(filters)} ORDER BY score LIMIT ?",
+            (*highlight, *parameters, limit))
+        for row in rows:
+            yield dict(row)
+
+    def sync(self, client, full: bool = False) -> tuple:
+        """
+        Brings the mirror of the client's collection up to date. The first sync
+        (or a `full` one) downloads every page concurrently and drops posts
+        that no longer exist. Later syncs read pages newest first until they
+        reach the newest post seen by the previous sync, then keep going only
+        while pages hold new or changed posts. Posts other commands added to
+        the mirror therefore never hide older ones that weren't.
+
+        Args:
+            client (WriteFreely): Client for the collection to sync.
+            full (bool): Re-download the whole collection.
+
+        Returns:
+            tuple: The number of new posts and of changed posts.
+        """
+        instance, collection = client.instance, client.collection
+        known = self.known_posts(instance, collection)
+        mark = self.high_water_mark(instance, collection)
+        newest = mark
+        new_count = 0
+        changed_count = 0
+
+        def count(posts: list) -> bool:
+            nonlocal new_count, changed_count, newest
+            stale = False
+            for post in posts:
+                newest = max(newest or "", post.get('created') or "") or None
+                if post.get('id') not in known:
+                    new_count += 1
+                    stale = True
+                elif known[post.get('id')] != post.get('updated'):
+                    changed_count += 1
+                    stale = True
+            return stale
+
+        if full or mark is None:
+            seen = set()
+            batch = list()
+            for post in client.iter_posts(pages=None):
+                seen.add(post.get('id'))
+                batch.append(post)
+                if len(batch) >= 100:
+                    count(batch)
+                    self.store_posts(instance, collection, batch)
+                    batch = list()
+            count(batch)
+            self.store_posts(instance, collection, batch)
+            with self.connection:
+                self.connection.executemany(
+                    "DELETE FROM posts WHERE instance = ? AND collection = ? AND id = ?",
+                    [(instance, collection, post_id) for post_id in known if post_id not in seen])
+        else:
+            page = 1
+            while True:
+                page_posts = client.fetch_page(page)
+                stale = count(page_posts)
+                self.store_posts(instance, collection, page_posts)
+                reached = any((post.get('created') or "") < mark for post in page_posts)
+                if not page_posts or (reached and not stale):
+                    break
+                page += 1
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO collections (instance, collection, synced, newest) VALUES (?, ?, ?, ?)",
+                (instance, collection, time.time(), newest))
+        return new_count, changed_count
+
+    def close(self) -> None:
+        self.connection.close()
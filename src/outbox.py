@@ -0,0 +1,213 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+
+from typing import Callable
+
+from __init__ import OUTBOX_PATH, WORKERS
+from bulk import run_concurrently
+from journal import Journal
+from post import Post
+from session import WriteSession
+
+# Seconds the background worker waits before retrying a failed flush, doubled
+# after each failure up to the maximum.
+RETRY_INTERVAL = 5
+MAX_RETRY_INTERVAL = 300
+
+
+def fsync_directory(path: str) -> None:
+    """
+    Flushes a directory's entries to disk so that a file created or renamed
+    in it survives a crash.
+    """
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class Outbox:
+    """
+    Durable queue of posts waiting to be published. Every post is written to
+    its own JSON file in the outbox directory, synced to disk before `enqueue`
+    returns, and only removed once the instance has accepted it, so nothing is
+    lost when the instance is unreachable or the process dies.
+    """
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def entry_path(self, entry_id: str) -> str:
+        return os.path.join(self.path, f"{entry_id}.json")
+
+    def write_entry(self, entry: dict) -> None:
+        """
+        Atomically writes an entry and syncs it to disk.
+        """
+        temp_path = f"{self.entry_path(entry['id'])}.tmp"
+        with open(temp_path, "w") as entry_file:
+            json.dump(entry, entry_file)
+            entry_file.flush()
+            os.fsync(entry_file.fileno())
+        os.replace(temp_path, self.entry_path(entry["id"]))
+        fsync_directory(self.path)
+
+    def enqueue(self, instance: str, collection: str, title: str, body: str) -> dict:
+        """
+        Adds a post to the outbox.
+
+        Args:
+            instance (str): Instance to publish to.
+            collection (str): Collection to publish to, or `None` for drafts.
+            title (str): Title of the post, or `None`.
+            body (str): Content of the post.
+
+        Returns:
+            dict: The queued entry.
+        """
+        # Time-ordered names keep the queue first in, first out.
+        entry = {
+            "id": f"{time.time_ns()}-{uuid.uuid4().hex[:8]}",
+            "instance": instance,
+            "collection": collection,
+            "title": title,
+            "body": body,
+            "queued": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "attempts": 0,
+            "error": None}
+        self.write_entry(entry)
+        return entry
+
+    def entries(self) -> list:
+        """
+        Returns every queued entry, oldest first.
+        """
+        entries = list()
+        for file_name in sorted(os.listdir(self.path)):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, file_name), "r") as entry_file:
+                    entries.append(json.load(entry_file))
+            except (OSError, ValueError):
+                # Removed by another flush in the meantime.
+                continue
+        return entries
+
+    def remove(self, entry_id: str) -> None:
+        try:
+            os.remove(self.entry_path(entry_id))
+        except FileNotFoundError:
+            pass
+
+    def flush(self, instance: str, access_token: str, session: WriteSession = None, workers: int = WORKERS, on_result: Callable = None, journal: Journal = None) -> tuple:
+        """
+        Publishes the queued posts of an instance concurrently. Published
+        entries are removed, failed ones are kept with the error for the next
+        flush. Only one flush runs at a time, across processes too; when
+        another one holds the outbox, nothing is sent.
+
+        Args:
+            instance (str): Instance the access token belongs to. Entries for
+                other instances are left alone.
+            access_token (str): Access token for the instance.
+            session (WriteSession): Pooled session to publish with.
+            workers (int): Maximum number of posts sent at the same time.
+            on_result (Callable): Called with the entry, the post ID (or
+                `None`) and the error (or `None`) as each post completes.
+            journal (Journal): Keeps a post that was published by a flush
+                which failed before removing its entry from being published
+                again.
+
+        Returns:
+            tuple: Lists of tuples of the entry and post ID for every post
+            published, and of the entry and error for every failure.
+        """
+        session = session or WriteSession(access_token)
+        published = list()
+        failures = list()
+        with open(os.path.join(self.path, ".lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return published, failures
+
+            def publish(entry: dict) -> str:
+                queued_post = Post(
+                    entry["body"],
+                    instance,
+                    access_token,
+                    collection=entry["collection"],
+                    title=entry["title"],
+                    session=session,
+                    journal=journal)
+                return queued_post.submit()
+
+            pending = [entry for entry in self.entries() if entry["instance"] == instance]
+            for entry, post_id, error in run_concurrently(publish, pending, workers):
+                if error is None:
+                    self.remove(entry["id"])
+                    published.append((entry, post_id))
+                else:
+                    entry["attempts"] += 1
+                    entry["error"] = str(error)
+                    self.write_entry(entry)
+                    failures.append((entry, error))
+                if on_result is not None:
+                    on_result(entry, post_id, error)
+        return published, failures
+
+
+class OutboxWorker(threading.Thread):
+    """
+    Background thread flushing the outbox whenever it's woken up with `notify`
+    and retrying with exponential backoff while posts keep failing, so that
+    publishing never blocks whoever queued the post.
+    """
+    def __init__(self, outbox: Outbox, instance: str, access_token: str, session: WriteSession = None, on_result: Callable = None, journal: Journal = None):
+        super().__init__(daemon=True)
+        self.outbox = outbox
+        self.instance = instance
+        self.access_token = access_token
+        self.session = session
+        self.on_result = on_result
+        self.journal = journal
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+
+    def notify(self) -> None:
+        """
+        Asks the worker to flush right away.
+        """
+        self.wake.set()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stops the worker after the flush in progress, if any, has finished.
+        """
+        self.stopping.set()
+        self.wake.set()
+        self.join(timeout)
+
+    def run(self) -> None:
+        interval = RETRY_INTERVAL
+        # Flush anything left over from earlier sessions straight away.
+        self.wake.set()
+        while not self.stopping.is_set():
+            if not self.wake.wait(interval):
+                # Nothing asked for a flush; only retry when posts are waiting.
+                if not self.outbox.entries():
+                    continue
+            self.wake.clear()
+            if self.stopping.is_set():
+                return
+            try:
+                _, failures = self.outbox.flush(self.instance, self.access_token, self.session, on_result=self.on_result, journal=self.journal)
+            except Exception:
+                failures = True
+            interval = min(interval * 2, MAX_RETRY_INTERVAL) if failures else RETRY_INTERVAL
@@ -0,0 +1,74 @@
+import json
+import sys
+
+from typing import Iterable, TextIO
+
+# Formats accepted by `get --format`. "rich" is the default, human-readable one.
+OUTPUT_FORMATS = ("rich", "json", "ndjson", "tsv")
+# Fields written by the machine-readable formats unless `--fields` is given.
+DEFAULT_FIELDS = ("id", "slug", "title", "created", "updated")
+
+
+def parse_fields(value: str) -> tuple:
+    """
+    Parses a comma-separated `--fields` value.
+
+    Args:
+        value (str): Field names, e.g. "id,title", or `None` for the defaults.
+
+    Returns:
+        tuple: The field names to write.
+    """
+    if value is None:
+        return DEFAULT_FIELDS
+    return tuple(field.strip() for field in value.split(",") if field.strip())
+
+
+def tsv_value(value) -> str:
+    """
+    Renders a value as a single TSV cell, escaping tabs and line breaks so
+    every post stays on one line.
+    """
+    if value is None:
+        return ""
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def write_posts(posts: Iterable[dict], output_format: str, fields: tuple = DEFAULT_FIELDS, stream: TextIO = None) -> int:
+    """
+    Writes posts to `stream` as they arrive, one record per post, without
+    going through rich. `json` writes a single array, `ndjson` one object per
+    line and `tsv` a header line followed by one line per post.
+
+    Args:
+        posts (Iterable[dict]): Posts as returned by the API or the mirror.
+        output_format (str): One of "json", "ndjson" or "tsv".
+        fields (tuple): Fields of each post to write. Missing ones are null.
+        stream (TextIO): Where to write, STDOUT by default.
+
+    Returns:
+        int: The number of posts written.
+    """
+    stream = stream or sys.stdout
+    count = 0
+    if output_format == "tsv":
+        stream.write("\t".join(fields) + "\n")
+    elif output_format == "json":
+        stream.write("[")
+
+    for post in posts:
+        if output_format == "tsv":
+            stream.write("\t".join(tsv_value(post.get(field)) for field in fields) + "\n")
+        else:
+            record = json.dumps({field: post.get(field) for field in fields})
+            if output_format == "ndjson":
+                stream.write(record + "\n")
+            else:
+                stream.write(("\n" if count == 0 else ",\n") + record)
+        count += 1
+
+    if output_format == "json":
+        stream.write("\n]\n" if count else "]\n")
+    stream.flush()
+    return count
@@ -1,8 +1,93 @@
+import itertools
 import json
-import requests
 import sys
+import time
+
+from typing import Iterator, TextIO
+
+import requests
+
+from rich.console import Console
 
+from api import (CHUNK_SIZE, PostError, build_post_dto, drop_bodies, gzip_chunks, iter_post_dto, me_posts_url,
+	parse_post_id, post_url, posts_url)
 from client import WriteFreely
+from journal import submission_key
+from mirror import BodyHasher, body_hash
+from session import WriteSession, connect_failed
+
+# Seconds a post may appear to have been created before its submission
+# started, to allow for the instance's clock being off.
+CLOCK_SKEW = 300
+
+
+def split_title(post_content: str) -> tuple:
+	"""
+	Splits a Markdown heading on the first line off of the post content so it
+	can be used as the title.
+
+	Args:
+		post_content (str): Full content of the post.
+
+	Returns:
+		tuple: The title (or `None` if there isn't one) and the remaining content.
+	"""
+	post_content_list = post_content.split('\n')
+	post_title = None
+	if post_content_list[0].startswith('#'):
+		post_title = post_content_list[0].replace("#", "").strip()
+		post_content_list.remove(post_content_list[0])
+		post_content = '\n'.join(post_content_list)
+	return post_title, post_content
+
+
+def read_chunks(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+	"""
+	Reads a file or STDIN piece by piece.
+
+	Args:
+		stream (TextIO): Stream to read.
+		chunk_size (int): Maximum number of characters per piece.
+	"""
+	while True:
+		chunk = stream.read(chunk_size)
+		if not chunk:
+			return
+		yield chunk
+
+
+def split_title_stream(stream: TextIO) -> tuple:
+	"""
+	Streaming counterpart of `split_title` that only reads the first line
+	up front, so that the content never has to be held in memory at once.
+
+	Args:
+		stream (TextIO): File or STDIN holding the post.
+
+	Returns:
+		tuple: The title (or `None` if there isn't one) and an iterator over
+		the remaining content.
+	"""
+	first_line = stream.readline()
+	if first_line.startswith('#'):
+		return first_line.replace("#", "").strip(), read_chunks(stream)
+	return None, itertools.chain([first_line], read_chunks(stream))
+
+
+def hash_stream(stream: TextIO) -> tuple:
+	"""
+	Reads a post from a file or STDIN piece by piece and hashes its content,
+	as `mirror.body_hash` would, without holding it in memory.
+
+	Returns:
+		tuple: The title (or `None` if there isn't one) and the hash of the
+		remaining content.
+	"""
+	post_title, chunks = split_title_stream(stream)
+	hasher = BodyHasher()
+	for chunk in chunks:
+		hasher.update(chunk)
+	return post_title, hasher.hexdigest()
 
 
 class Post(WriteFreely):
@@ -10,53 +95,250 @@ class Post(WriteFreely):
 		self.post_content = post_content
 		self.instance = instance
 		self.access_token = access_token
-		if kwargs.get('collection'):
-			self.collection = kwargs.get('collection')
+		self.collection = kwargs.get('collection')
+		self.session = kwargs.get('session') or WriteSession(access_token)
+		self.cache = kwargs.get('cache')
+		# Gzip the request body. Only for instances that accept compressed requests.
+		self.compress = kwargs.get('compress', False)
+		# Makes submitting the same post again safe, see `journal.Journal`.
+		self.journal = kwargs.get('journal')
+		# Hash of the content, required to journal streamed content.
+		self.digest = kwargs.get('digest')
+		# Publish even if the journal knows an identical post, e.g. to post
+		# the same text again on purpose. The new post is still journaled.
+		self.force = kwargs.get('force', False)
+		# Whether the last submission found the post already published.
+		self.recovered = False
+		self.console = Console()
+		# The post as returned by the instance once it's been submitted.
+		self.published = None
 		if kwargs.get('title'):
 			self.title = kwargs.get('title')
 		else:
 			self.title = None
 
-	def create_post(self) -> str:
+	def is_streamed(self) -> bool:
+		"""
+		Returns whether the content is an iterator of chunks rather than a string.
+		"""
+		return not isinstance(self.post_content, str)
+
+	def build_dto(self):
+		"""
+		Puts together the JSON body of the post request. Streamed content gives
+		a generator so the body is sent to the socket chunk by chunk.
+
+		Returns:
+			The serialized post, as a string or a generator of bytes.
+		"""
+		if self.is_streamed():
+			post_dto = iter_post_dto(self.post_content, self.title)
+		else:
+			post_dto = build_post_dto(self.post_content, self.title)
+		if self.compress:
+			if isinstance(post_dto, str):
+				post_dto = [post_dto.encode("utf-8")]
+			post_dto = gzip_chunks(post_dto)
+		return post_dto
+
+	def send(self, post_dto: str = None) -> str:
+		"""
+		Sends the request creating the post, once.
+
+		Returns:
+			str: The ID of the post.
+
+		Raises:
+			PostError: The instance rejected the post or didn't return an ID.
+		"""
+		headers = {"Content-Encoding": "gzip"} if self.compress else dict()
+		# The instance echoes the post back, so a streamed post's response is
+		# streamed too.
+		post_response = self.session.post(
+			posts_url(self.instance, self.collection),
+			data=post_dto or self.build_dto(),
+			headers=headers,
+			stream=self.is_streamed())
+		with post_response:
+			if post_response.status_code != 201:
+				return parse_post_id(post_response.status_code, None)
+			payload = self.read_payload(post_response)
+		post_id = parse_post_id(post_response.status_code, payload)
+		self.published = payload.get('data')
+		return post_id
+
+	def read_payload(self, response: requests.Response) -> dict:
+		"""
+		Decodes a response holding this post. For a streamed post the body is
+		left out as the response is read (it's `None` in the result), so
+		memory doesn't grow with the size of the post.
+		"""
+		if self.is_streamed():
+			return json.loads(drop_bodies(response.iter_content(CHUNK_SIZE)))
+		return response.json()
+
+	def submit(self, post_dto: str = None) -> str:
 		"""
-		Submits the post to the Write Freely instance.
+		Submits the post to the Write Freely instance without printing anything.
+
+		With a journal, the submission is recorded before it's sent. A post
+		the journal knows was already published isn't sent again as long as
+		it still exists, and when an earlier or the current attempt failed
+		without telling whether the post was created, the collection is
+		searched for it first.
+
+		Args:
+			post_dto (str): Serialized post, built from the object if omitted.
 
 		Returns:
 			str: The ID of the post.
+
+		Raises:
+			PostError: The instance rejected the post or didn't return an ID.
 		"""
-		# Determine the URL.
-		post_url = ""
-		if self.collection != "":
-			post_url = f"https://{self.instance}/api/collections/{self.collection}/posts"
+		self.recovered = False
+		self.published = None
+		digest = self.digest
+		if digest is None and not self.is_streamed():
+			digest = body_hash(self.post_content)
+		if self.journal is None or digest is None:
+			return self.send(post_dto)
+
+		key = submission_key(self.instance, self.collection, self.title, digest)
+		entry = None if self.force else self.journal.lookup(key)
+		if entry is not None:
+			if entry['post_id'] is not None:
+				# The post may have been deleted since, e.g. on the web.
+				post_id = entry['post_id'] if self.fetch(entry['post_id']) else None
+			else:
+				post_id = self.reconcile(digest, entry['started'])
+			if post_id is not None:
+				self.journal.complete(key, post_id)
+				self.recovered = True
+				return post_id
+
+		started = self.journal.begin(key, self.instance, self.collection, self.title, digest)
+		try:
+			post_id = self.send(post_dto)
+		except requests.exceptions.RequestException as e:
+			if connect_failed(e):
+				# Never reached the instance, so nothing was created.
+				self.journal.discard(key)
+				raise
+			error = e
+		except PostError as e:
+			# Server errors, and successes without an ID, may have created the post.
+			if e.status_code is None or (e.status_code < 500 and e.status_code != 201):
+				# Rejected outright; a later attempt starts from scratch.
+				self.journal.discard(key)
+				raise
+			error = e
 		else:
-			post_url = f"https://{self.instance}/api/posts"
+			self.journal.complete(key, post_id)
+			return post_id
 
-		# Put together the post DTO. This will need to change a LOT.
-		post_dict = {"body": self.post_content}
-		if self.title is not None and self.title != "":
-			post_dict['title'] = self.title
-		post_dto = json.dumps(post_dict)
-		print(f"Posting: {post_dto}")
+		# The instance may have created the post before failing.
+		post_id = self.reconcile(digest, started)
+		if post_id is None:
+			raise error
+		self.journal.complete(key, post_id)
+		self.recovered = True
+		return post_id
 
-		# Submit the post.
+	def fetch(self, post_id: str) -> bool:
+		"""
+		Checks that a post published earlier still exists, keeping it as the
+		published post when it does.
+
+		Args:
+			post_id (str): ID of the post.
+
+		Returns:
+			bool: Whether the post exists.
+
+		Raises:
+			PostError: The instance couldn't tell whether the post exists.
+		"""
+		post_response = self.session.get(post_url(self.instance, post_id), stream=self.is_streamed())
+		with post_response:
+			if post_response.status_code in (404, 410):
+				return False
+			if post_response.status_code != 200:
+				raise PostError(f"Unable to check for post {post_id}, status code: {post_response.status_code}", post_response.status_code)
+			self.published = self.read_payload(post_response).get('data')
+		return True
+
+	def reconcile(self, digest: str, started: float) -> str:
+		"""
+		Looks for this post among the posts created since a submission
+		started, newest first, to find out whether an attempt that failed
+		created it after all.
+
+		Args:
+			digest (str): Hash of the post's content.
+			started (float): Time the submission started.
+
+		Returns:
+			str: The ID of the post, or `None` if it wasn't found or the
+			instance couldn't be asked.
+		"""
+		cutoff = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started - CLOCK_SKEW))
 		try:
-			post_response = requests.post(
-				url=post_url,
-				headers={"Content-Type": "application/json",
-					"Authorization": f"Token {self.access_token}"},
-					data=post_dto
-					)
-
-			if post_response.status_code == 201:
-				post_id = post_response.json().get('data').get('id')
-				if post_id:
-					return post_id
-				else:
-					print(f"No post ID found. Full response was: {post_response.json()}")
-					sys.exit(1)
+			if self.collection:
+				candidates = self.iter_posts(pages=None, workers=1)
 			else:
-				print(f"Post unsuccessful with status code: {post_response.status_code}")
-				sys.exit(1)
+				response = self.session.get(me_posts_url(self.instance))
+				response.raise_for_status()
+				candidates = response.json().get('data') or list()
+			for candidate in candidates:
+				if (candidate.get('created') or "") < cutoff:
+					if self.collection:
+						# Collections are listed newest first.
+						break
+					continue
+				if (candidate.get('title') or None) == (self.title or None) and body_hash(candidate.get('body') or "") == digest:
+					self.published = candidate
+					return candidate.get('id')
+		except Exception:
+			pass
+		return None
+
+	def update(self, post_id: str) -> int:
+		"""
+		Replaces the title and content of an existing post with this one's,
+		without printing anything.
+
+		Args:
+			post_id (str): ID of the post to update.
+
+		Returns:
+			int: Status code of the response, 200 on success.
+		"""
+		post_response = self.session.post(post_url(self.instance, post_id), data=build_post_dto(self.post_content, self.title))
+		return post_response.status_code
+
+	def create_post(self) -> str:
+		"""
+		Submits the post to the Write Freely instance, exiting on failure.
+
+		Returns:
+			str: The ID of the post.
+		"""
+		post_dto = self.build_dto()
+		if self.is_streamed() or self.compress:
+			print(f"Posting: {self.title or 'untitled post'}")
+		else:
+			print(f"Posting: {post_dto}")
+
+		# Submit the post.
+		try:
+			post_id = self.submit(post_dto)
+		except PostError as e:
+			print(e)
+			sys.exit(1)
 		except Exception as e:
 			print(f"ERROR: Post attempt failed with error: {e}")
 			sys.exit(1)
+		if self.recovered:
+			print(f"This post was already published with ID {post_id}, so it wasn't sent again.")
+		return post_id
@@ -0,0 +1,230 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from __init__ import BACKOFF, HOST_CONCURRENCY, MAX_BACKOFF, MAX_RETRIES, RATE, RETRY_BUDGET
+
+# Responses that mean "try again later" without the request having been applied.
+THROTTLED = (429, 503)
+# Server errors which are only safe to retry for idempotent requests.
+SERVER_ERRORS = (500, 502, 504)
+IDEMPOTENT = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` requests per second on average
+    with bursts of up to `burst` requests. A rate of 0 disables limiting.
+    """
+    def __init__(self, rate: float = RATE, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token, possibly from the future.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+        """
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self) -> None:
+        """
+        Blocks until a request may be sent.
+        """
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+def parse_retry_after(value: str) -> float:
+    """
+    Parses a `Retry-After` header given either in seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or `None` if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    """
+    Central gate for every API call: rate limits requests with a token bucket,
+    caps how many run at once against each host, and retries throttled and
+    failed requests with exponential backoff and full jitter, honoring
+    `Retry-After`. Retries across all requests are limited by a shared budget
+    so that an outage doesn't multiply the load on the instance.
+    """
+    def __init__(self, **kwargs):
+        self.bucket = TokenBucket(kwargs.get("rate", RATE), kwargs.get("burst"))
+        self.max_retries = kwargs.get("max_retries", MAX_RETRIES)
+        self.backoff = kwargs.get("backoff", BACKOFF)
+        self.max_backoff = kwargs.get("max_backoff", MAX_BACKOFF)
+        self.host_concurrency = kwargs.get("host_concurrency", HOST_CONCURRENCY)
+        self.retry_budget = kwargs.get("retry_budget", RETRY_BUDGET)
+        self.host_slots = dict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "Scheduler":
+        """
+        Creates a scheduler using the settings of a loaded `ConfigObj`.
+        """
+        return cls(
+            rate=config.rate,
+            max_retries=config.max_retries,
+            backoff=config.backoff,
+            max_backoff=config.max_backoff,
+            host_concurrency=config.host_concurrency,
+            retry_budget=config.retry_budget)
+
+    def host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self.host_slots[host]
+
+    def take_retry(self) -> bool:
+        """
+        Spends one retry from the shared budget.
+
+        Returns:
+            bool: `False` once the budget is exhausted.
+        """
+        with self.lock:
+            if self.retry_budget <= 0:
+                return False
+            self.retry_budget -= 1
+            return True
+
+    def should_retry(self, method: str, status_code: int = None, connect_failed: bool = False) -> bool:
+        """
+        Decides whether a failed attempt may be retried. Requests creating
+        posts are only retried when the instance can't have applied them:
+        when it throttled them or the connection was never established.
+
+        Args:
+            method (str): HTTP method of the request.
+            status_code (int): Status of the response, or `None` if the
+                request raised an error instead.
+            connect_failed (bool): Whether the error happened while connecting.
+        """
+        idempotent = method.upper() in IDEMPOTENT
+        if status_code is not None:
+            return status_code in THROTTLED or (idempotent and status_code in SERVER_ERRORS)
+        return idempotent or connect_failed
+
+    def can_retry(self, attempt: int, replayable: bool, method: str, **kwargs) -> bool:
+        """
+        Combines every reason a retry may be refused, spending from the
+        budget only when all of them pass.
+        """
+        return (replayable and attempt < self.max_retries
+            and self.should_retry(method, **kwargs) and self.take_retry())
+
+    def delay(self, attempt: int, retry_after: str = None) -> float:
+        """
+        Returns how long to wait before the next attempt: the instance's
+        `Retry-After` when given, otherwise exponential backoff with full jitter.
+        """
+        wait = parse_retry_after(retry_after)
+        if wait is not None:
+            return min(wait, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def run(self, method: str, url: str, send, replayable: bool = True, connect_failed=None):
+        """
+        Sends a request through the rate limiter and per-host cap, retrying
+        when allowed.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): Full URL of the request.
+            send (Callable): Sends the request once and returns the response.
+            replayable (bool): Whether the body can be sent again. Streamed
+                bodies can't, so those requests are never retried.
+            connect_failed (Callable): Tells whether an exception raised by
+                `send` happened before the request reached the instance.
+
+        Returns:
+            The last response received.
+        """
+        slot = self.host_slot(url)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                with slot:
+                    response = send()
+            except Exception as e:
+                failed_to_connect = connect_failed is not None and connect_failed(e)
+                if not self.can_retry(attempt, replayable, method, connect_failed=failed_to_connect):
+                    raise
+                time.sleep(self.delay(attempt))
+            else:
+                if not self.can_retry(attempt, replayable, method, status_code=response.status_code):
+                    return response
+                # Hand the connection back to the pool before waiting.
+                response.close()
+                time.sleep(self.delay(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+
+    async def run_async(self, method: str, send, connect_failed=None):
+        """
+        asyncio counterpart of `run`. Concurrency is capped by the caller, so
+        only rate limiting and retries apply here.
+
+        Args:
+            method (str): HTTP method of the request.
+            send (Callable): Coroutine function sending the request once and
+                returning a tuple of the status code, headers and payload.
+            connect_failed (Callable): Tells whether an exception raised by
+                `send` happened before the request reached the instance.
+
+        Returns:
+            tuple: The result of the last attempt.
+        """
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.bucket.reserve())
+            try:
+                result = await send()
+            except Exception as e:
+                failed_to_connect = connect_failed is not None and connect_failed(e)
+                if not self.can_retry(attempt, True, method, connect_failed=failed_to_connect):
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+            else:
+                status_code, headers, _ = result
+                if not self.can_retry(attempt, True, method, status_code=status_code):
+                    return result
+                await asyncio.sleep(self.delay(attempt, headers.get("Retry-After")))
+            attempt += 1
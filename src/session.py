@@ -0,0 +1,130 @@
+import requests
+
+import metrics
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from __init__ import POOL_SIZE, TIMEOUT
+from scheduler import Scheduler
+
+
+def connect_failed(error: Exception) -> bool:
+    """
+    Tells whether a request failed before reaching the instance, in which case
+    even a request creating a post can safely be sent again.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class WriteSession:
+    """
+    Keep-alive HTTP transport shared by `WriteFreely`, `Post` and
+    `Authenticator` so that consecutive calls to the same instance reuse one
+    pooled connection instead of paying a new TCP + TLS handshake each time.
+    Every request goes through a `Scheduler` for rate limiting and retries,
+    and is timed by a `Tracer` when tracing is enabled.
+    """
+    # Sessions kept open across commands by the daemon, keyed by access token
+    # and transport settings. `None` outside of the daemon.
+    shared = None
+
+    def __init__(self, access_token: str = None, pool_size: int = POOL_SIZE, timeout: float = TIMEOUT, scheduler: Scheduler = None, tracer: metrics.Tracer = None):
+        self.timeout = timeout
+        self.scheduler = scheduler or Scheduler()
+        self.tracer = tracer or metrics.TRACER
+        self.session = requests.Session()
+        if self.tracer is not None:
+            adapter = metrics.TracingAdapter(self.tracer, pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        if access_token:
+            self.set_token(access_token)
+
+    @classmethod
+    def from_config(cls, config, access_token: str = None) -> "WriteSession":
+        """
+        Creates a session using the access token and transport settings of a
+        loaded `ConfigObj`.
+
+        Args:
+            config (ConfigObj): Loaded configuration.
+            access_token (str): Token to use instead of the configured one,
+                e.g. that of another profile.
+
+        Returns:
+            WriteSession: A new session for the configured instance.
+        """
+        access_token = access_token or config.access_token
+        if cls.shared is None:
+            return cls(
+                access_token,
+                pool_size=config.pool_size,
+                timeout=config.timeout,
+                scheduler=Scheduler.from_config(config))
+
+        key = (access_token, config.pool_size, config.timeout)
+        session = cls.shared.get(key)
+        if session is None:
+            session = cls.shared[key] = cls(access_token, pool_size=config.pool_size, timeout=config.timeout)
+        # Every command starts with fresh rate limits and retry budget.
+        session.scheduler = Scheduler.from_config(config)
+        return session
+
+    def set_token(self, access_token: str) -> None:
+        """
+        Sets the access token sent by default with every request.
+
+        Args:
+            access_token (str): Access token for the Write Freely instance.
+        """
+        self.session.headers["Authorization"] = f"Token {access_token}"
+
+    def clear_token(self) -> None:
+        """
+        Stops sending an access token with requests, e.g. after logging out.
+        """
+        self.session.headers.pop("Authorization", None)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request over the pooled connection through the scheduler,
+        applying the default timeout unless one was given explicitly.
+
+        Args:
+            method (str): HTTP method, e.g. "GET".
+            url (str): Full URL of the request.
+
+        Returns:
+            requests.Response: The response from the server.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        # A streamed body is consumed by the first attempt and can't be resent.
+        data = kwargs.get("data")
+        replayable = data is None or isinstance(data, (str, bytes, dict, list))
+        send = lambda: self.session.request(method, url, **kwargs)
+        if self.tracer is not None:
+            untraced = send
+            send = lambda: self.tracer.send(method, url, untraced)
+        return self.scheduler.run(method, url, send, replayable=replayable, connect_failed=connect_failed)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Closes every pooled connection.
+        """
+        self.session.close()